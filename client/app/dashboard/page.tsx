@@ -20,20 +20,11 @@ export default function DashboardPage() {
 
   const fetchDashboardData = async () => {
     try {
-      const [spacesRes, adminRes] = await Promise.all([
-        api.get('/spaces?limit=5'),
-        api.get('/admin/stats')
-      ]);
+      // Spaces and their stats in a single round-trip
+      const response = await api.get('/dashboard?limit=5&fields=spaces,stats');
       
-      setSpaces(spacesRes.data.spaces || []);
-      
-      // Fetch stats for each space
-      const statsPromises = spacesRes.data.spaces.map((space: StudySpace) =>
-        api.get(`/spaces/${space._id}/stats`).catch(() => null)
-      );
-      
-      const statsResults = await Promise.all(statsPromises);
-      setStats(statsResults.map(res => res?.data || null).filter(Boolean));
+      setSpaces(response.data.spaces || []);
+      setStats((response.data.stats || []).filter(Boolean));
       
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
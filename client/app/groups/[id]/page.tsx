@@ -26,7 +26,7 @@ export default function GroupDetailPage() {
   const [creatingPost, setCreatingPost] = useState(false);
   const [joining, setJoining] = useState(false);
   const [leaving, setLeaving] = useState(false);
-  const [sortBy, setSortBy] = useState<'newest' | 'oldest' | 'popular'>('newest');
+  const [sortBy, setSortBy] = useState<'newest' | 'oldest' | 'popular' | 'hot'>('newest');
   const [currentPage, setCurrentPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
   
@@ -311,6 +311,7 @@ export default function GroupDetailPage() {
                   }}
                   className="px-3 py-1 border border-gray-300 dark:border-gray-600 rounded-md bg-white dark:bg-gray-700 text-gray-900 dark:text-white focus:outline-none focus:ring-2 focus:ring-primary-500"
                 >
+                  <option value="hot">Hot</option>
                   <option value="newest">Newest</option>
                   <option value="oldest">Oldest</option>
                   <option value="popular">Most Popular</option>
@@ -54,12 +54,13 @@ export default function PostDetailPage() {
     
     setUpvoting(true);
     try {
-      await api.post(`/posts/${postId}/upvote`);
+      const response = await api.post(`/posts/${postId}/upvote`);
       setPost({
         ...post,
-        upvotes: post.upvotes + 1,
-        user_upvoted: true,
-        user_downvoted: false
+        upvotes: response.data.upvotes,
+        downvotes: response.data.downvotes,
+        user_upvoted: response.data.user_upvoted,
+        user_downvoted: response.data.user_downvoted
       });
     } catch (error) {
       console.error('Failed to upvote:', error);
@@ -73,12 +74,13 @@ export default function PostDetailPage() {
     
     setDownvoting(true);
     try {
-      await api.post(`/posts/${postId}/downvote`);
+      const response = await api.post(`/posts/${postId}/downvote`);
       setPost({
         ...post,
-        downvotes: post.downvotes + 1,
-        user_upvoted: false,
-        user_downvoted: true
+        upvotes: response.data.upvotes,
+        downvotes: response.data.downvotes,
+        user_upvoted: response.data.user_upvoted,
+        user_downvoted: response.data.user_downvoted
       });
     } catch (error) {
       console.error('Failed to downvote:', error);
@@ -49,20 +49,15 @@ export default function SpaceDetailPage() {
   const fetchSpaceData = async () => {
     try {
       setLoading(true);
-      const [spaceRes, filesRes, chatsRes, statsRes, usersRes] = await Promise.all([
-        api.get(`/spaces/${spaceId}`),
-        api.get(`/spaces/${spaceId}/files`),
-        api.get(`/spaces/${spaceId}/chats`),
-        api.get(`/spaces/${spaceId}/stats`).catch(() => null),
-        api.get(`/spaces/${spaceId}/users`).catch(() => ({ data: { users: [] } }))
-      ]);
+      // Space, files, chats, stats and users in a single round-trip
+      const response = await api.get(`/spaces/${spaceId}/overview`);
+      const overview = response.data;
       
-      setSpace(spaceRes.data);
-      setFiles(filesRes.data.files || []);
-      setChats(chatsRes.data.chats || []);
-      setStats(statsRes?.data || null);
-      setUsers(usersRes.data.users || []);
-      console.log(spaceRes)
+      setSpace(overview.space);
+      setFiles(overview.files?.files || []);
+      setChats(overview.chats?.chats || []);
+      setStats(overview.stats || null);
+      setUsers(overview.users?.users || []);
     } catch (error) {
       console.error('Failed to fetch space data:', error);
     } finally {
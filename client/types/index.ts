@@ -127,7 +127,8 @@ export interface Post {
   files: string[];
   upvotes: number;
   downvotes: number;
-  comments: Comment[];
+  comments?: Comment[];
+  comments_next_cursor?: string | null;
   is_pinned: boolean;
   createdAt: string;
   author?: {
@@ -0,0 +1,8 @@
+"""Offline benchmarks, run from server/:
+
+    python -m benchmarks.run        RAGEngine ingest/chat on in-memory stand-ins
+    python -m benchmarks.loadtest   concurrent end-to-end load against the app
+    python -m benchmarks.retrieval_eval   recall/MRR vs latency across retrieval settings
+    python -m benchmarks.backends   torch vs ONNX parity and batch latency
+    python -m benchmarks.chat_concurrency   chat p99 under concurrency, blocking vs async retrieval
+"""
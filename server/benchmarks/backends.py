@@ -0,0 +1,132 @@
+import sys, json, time, random, argparse, logging
+from typing import Any, Dict, List
+import numpy as np
+
+from inference import load_embedder, load_reranker, INFERENCE_BACKENDS
+from benchmarks.corpus import make_document, make_queries
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# PARITY
+############################################
+
+
+def embedding_parity(reference, candidate, texts: List[str]) -> Dict[str, float]:
+    """Cosine similarity between reference and candidate embeddings of the same texts."""
+    a = np.asarray(reference.encode(texts, convert_to_tensor=False), dtype=np.float32)
+    b = np.asarray(candidate.encode(texts, convert_to_tensor=False), dtype=np.float32)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min_cosine": round(float(cosine.min()), 5), "mean_cosine": round(float(cosine.mean()), 5)}
+
+
+def score_parity(reference, candidate, queries: List[str], docs: List[str]) -> Dict[str, float]:
+    """Absolute score drift and top-1 agreement when ranking docs for each query."""
+    diffs, agree = [], 0
+    for query in queries:
+        pairs = [[query, doc] for doc in docs]
+        a = np.asarray(reference.predict(pairs), dtype=np.float32)
+        b = np.asarray(candidate.predict(pairs), dtype=np.float32)
+        diffs.append(np.abs(a - b).max())
+        agree += int(a.argmax() == b.argmax())
+    return {"max_abs_diff": round(float(max(diffs)), 5), "top1_agreement": round(agree / len(queries), 4)}
+
+############################################
+# LATENCY
+############################################
+
+
+def time_batches(fn, batch: List[Any], repeats: int) -> Dict[str, float]:
+    fn(batch)  # Warm-up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(batch)
+        samples.append(time.perf_counter() - start)
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "items_per_second": round(len(batch) / float(np.median(samples)), 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare inference backends for parity and speed")
+    parser.add_argument("--backends", default=",".join(INFERENCE_BACKENDS))
+    parser.add_argument("--reference", default="torch", choices=INFERENCE_BACKENDS)
+    parser.add_argument("--batch-sizes", default="1,8,64")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--words", type=int, default=300, help="Words per passage (chunks are up to 400)")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Fail below this embedding cosine")
+    parser.add_argument("--max-score-diff", type=float, default=0.5, help="Fail above this reranker drift")
+    parser.add_argument("--min-top1", type=float, default=0.9, help="Fail below this top-1 agreement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    rng = random.Random(args.seed)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    passages = [make_document(rng, args.words) for _ in range(max(batch_sizes))]
+    queries = make_queries(max(batch_sizes), args.seed)
+
+    # Strict, so a backend that cannot load fails the run instead of being
+    # silently measured (and compared for parity) as torch
+    models = {
+        backend: (load_embedder(backend=backend, strict=True), load_reranker(backend=backend, strict=True))
+        for backend in args.backends.split(",")
+    }
+    if args.reference not in models:
+        models[args.reference] = (
+            load_embedder(backend=args.reference, strict=True),
+            load_reranker(backend=args.reference, strict=True),
+        )
+    ref_embedder, ref_reranker = models[args.reference]
+
+    result: Dict[str, Any] = {"config": vars(args), "backends": {}}
+    failures = []
+    for backend, (embedder, reranker) in models.items():
+        report: Dict[str, Any] = {
+            "embedder": type(embedder).__name__,
+            "reranker": type(reranker).__name__,
+            "embed": {},
+            "rerank": {},
+        }
+        for size in batch_sizes:
+            report["embed"][str(size)] = time_batches(
+                lambda b: embedder.encode(b, batch_size=size, convert_to_tensor=False), passages[:size], args.repeats
+            )
+            pairs = [[queries[0], p] for p in passages[:size]]
+            report["rerank"][str(size)] = time_batches(
+                lambda b: reranker.predict(b, batch_size=size), pairs, args.repeats
+            )
+
+        if backend != args.reference:
+            report["parity"] = {
+                "embedding": embedding_parity(ref_embedder, embedder, passages + queries),
+                "rerank": score_parity(ref_reranker, reranker, queries[:16], passages[:16]),
+            }
+            parity = report["parity"]
+            if parity["embedding"]["min_cosine"] < args.min_cosine:
+                failures.append(f"{backend}: embedding min cosine {parity['embedding']['min_cosine']}")
+            if parity["rerank"]["max_abs_diff"] > args.max_score_diff:
+                failures.append(f"{backend}: rerank score drift {parity['rerank']['max_abs_diff']}")
+            if parity["rerank"]["top1_agreement"] < args.min_top1:
+                failures.append(f"{backend}: rerank top-1 agreement {parity['rerank']['top1_agreement']}")
+
+        result["backends"][backend] = report
+
+    result["parity_failures"] = failures
+    report_json = json.dumps(result, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report_json)
+    else:
+        print(report_json)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
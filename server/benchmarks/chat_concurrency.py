@@ -0,0 +1,130 @@
+import sys, json, time, asyncio, argparse, logging, tempfile
+from typing import Any, Dict, List
+
+from ragengine import RAGEngine
+from benchmarks.fakes import FakeLLM, FakeGraphDriver, HashEmbedder, OverlapReranker
+from benchmarks.corpus import write_corpus, make_queries
+from benchmarks.loadtest import LoopMonitor
+from benchmarks.run import percentiles
+
+
+logger = logging.getLogger(__name__)
+
+SPACE_ID = "chat-concurrency-space"
+
+# "blocking" calls RAGEngine.ask inside the coroutine, as the chat endpoint
+# used to; "async" awaits RAGEngine.aask
+MODES = ("blocking", "async")
+
+############################################
+# BENCHMARK
+############################################
+
+
+def build_engine(args) -> RAGEngine:
+    """RAGEngine on Neo4j when --neo4j-uri is given, else on the in-memory graph.
+
+    On the in-memory graph the async path runs graph reads in worker threads,
+    so --db-latency stands in for the round-trip the async driver awaits.
+    """
+    models = {} if args.models == "real" else {"embedder": HashEmbedder(), "reranker": OverlapReranker()}
+    if args.neo4j_uri:
+        return RAGEngine(args.neo4j_uri, args.neo4j_user, args.neo4j_password, **models)
+    return RAGEngine(driver=FakeGraphDriver(args.db_latency), **models)
+
+
+async def run_mode(engine: RAGEngine, mode: str, queries: List[str], llm: FakeLLM,
+                   concurrency: int, stall_threshold: float) -> Dict[str, Any]:
+    """Issue every query from `concurrency` concurrent chat handlers."""
+    latencies: List[float] = []
+    pending = list(queries)
+
+    async def handler():
+        while pending:
+            query = pending.pop()
+            start = time.perf_counter()
+            if mode == "async":
+                await engine.aask(query, SPACE_ID, llm)
+            else:
+                engine.ask(query, SPACE_ID, llm)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    monitor = LoopMonitor(threshold=stall_threshold)
+    monitor_task = asyncio.create_task(monitor.run())
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(handler() for _ in range(concurrency)))
+    finally:
+        monitor_task.cancel()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        **percentiles(latencies),
+        "event_loop": monitor.report(),
+    }
+
+
+async def run_all(engine: RAGEngine, args) -> Dict[str, Any]:
+    llm = FakeLLM(latency=args.llm_latency)
+    queries = make_queries(args.requests, args.seed)
+    results = {}
+    for mode in args.modes:
+        # Start each mode cold so neither benefits from the other's cached rerank scores
+        engine.score_cache.delete_prefix(f"{SPACE_ID}:")
+        results[mode] = await run_mode(engine, mode, queries, llm, args.concurrency, args.stall_threshold)
+    await engine.aclose()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Chat latency under concurrency, blocking vs async retrieval")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent chat handlers")
+    parser.add_argument("--requests", type=int, default=500, help="Chats issued per mode")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="Seconds per in-memory graph statement")
+    parser.add_argument("--models", choices=["real", "fake"], default="fake")
+    parser.add_argument("--neo4j-uri", help="Run against this Neo4j instead of the in-memory graph")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="password")
+    parser.add_argument("--stall-threshold", type=float, default=0.1, help="Loop lag counted as a stall (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("ragengine").setLevel(logging.WARNING)
+    args.modes = [m for m in args.modes.split(",") if m]
+    for mode in args.modes:
+        if mode not in MODES:
+            parser.error(f"Unknown mode {mode!r}")
+
+    engine = build_engine(args)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            files = write_corpus(tmp, args.documents, args.words, args.seed)
+            engine.ingest(files, SPACE_ID, FakeLLM(), clear_existing=True)
+
+        result = {"config": vars(args), "modes": asyncio.run(run_all(engine, args))}
+    finally:
+        if args.neo4j_uri:
+            engine.clear_space(SPACE_ID)
+        engine.close()
+
+    report = json.dumps(result, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import os, random
+from typing import List
+
+
+# Each topic contributes its own vocabulary so queries have a findable answer
+TOPICS = {
+    "biology": "cell membrane protein enzyme mitochondria ribosome nucleus photosynthesis chlorophyll genome mutation",
+    "physics": "velocity acceleration momentum energy friction gravity quantum photon wavelength entropy",
+    "chemistry": "molecule atom bond reaction catalyst oxidation electron isotope solution equilibrium",
+    "history": "empire revolution treaty dynasty colonial parliament monarchy republic trade migration",
+    "computing": "algorithm complexity recursion compiler memory pointer graph sorting hashing network",
+    "economics": "inflation demand supply market interest currency deficit tariff labour capital",
+}
+FILLER = "the of and to in is that for with as by on this which from are can be an".split()
+
+
+def make_document(rng: random.Random, words: int) -> str:
+    """One document mostly drawn from a single topic."""
+    topic = rng.choice(list(TOPICS))
+    vocab = TOPICS[topic].split()
+    other = " ".join(TOPICS.values()).split()
+    out = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.45:
+            out.append(rng.choice(vocab))
+        elif roll < 0.55:
+            out.append(rng.choice(other))
+        else:
+            out.append(rng.choice(FILLER))
+    return " ".join(out)
+
+
+def write_corpus(directory: str, documents: int, words: int, seed: int = 0) -> List[str]:
+    """Write `documents` synthetic .txt files and return their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(documents):
+        path = os.path.join(directory, f"doc_{i:05d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_document(rng, words))
+        paths.append(path)
+    return paths
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    """Short questions built from topic vocabulary."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        vocab = TOPICS[rng.choice(list(TOPICS))].split()
+        a, b = rng.sample(vocab, 2)
+        queries.append(f"How does {a} relate to {b}?")
+    return queries
@@ -0,0 +1,428 @@
+import re, time, json, hashlib, threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+
+############################################
+# LLM
+############################################
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "is", "are", "for", "on",
+    "with", "as", "by", "that", "this", "it", "be", "from", "at", "which",
+}
+
+
+class FakeLLM:
+    """Deterministic stand-in for main.llm with a configurable delay.
+
+    Concept-extraction prompts get canned JSON built from the most frequent
+    words of the chunk, so the graph has realistic shape; any other prompt
+    gets a fixed answer.
+    """
+
+    def __init__(self, latency: float = 0.0, concepts: int = 5, edges: int = 3):
+        self.latency = latency
+        self.concepts = concepts
+        self.edges = edges
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if "Extract key concepts" in prompt:
+            text = prompt.split("Text:", 1)[-1]
+            words = [w for w in re.findall(r"[a-z]+", text.lower()) if w not in STOPWORDS and len(w) > 3]
+            counts: Dict[str, int] = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            concepts = sorted(counts, key=lambda w: (-counts[w], w))[:self.concepts]
+            edges = [[a, "requires", b] for a, b in zip(concepts, concepts[1:])][:self.edges]
+            return json.dumps({"concepts": concepts, "edges": edges})
+
+        return "This is a benchmark answer based on the provided context."
+
+############################################
+# MODELS
+############################################
+
+
+class HashEmbedder:
+    """Bag-of-hashed-words embedder with the SentenceTransformer.encode signature."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, convert_to_tensor: bool = False, **kwargs):
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        return np.stack([self._embed(s) for s in sentences]) if sentences else np.zeros((0, self.dim))
+
+
+class OverlapReranker:
+    """Word-overlap scorer with the CrossEncoder.predict signature."""
+
+    def predict(self, pairs, **kwargs):
+        scores = []
+        for query, doc in pairs:
+            q = set(query.lower().split())
+            scores.append(len(q & set(doc.lower().split())) / (len(q) or 1))
+        return np.array(scores)
+
+############################################
+# GRAPH STORE
+############################################
+
+
+class FakeResult:
+    """Subset of neo4j.Result used by RAGEngine."""
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None,
+                 nodes_created: int = 0, relationships_created: int = 0):
+        self.records = records or []
+        self.counters = SimpleNamespace(
+            nodes_created=nodes_created,
+            relationships_created=relationships_created,
+        )
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def consume(self):
+        return SimpleNamespace(counters=self.counters)
+
+
+class InMemoryGraph:
+    """Executes the fixed set of Cypher statements RAGEngine issues against dicts.
+
+    Statements are recognised by their shape; anything unknown raises so the
+    fake cannot silently drift from the engine's queries.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency  # Simulated round-trip per statement
+        self.chunks: Dict[str, Dict[str, Any]] = {}
+        self.concepts: Dict[tuple, Dict[str, Any]] = {}
+        self.explained_by = set()  # (concept key, chunk_id)
+        self.related: Dict[tuple, int] = {}  # (source key, target key, type) -> strength
+        self.migrations: Dict[int, str] = {}  # SchemaMigration version -> name
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    def run(self, query: str, params: Dict[str, Any]) -> FakeResult:
+        if self.latency:
+            time.sleep(self.latency)
+        q = " ".join(query.split())
+        with self._lock:
+            self.statements += 1
+            hops = re.search(r"RELATED_TO\*1\.\.(\d)", q)
+            if hops:
+                return self._graph_search(params, int(hops.group(1)))
+            for pattern, handler in self.HANDLERS:
+                if pattern in q:
+                    return handler(self, params)
+        raise NotImplementedError(f"InMemoryGraph does not support: {q[:80]}")
+
+    def _noop(self, p):
+        return FakeResult()
+
+    def _schema_version(self, p):
+        return FakeResult([{"version": max(self.migrations, default=0)}])
+
+    def _record_migration(self, p):
+        self.migrations.setdefault(p["version"], p["name"])
+        return FakeResult()
+
+    def _dedupe(self, p):
+        # Chunks and concepts are keyed dicts here, so there is never anything to merge
+        return FakeResult([{"removed": 0}])
+
+    def _merge_chunk(self, p):
+        if p["chunk_id"] in self.chunks:
+            return FakeResult()
+        self.chunks[p["chunk_id"]] = {
+            "text": p["text"],
+            "space": p["space"],
+            "chunk_id": p["chunk_id"],
+            "embedding": np.asarray(p["embedding"], dtype=np.float32),
+        }
+        return FakeResult(nodes_created=1)
+
+    def _has_chunk(self, p):
+        return FakeResult([{"found": p["chunk_id"] in self.chunks}])
+
+    def _merge_concept(self, p):
+        key = (p["name"], p["space"])
+        if key in self.concepts:
+            return FakeResult()
+        self.concepts[key] = {"name": p["name"], "space": p["space"], "created_at": time.time()}
+        return FakeResult(nodes_created=1)
+
+    def _link_concept(self, p):
+        key = (p["concept_name"], p["space"])
+        if key in self.concepts and p["chunk_id"] in self.chunks:
+            if (key, p["chunk_id"]) not in self.explained_by:
+                self.explained_by.add((key, p["chunk_id"]))
+                return FakeResult(relationships_created=1)
+        return FakeResult()
+
+    def _merge_related(self, p):
+        source, target = (p["source"], p["space"]), (p["target"], p["space"])
+        if source not in self.concepts or target not in self.concepts:
+            return FakeResult()
+        key = (source, target, p["rel"])
+        created = key not in self.related
+        self.related[key] = self.related.get(key, 0) + 1
+        return FakeResult(relationships_created=int(created))
+
+    def _delete_chunks(self, p):
+        ids = [cid for cid, c in self.chunks.items() if c["space"] == p["space"]]
+        for cid in ids:
+            del self.chunks[cid]
+        self.explained_by = {link for link in self.explained_by if link[1] in self.chunks}
+        return FakeResult()
+
+    def _delete_concepts(self, p):
+        keys = [key for key in self.concepts if key[1] == p["space"]]
+        for key in keys:
+            del self.concepts[key]
+        self.explained_by = {link for link in self.explained_by if link[0] in self.concepts}
+        self.related = {k: v for k, v in self.related.items() if k[0] in self.concepts and k[1] in self.concepts}
+        return FakeResult()
+
+    def _vector_search(self, p):
+        # Like the vector index: global top-k first, then the space filter
+        if not self.chunks:
+            return FakeResult()
+        chunks = list(self.chunks.values())
+        matrix = np.stack([c["embedding"] for c in chunks])
+        query = np.asarray(p["query_vector"], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = (matrix @ query) / np.where(norms == 0, 1.0, norms)
+        top = np.argsort(scores)[::-1][:p["top_k"]]
+        return FakeResult([
+            {"text": chunks[i]["text"], "chunk_id": chunks[i]["chunk_id"], "score": float(scores[i])}
+            for i in top if chunks[i]["space"] == p["space"]
+        ])
+
+    def _graph_search(self, p, hops: int):
+        # Seeds: concepts whose name shares a token with the query terms
+        terms = {t for t in p["terms"].lower().split(" or ") if t}
+        seeds = []
+        for key in self.concepts:
+            if key[1] == p["space"]:
+                score = len(terms & set(re.findall(r"[a-z0-9]+", key[0].lower())))
+                if score:
+                    seeds.append((score, key))
+        seeds = sorted(seeds, reverse=True)[:p["seeds"]]
+
+        # Undirected RELATED_TO adjacency with strengths
+        adjacent: Dict[tuple, List[tuple]] = {}
+        for (source, target, _), strength in self.related.items():
+            adjacent.setdefault(source, []).append((target, strength))
+            adjacent.setdefault(target, []).append((source, strength))
+
+        weights: Dict[tuple, float] = {}
+        for score, seed in seeds:
+            frontier = [(seed, float(score))]
+            weights[seed] = max(weights.get(seed, 0.0), float(score))
+            for _ in range(hops):
+                next_frontier = []
+                for node, weight in frontier:
+                    for neighbor, strength in adjacent.get(node, []):
+                        w = weight * p["decay"] * strength / (strength + 1.0)
+                        if neighbor[1] == p["space"] and neighbor != seed:
+                            weights[neighbor] = max(weights.get(neighbor, 0.0), w)
+                            next_frontier.append((neighbor, w))
+                frontier = next_frontier
+
+        chunk_scores: Dict[str, float] = {}
+        for concept, chunk_id in self.explained_by:
+            if concept in weights:
+                chunk_scores[chunk_id] = chunk_scores.get(chunk_id, 0.0) + weights[concept]
+        top = sorted(chunk_scores.items(), key=lambda item: -item[1])[:p["top_k"]]
+        return FakeResult([
+            {"text": self.chunks[cid]["text"], "chunk_id": cid, "score": score} for cid, score in top
+        ])
+
+    def _load_chunks(self, p):
+        chunks = sorted((c for c in self.chunks.values() if c["space"] == p["space"]), key=lambda c: c["chunk_id"])
+        return FakeResult([{"text": c["text"]} for c in chunks])
+
+    def _count_chunks(self, p):
+        return FakeResult([{"count": sum(1 for c in self.chunks.values() if c["space"] == p["space"])}])
+
+    def _count_concepts(self, p):
+        return FakeResult([{"count": sum(1 for key in self.concepts if key[1] == p["space"])}])
+
+    def _count_related(self, p):
+        return FakeResult([{"count": sum(1 for key in self.related if key[0][1] == p["space"])}])
+
+    # Checked in order; first substring match wins
+    HANDLERS = [
+        ("CREATE VECTOR INDEX", _noop),
+        ("CREATE INDEX", _noop),
+        ("CREATE FULLTEXT INDEX", _noop),
+        ("CREATE CONSTRAINT", _noop),
+        ("MATCH (m:SchemaMigration) RETURN coalesce", _schema_version),
+        ("MERGE (m:SchemaMigration", _record_migration),
+        ("MATCH (c:Chunk) WHERE c.chunk_id IS NOT NULL", _dedupe),
+        ("MATCH (c:Concept) WHERE c.space IS NOT NULL", _dedupe),
+        ("MERGE (c:Chunk {chunk_id", _merge_chunk),
+        ("MATCH (c:Chunk {chunk_id: $chunk_id}) RETURN count", _has_chunk),
+        ("MERGE (concept:Concept", _merge_concept),
+        ("MERGE (concept)-[:EXPLAINED_BY]", _link_concept),
+        ("MERGE (a)-[r:RELATED_TO", _merge_related),
+        ("MATCH (c:Chunk {space: $space}) DETACH DELETE", _delete_chunks),
+        ("MATCH (c:Concept {space: $space}) DETACH DELETE", _delete_concepts),
+        ("db.index.vector.queryNodes", _vector_search),
+        ("MATCH (c:Chunk {space: $space}) RETURN c.text", _load_chunks),
+        ("MATCH (c:Chunk {space: $space}) RETURN count", _count_chunks),
+        ("MATCH (c:Concept {space: $space}) RETURN count", _count_concepts),
+        ("MATCH (a:Concept {space: $space})-[r]->(b:Concept {space: $space}) RETURN count", _count_related),
+    ]
+
+
+class FakeSession:
+    def __init__(self, graph: InMemoryGraph):
+        self.graph = graph
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **params):
+        return self.graph.run(query, {**(parameters or {}), **params})
+
+    # Managed transactions run once with the session standing in for the transaction
+    def execute_read(self, work, *args, **kwargs):
+        return work(self, *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(self, *args, **kwargs)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeGraphDriver:
+    """Drop-in for neo4j.Driver backed by an InMemoryGraph."""
+
+    def __init__(self, latency: float = 0.0):
+        self.graph = InMemoryGraph(latency)
+
+    def session(self, **kwargs):
+        return FakeSession(self.graph)
+
+    def close(self):
+        pass
+
+############################################
+# DOCUMENT STORE
+############################################
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    return all(doc.get(field) == value for field, value in query.items())
+
+
+class FakeCollection:
+    """Equality-filter subset of a pymongo Collection."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.docs: Dict[Any, Dict[str, Any]] = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def insert_one(self, doc: Dict[str, Any]):
+        self._call()
+        with self._lock:
+            if doc["_id"] in self.docs:
+                raise KeyError(f"Duplicate _id {doc['_id']}")
+            self.docs[doc["_id"]] = dict(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None):
+        self._call()
+        with self._lock:
+            for doc in self.docs.values():
+                if _matches(doc, query):
+                    return dict(doc)
+        return None
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        self._call()
+        with self._lock:
+            doc = next((d for d in self.docs.values() if _matches(d, query)), None)
+            if doc is None:
+                if not upsert:
+                    return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+                doc = dict(query)
+                self.docs[doc["_id"]] = doc
+            for field, value in update.get("$set", {}).items():
+                doc[field] = value
+            for field, delta in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + delta
+        return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+
+    def delete_one(self, query: Dict[str, Any]):
+        self._call()
+        with self._lock:
+            for _id, doc in list(self.docs.items()):
+                if _matches(doc, query):
+                    del self.docs[_id]
+                    return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        self._call()
+        with self._lock:
+            return sum(1 for doc in self.docs.values() if _matches(doc, query))
+
+    def estimated_document_count(self) -> int:
+        return len(self.docs)
+
+
+class FakeDatabase:
+    """Attribute/item access to lazily created FakeCollections, like pymongo.Database."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self.latency)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def calls(self) -> int:
+        return sum(c.calls for c in self.collections.values())
@@ -0,0 +1,312 @@
+import os, sys, json, time, uuid, random, asyncio, argparse, logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import numpy as np
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.corpus import make_document, make_queries
+from benchmarks.fake_openrouter import FakeOpenRouter
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = "chat=5,list=10,upload=1,login=1"
+
+############################################
+# RESULTS
+############################################
+
+
+class Recorder:
+    """Latency and status per logical endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, name: str, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.latencies[name].append(time.perf_counter() - start)
+            self.errors[name] += 1
+            self.statuses[name][type(e).__name__] += 1
+            return None
+
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            ms = np.array(samples) * 1000
+            endpoints[name] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                "error_rate": round(self.errors[name] / len(samples), 4),
+                "statuses": dict(self.statuses[name]),
+            }
+        total = sum(len(s) for s in self.latencies.values())
+        return {
+            "seconds": round(elapsed, 2),
+            "requests": total,
+            "rps": round(total / elapsed, 2) if elapsed else None,
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0,
+            "endpoints": endpoints,
+        }
+
+############################################
+# EVENT LOOP STALLS
+############################################
+
+
+class LoopMonitor:
+    """Measures lag of this process's event loop (the app's loop in-process)."""
+
+    def __init__(self, interval: float = 0.01, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: List[float] = []
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def report(self) -> Dict[str, Any]:
+        if not self.lags:
+            return {}
+        lags = np.array(self.lags) * 1000
+        return {
+            "source": "in-process",
+            "max_lag_ms": round(float(lags.max()), 2),
+            "p99_lag_ms": round(float(np.percentile(lags, 99)), 2),
+            "stalls": int((lags > self.threshold * 1000).sum()),
+            "stall_threshold_ms": self.threshold * 1000,
+        }
+
+
+async def scrape_loop_lag(client: httpx.AsyncClient, token: Optional[str] = None) -> Dict[float, float]:
+    """Cumulative event_loop_lag_seconds buckets from the server's /metrics."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    response = await client.get("/metrics", headers=headers)
+    if response.status_code != 200:
+        return {}
+    buckets = {}
+    for family in text_string_to_metric_families(response.text):
+        if family.name == "event_loop_lag_seconds":
+            for sample in family.samples:
+                if sample.name.endswith("_bucket"):
+                    buckets[float(sample.labels["le"])] = sample.value
+    return buckets
+
+
+def loop_lag_delta(before: Dict[float, float], after: Dict[float, float], threshold: float) -> Dict[str, Any]:
+    """Stalls recorded by the server between two scrapes."""
+    if not after:
+        return {"source": "server", "error": "event_loop_lag_seconds not exported or /metrics denied (see --metrics-token)"}
+    total = after.get(float("inf"), 0) - before.get(float("inf"), 0)
+    # Smallest bucket bound >= threshold
+    bound = min((le for le in after if le >= threshold), default=float("inf"))
+    within = after.get(bound, 0) - before.get(bound, 0)
+    return {
+        "source": "server",
+        "probes": int(total),
+        "stalls": int(total - within),
+        "stall_threshold_ms": bound * 1000,
+    }
+
+############################################
+# VIRTUAL USERS
+############################################
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ACTIONS:
+            raise ValueError(f"Unknown action {name!r}; choose from {', '.join(ACTIONS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class VirtualUser:
+    """One simulated user: registers, creates a space, then loops over weighted actions."""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, recorder: Recorder, args):
+        self.client = client
+        self.recorder = recorder
+        self.rng = random.Random(args.seed + index)
+        self.queries = make_queries(50, args.seed + index)
+        self.upload_words = args.upload_words
+        tag = uuid.uuid4().hex[:10]
+        self.email = f"lt_{tag}@loadtest.local"
+        self.username = f"lt_{tag}"
+        self.password = "loadtest-password"
+        self.headers: Dict[str, str] = {}
+        self.space_id: Optional[str] = None
+
+    async def setup(self) -> bool:
+        form = {"email": self.email, "username": self.username, "password": self.password}
+        response = await self.recorder.call("register", self.client, "POST", "/register", data=form)
+        if response is None or response.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await self.recorder.call(
+            "create_space", self.client, "POST", "/spaces",
+            json={"subject": "Load test", "topic": self.username}, headers=self.headers
+        )
+        if response is None or response.status_code != 200:
+            return False
+        self.space_id = response.json()["space_id"]
+        return True
+
+    async def login(self):
+        await self.recorder.call(
+            "login", self.client, "POST", "/login",
+            data={"email": self.email, "password": self.password}
+        )
+
+    async def list(self):
+        target = self.rng.choice(["spaces", "chats", "dashboard", "overview"])
+        url = {
+            "spaces": "/spaces",
+            "chats": f"/spaces/{self.space_id}/chats",
+            "dashboard": "/dashboard",
+            "overview": f"/spaces/{self.space_id}/overview",
+        }[target]
+        await self.recorder.call(f"list_{target}", self.client, "GET", url, headers=self.headers)
+
+    async def chat(self):
+        await self.recorder.call(
+            "chat", self.client, "POST", f"/spaces/{self.space_id}/chat",
+            json={"message": self.rng.choice(self.queries)}, headers=self.headers
+        )
+
+    async def upload(self):
+        content = make_document(self.rng, self.upload_words).encode()
+        await self.recorder.call(
+            "upload", self.client, "POST", f"/spaces/{self.space_id}/upload",
+            files={"file": (f"{uuid.uuid4().hex[:8]}.txt", content, "text/plain")}, headers=self.headers
+        )
+
+    async def run(self, weights: Dict[str, float], deadline: float, think_time: float):
+        if not await self.setup():
+            return
+        names, values = list(weights), list(weights.values())
+        while time.perf_counter() < deadline:
+            action = self.rng.choices(names, values)[0]
+            await getattr(self, action)()
+            if think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+
+
+ACTIONS = ("chat", "list", "upload", "login")
+
+############################################
+# RUNNER
+############################################
+
+
+async def run_load(client: httpx.AsyncClient, args, monitor: Optional[LoopMonitor]) -> Dict[str, Any]:
+    recorder = Recorder()
+    weights = parse_mix(args.mix)
+    start = time.perf_counter()
+    deadline = start + args.ramp + args.duration
+
+    async def start_user(i: int):
+        # Users start evenly spread over the ramp-up period
+        await asyncio.sleep(args.ramp * i / max(args.users, 1))
+        await VirtualUser(i, client, recorder, args).run(weights, deadline, args.think_time)
+
+    lag_before = {} if monitor else await scrape_loop_lag(client, args.metrics_token)
+    monitor_task = asyncio.create_task(monitor.run()) if monitor else None
+    try:
+        await asyncio.gather(*(start_user(i) for i in range(args.users)))
+    finally:
+        if monitor_task:
+            monitor_task.cancel()
+
+    result = recorder.report(time.perf_counter() - start)
+    if monitor:
+        result["event_loop"] = monitor.report()
+    else:
+        result["event_loop"] = loop_lag_delta(lag_before, await scrape_loop_lag(client, args.metrics_token), args.stall_threshold)
+    return result
+
+
+async def run_in_process(args) -> Dict[str, Any]:
+    """Drive main.app through httpx's ASGI transport on this event loop."""
+    import main
+    await main.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await run_load(client, args, LoopMonitor(threshold=args.stall_threshold))
+    finally:
+        await main.shutdown_event()
+
+
+async def run_http(args) -> Dict[str, Any]:
+    """Drive an already running server over HTTP."""
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run_load(client, args, None)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test for the FastAPI app")
+    parser.add_argument("--url", help="Base URL of a running server; omit to run the app in-process")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds over which users start")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds at full load after ramp-up")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between actions")
+    parser.add_argument("--upload-words", type=int, default=3000, help="Words per uploaded document")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake OpenRouter delay (in-process)")
+    parser.add_argument("--stall-threshold", type=float, default=0.1, help="Loop lag counted as a stall (s)")
+    parser.add_argument("--metrics-token", default=os.getenv("METRICS_TOKEN"),
+                        help="METRICS_TOKEN of a remote server, to read its loop lag from /metrics")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.url:
+        result = asyncio.run(run_http(args))
+    else:
+        # The fake must be configured before main reads its environment
+        fake = FakeOpenRouter(latency=args.llm_latency).start()
+        os.environ["OPENROUTER_URL"] = fake.url
+        os.environ.setdefault("OPENROUTER_API_KEY", "loadtest")
+        try:
+            result = asyncio.run(run_in_process(args))
+        finally:
+            fake.stop()
+
+    result["config"] = vars(args)
+    report = json.dumps(result, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
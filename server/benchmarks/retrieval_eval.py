@@ -0,0 +1,276 @@
+import os, sys, json, math, time, random, argparse, logging, tempfile
+from itertools import product
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+
+from ragengine import RAGEngine, RETRIEVAL_MODES, RETRIEVAL_SOURCES, is_decisive
+from inference import load_embedder, load_reranker, INFERENCE_BACKEND, INFERENCE_BACKENDS
+from benchmarks.fakes import FakeLLM, FakeGraphDriver, HashEmbedder, OverlapReranker
+from benchmarks.corpus import make_document
+
+
+logger = logging.getLogger(__name__)
+
+SPACE_ID = "eval-space"
+RETRIEVAL_STAGES = ("bm25", "embed_query", "vector_search", "graph_search", "rerank")
+
+############################################
+# LABELED SET
+############################################
+#
+# Labels are JSONL lines {"query": ..., "doc": <file name>, "answer": <phrase>}.
+# The phrase is located in the document and every chunk overlapping it counts
+# as relevant, so one label set works for any chunk size.
+
+
+def load_labels(path: str) -> List[Dict[str, str]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_synthetic(directory: str, documents: int, words: int, queries: int,
+                   seed: int = 0) -> Tuple[List[str], List[Dict[str, str]]]:
+    """Corpus with planted one-sentence facts and a question for each."""
+    rng = random.Random(seed)
+    texts = [make_document(rng, words).split() for _ in range(documents)]
+    labels = []
+    for i in range(queries):
+        doc = rng.randrange(documents)
+        entity = f"compound{i:04d}"
+        fact = f"the melting point of {entity} is {rng.randint(10, 900)} kelvin".split()
+        at = rng.randrange(len(texts[doc]) + 1)
+        texts[doc][at:at] = fact
+        labels.append({
+            "query": f"What is the melting point of {entity}?",
+            "doc": f"doc_{doc:05d}.txt",
+            "answer": " ".join(fact[:6]),
+        })
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, words_ in enumerate(texts):
+        path = os.path.join(directory, f"doc_{i:05d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(" ".join(words_))
+        paths.append(path)
+    return paths, labels
+
+
+def answer_span(words: List[str], answer: str) -> Optional[Tuple[int, int]]:
+    """Word offsets [start, end) of the answer phrase in a document."""
+    target = [w.lower() for w in answer.split()]
+    lowered = [w.lower() for w in words]
+    for i in range(len(lowered) - len(target) + 1):
+        if lowered[i:i + len(target)] == target:
+            return i, i + len(target)
+    return None
+
+############################################
+# EVALUATION
+############################################
+
+
+class ChunkIndex:
+    """Maps chunk text back to (doc, chunk number) and labels to relevant chunks."""
+
+    def __init__(self, engine: RAGEngine, files: List[str]):
+        self.chunk_size = engine.chunk_size
+        self.words: Dict[str, List[str]] = {}
+        self.by_text: Dict[str, Set[Tuple[str, int]]] = {}
+        for path in files:
+            name = os.path.basename(path)
+            text = engine.read_txt(path)
+            self.words[name] = text.split()
+            for i, chunk in enumerate(engine.chunk_text(text)):
+                self.by_text.setdefault(chunk, set()).add((name, i))
+
+    def relevant(self, label: Dict[str, str]) -> Set[Tuple[str, int]]:
+        span = answer_span(self.words.get(label["doc"], []), label["answer"])
+        if span is None:
+            return set()
+        start, end = span
+        return {(label["doc"], i) for i in range(start // self.chunk_size, (end - 1) // self.chunk_size + 1)}
+
+
+def evaluate(engine: RAGEngine, index: ChunkIndex, labels: List[Dict[str, str]],
+             mode: str, top_k: int, rerank_depth: int, rerank_skip: bool = False) -> Dict[str, Any]:
+    """Recall@k, MRR and latency of one retrieval configuration.
+
+    With rerank_skip the cross-encoder is bypassed whenever the fused ranking
+    is decisive, as in RAGEngine.select_context.
+    """
+    # Candidates per source: what the reranker sees, or just top_k without reranking
+    if rerank_depth:
+        per_source = math.ceil(rerank_depth / len(RETRIEVAL_SOURCES[mode]))
+    else:
+        per_source = top_k
+
+    recalls, reciprocal_ranks, latencies = [], [], []
+    stage_totals = {stage: 0.0 for stage in RETRIEVAL_STAGES}
+    skipped = 0
+    rerank_skips = 0
+
+    for label in labels:
+        relevant = index.relevant(label)
+        if not relevant:
+            skipped += 1
+            continue
+
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        candidates = engine.retrieve_candidates(label["query"], SPACE_ID, top_k=per_source, mode=mode, timings=timings)
+        if rerank_depth and rerank_skip and is_decisive(candidates):
+            rerank_skips += 1
+            results = candidates[:top_k]
+        elif rerank_depth:
+            results = engine.rerank_candidates(label["query"], candidates[:rerank_depth], top_k=top_k, timings=timings)
+        else:
+            results = candidates[:top_k]
+        latencies.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+        found = set()
+        first_rank = None
+        for rank, candidate in enumerate(results, start=1):
+            hits = index.by_text.get(candidate["text"], set()) & relevant
+            if hits:
+                found |= hits
+                first_rank = first_rank or rank
+        recalls.append(len(found) / len(relevant))
+        reciprocal_ranks.append(1.0 / first_rank if first_rank else 0.0)
+
+    n = len(latencies)
+    ms = np.array(latencies) * 1000 if n else np.zeros(1)
+    return {
+        "chunk_size": index.chunk_size,
+        "mode": mode,
+        "top_k": top_k,
+        "rerank_depth": rerank_depth,
+        "rerank_skip": rerank_skip,
+        "rerank_skip_rate": round(rerank_skips / n, 4) if n else 0.0,
+        "queries": n,
+        "unlabelled": skipped,
+        "recall@k": round(float(np.mean(recalls)), 4) if n else 0.0,
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4) if n else 0.0,
+        "mean_ms": round(float(ms.mean()), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "stage_ms": {stage: round(total * 1000 / n, 3) for stage, total in stage_totals.items() if n and total},
+    }
+
+
+def mark_pareto(rows: List[Dict[str, Any]], objective: str):
+    """Flag rows no other row beats on both `objective` and mean latency."""
+    for row in rows:
+        row["pareto"] = not any(
+            other[objective] >= row[objective] and other["mean_ms"] <= row["mean_ms"]
+            and (other[objective] > row[objective] or other["mean_ms"] < row["mean_ms"])
+            for other in rows
+        )
+
+
+def format_table(rows: List[Dict[str, Any]], objective: str, graph_backend: str) -> str:
+    header = f"{'chunk':>6} {'mode':>7} {'k':>3} {'rerank':>7} {'recall@k':>9} {'mrr':>7} {'mean_ms':>9} {'p95_ms':>9}  pareto"
+    lines = [f"graph backend: {graph_backend}", header, "-" * len(header)]
+    for row in sorted(rows, key=lambda r: (-r[objective], r["mean_ms"])):
+        lines.append(
+            f"{row['chunk_size']:>6} {row['mode']:>7} {row['top_k']:>3} "
+            f"{str(row['rerank_depth']) + ('~' if row['rerank_skip'] else ''):>7} "
+            f"{row['recall@k']:>9.3f} {row['mrr']:>7.3f} {row['mean_ms']:>9.2f} {row['p95_ms']:>9.2f}  "
+            f"{'*' if row['pareto'] else ''}"
+        )
+    return "\n".join(lines)
+
+
+def build_engine(args, embedder, reranker, chunk_size: int) -> RAGEngine:
+    """RAGEngine on Neo4j when --neo4j-uri is given, else on the in-memory graph."""
+    if args.neo4j_uri:
+        return RAGEngine(args.neo4j_uri, args.neo4j_user, args.neo4j_password,
+                         embedder=embedder, reranker=reranker, chunk_size=chunk_size)
+    return RAGEngine(driver=FakeGraphDriver(), embedder=embedder, reranker=reranker, chunk_size=chunk_size)
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sweep retrieval settings and report quality vs latency")
+    parser.add_argument("--corpus", help="Directory of .txt documents (with --labels)")
+    parser.add_argument("--labels", help="JSONL of {query, doc, answer}")
+    parser.add_argument("--synthetic", type=int, default=200, help="Planted-fact queries when no labels are given")
+    parser.add_argument("--documents", type=int, default=30)
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--chunk-sizes", type=int_list, default=[200, 400, 800])
+    parser.add_argument("--modes", default=",".join(RETRIEVAL_MODES))
+    parser.add_argument("--top-k", type=int_list, default=[3, 5, 10])
+    parser.add_argument("--rerank-depths", type=int_list, default=[0, 10, 20],
+                        help="Candidates passed to the cross-encoder; 0 disables reranking")
+    parser.add_argument("--rerank-skip", action="store_true",
+                        help="Also evaluate each rerank depth with the decisive-ranking fast path")
+    parser.add_argument("--objective", choices=["recall@k", "mrr"], default="recall@k")
+    parser.add_argument("--models", choices=["real", "fake"], default="real")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default=INFERENCE_BACKEND,
+                        help="Inference backend for real models")
+    parser.add_argument("--neo4j-uri", help="Run against this Neo4j instead of the in-memory graph")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="password")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--table", action="store_true", help="Print a table instead of JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    modes = [m for m in args.modes.split(",") if m]
+    for mode in modes:
+        if mode not in RETRIEVAL_MODES:
+            parser.error(f"Unknown mode {mode!r}")
+
+    # Models are loaded once and shared by the engine built for each chunk size
+    if args.models == "real":
+        embedder, reranker = load_embedder(backend=args.backend), load_reranker(backend=args.backend)
+    else:
+        embedder, reranker = HashEmbedder(), OverlapReranker()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.labels:
+            if not args.corpus:
+                parser.error("--labels needs --corpus")
+            files = sorted(os.path.join(args.corpus, f) for f in os.listdir(args.corpus) if f.endswith(".txt"))
+            labels = load_labels(args.labels)
+        else:
+            files, labels = make_synthetic(tmp, args.documents, args.words, args.synthetic, args.seed)
+
+        rows = []
+        for chunk_size in args.chunk_sizes:
+            engine = build_engine(args, embedder, reranker, chunk_size)
+            try:
+                engine.ingest(files, SPACE_ID, FakeLLM(), clear_existing=True)
+                index = ChunkIndex(engine, files)
+
+                for mode, top_k, depth in product(modes, args.top_k, args.rerank_depths):
+                    if depth and depth < top_k:
+                        continue
+                    rows.append(evaluate(engine, index, labels, mode, top_k, depth))
+                    if depth and args.rerank_skip:
+                        rows.append(evaluate(engine, index, labels, mode, top_k, depth, rerank_skip=True))
+            finally:
+                if args.neo4j_uri:
+                    engine.clear_space(SPACE_ID)
+                engine.close()
+
+    mark_pareto(rows, args.objective)
+    # Latencies on the in-memory graph exclude real vector and graph queries
+    graph_backend = "neo4j" if args.neo4j_uri else "in-memory (latencies exclude Neo4j)"
+    result = {"config": vars(args), "graph_backend": graph_backend, "labels": len(labels), "results": rows}
+
+    report = format_table(rows, args.objective, graph_backend) if args.table else json.dumps(result, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(json.dumps(result, indent=2, default=str))
+    print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
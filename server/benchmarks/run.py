@@ -0,0 +1,206 @@
+import sys, json, time, uuid, asyncio, argparse, logging, resource, tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+import numpy as np
+
+from ragengine import RAGEngine
+from spacestats import SpaceStatsStore
+from metrics import REGISTRY
+from benchmarks.fakes import FakeLLM, FakeGraphDriver, FakeDatabase, HashEmbedder, OverlapReranker
+from benchmarks.corpus import write_corpus, make_queries
+
+
+logger = logging.getLogger(__name__)
+
+SPACE_ID = "benchmark-space"
+
+# Stages reported from the rag_stage_seconds histogram
+STAGES = ("read_file", "chunk", "embed", "extract_concepts", "graph_write", "bm25_index",
+          "bm25", "embed_query", "vector_search", "graph_search", "rerank", "llm_answer")
+
+############################################
+# HELPERS
+############################################
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def stage_seconds() -> Dict[str, float]:
+    """Total seconds per RAG stage recorded so far."""
+    totals = {}
+    for stage in STAGES:
+        value = REGISTRY.get_sample_value("rag_stage_seconds_sum", {"stage": stage})
+        if value:
+            totals[stage] = round(value, 4)
+    return totals
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+############################################
+# BENCHMARKS
+############################################
+
+
+def build_engine(args) -> RAGEngine:
+    """RAGEngine on the in-memory graph, with real or stand-in models."""
+    if args.models == "real":
+        return RAGEngine(driver=FakeGraphDriver(args.db_latency))
+    return RAGEngine(
+        driver=FakeGraphDriver(args.db_latency),
+        embedder=HashEmbedder(),
+        reranker=OverlapReranker(),
+    )
+
+
+def bench_ingest(engine: RAGEngine, files: List[str], llm: FakeLLM) -> Dict[str, Any]:
+    before = stage_seconds()
+    start = time.perf_counter()
+    created = engine.ingest(files, SPACE_ID, llm, clear_existing=True)
+    elapsed = time.perf_counter() - start
+    after = stage_seconds()
+
+    return {
+        "files": len(files),
+        **created,
+        "seconds": round(elapsed, 3),
+        "chunks_per_second": round(created["chunks"] / elapsed, 2) if elapsed else None,
+        "llm_calls": llm.calls,
+        "stage_seconds": {k: round(v - before.get(k, 0.0), 4) for k, v in after.items() if k in
+                          ("read_file", "chunk", "embed", "extract_concepts", "graph_write", "bm25_index")},
+    }
+
+
+async def chat_once(engine: RAGEngine, db: FakeDatabase, stats: SpaceStatsStore, llm: FakeLLM, message: str) -> str:
+    """The /spaces/{id}/chat handler's work, minus HTTP and auth."""
+    db.chats.insert_one({
+        "_id": str(uuid.uuid4()), "spaceId": SPACE_ID, "author": "benchmark",
+        "authorType": "user", "text": message, "createdAt": datetime.now(timezone.utc),
+    })
+    answer = await engine.aask(message, SPACE_ID, llm)
+    db.chats.insert_one({
+        "_id": str(uuid.uuid4()), "spaceId": SPACE_ID, "author": "AI",
+        "authorType": "ai", "text": answer, "createdAt": datetime.now(timezone.utc),
+    })
+    stats.incr(SPACE_ID, chats=2)
+    return answer
+
+
+async def bench_chat(engine: RAGEngine, queries: List[str], llm: FakeLLM, db_latency: float) -> Dict[str, Any]:
+    db = FakeDatabase(db_latency)
+    stats = SpaceStatsStore(db, lambda: engine)
+
+    before = stage_seconds()
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        await chat_once(engine, db, stats, llm, query)
+        latencies.append(time.perf_counter() - start)
+    after = stage_seconds()
+    await engine.aclose()
+
+    return {
+        "queries": len(queries),
+        **percentiles(latencies),
+        "mongo_calls": db.calls(),
+        "stage_seconds": {k: round(v - before.get(k, 0.0), 4) for k, v in after.items() if k in
+                          ("bm25", "embed_query", "vector_search", "graph_search", "rerank", "llm_answer")},
+    }
+
+############################################
+# REGRESSION CHECK
+############################################
+
+# Metric path -> True when higher is better
+TRACKED = {
+    ("ingest", "chunks_per_second"): True,
+    ("chat", "p50_ms"): False,
+    ("chat", "p95_ms"): False,
+    ("chat", "p99_ms"): False,
+    ("peak_rss_mb",): False,
+}
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions beyond `tolerance` (a fraction) relative to a previous run."""
+    def lookup(doc, path):
+        for key in path:
+            doc = doc.get(key) if isinstance(doc, dict) else None
+        return doc
+
+    regressions = []
+    for path, higher_is_better in TRACKED.items():
+        new, old = lookup(result, path), lookup(baseline, path)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{'.'.join(path)}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline RAGEngine ingest and chat benchmark")
+    parser.add_argument("--documents", type=int, default=20, help="Synthetic documents to ingest")
+    parser.add_argument("--words", type=int, default=2000, help="Words per document")
+    parser.add_argument("--queries", type=int, default=100, help="Chat questions to time")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds per fake DB statement")
+    parser.add_argument("--models", choices=["real", "fake"], default="real",
+                        help="Real sentence-transformers models or hash/overlap stand-ins")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression as a fraction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("ragengine").setLevel(logging.WARNING)
+
+    llm = FakeLLM(latency=args.llm_latency)
+    engine = build_engine(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_corpus(tmp, args.documents, args.words, args.seed)
+        ingest = bench_ingest(engine, files, llm)
+
+    chat = asyncio.run(bench_chat(engine, make_queries(args.queries, args.seed), llm, args.db_latency))
+
+    result = {
+        "config": vars(args),
+        "ingest": ingest,
+        "chat": chat,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        result["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    report = json.dumps(result, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os, time, pickle, threading, logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+# When set, caches are shared between workers through Redis instead of
+# living in each process.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+############################################
+# IN-PROCESS CACHE
+############################################
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, namespace: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached value or None if missing/expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        """Invalidate a single key."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        """Invalidate every key starting with prefix."""
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring."""
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+############################################
+# SHARED (REDIS) CACHE
+############################################
+
+
+class RedisCache:
+    """Redis-backed cache with the same interface as TTLCache, shared across workers."""
+
+    def __init__(self, namespace: str, url: str, ttl: float = 60.0):
+        import redis
+
+        self.namespace = namespace
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return cached value or None if missing/expired."""
+        try:
+            raw = self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache get error ({self.namespace}): {e}")
+            self.misses += 1
+            return None
+
+        if raw is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key: str, value: Any):
+        """Store a value with the cache TTL."""
+        try:
+            self.client.set(self._key(key), pickle.dumps(value), px=int(self.ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Redis cache set error ({self.namespace}): {e}")
+
+    def delete(self, key: str):
+        """Invalidate a single key."""
+        try:
+            self.client.delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache delete error ({self.namespace}): {e}")
+
+    def delete_prefix(self, prefix: str):
+        """Invalidate every key starting with prefix."""
+        try:
+            keys = list(self.client.scan_iter(match=f"{self._key(prefix)}*"))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis cache delete_prefix error ({self.namespace}): {e}")
+
+    def clear(self):
+        """Drop all entries in this namespace."""
+        self.delete_prefix("")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this worker."""
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": "redis",
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+############################################
+# FACTORY
+############################################
+
+# Every cache created through make_cache, for stats reporting
+caches: Dict[str, Any] = {}
+
+
+def make_cache(namespace: str, maxsize: int = 1024, ttl: float = 60.0, shared: bool = True):
+    """Create a cache, using Redis when CACHE_REDIS_URL is configured and shared is True."""
+    cache = None
+    if shared and CACHE_REDIS_URL:
+        try:
+            cache = RedisCache(namespace, CACHE_REDIS_URL, ttl=ttl)
+            logger.info(f"✅ Using shared Redis cache for '{namespace}'")
+        except Exception as e:
+            logger.warning(f"Redis cache unavailable for '{namespace}', falling back to memory: {e}")
+
+    if cache is None:
+        cache = TTLCache(namespace, maxsize=maxsize, ttl=ttl)
+
+    caches[namespace] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every registered cache."""
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,147 @@
+"""Versioned Neo4j schema migrations, run from server/:
+
+    python graphschema.py            apply pending migrations
+    python graphschema.py --status   list applied, pending and half-applied migrations
+
+RAGEngine applies pending migrations on startup. Each applied migration is
+recorded as a (:SchemaMigration {version, name, applied_at}) node, and the
+highest version is the graph's schema version.
+"""
+import os, re, sys, argparse, logging
+from typing import Callable, List, NamedTuple, Optional, Sequence, Set
+from graphstore import GraphStore
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# MIGRATIONS
+############################################
+
+
+class Migration(NamedTuple):
+    """One schema step.
+
+    `prepare` runs first for data fixes a new constraint depends on. Each
+    statement then runs in its own schema transaction. Every step must be
+    safe to re-run, since two processes starting together may both apply it.
+    """
+    version: int
+    name: str
+    statements: Sequence[str]
+    prepare: Optional[Callable[[GraphStore], int]] = None
+
+
+# Append only: never edit or reorder a migration that has shipped
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial_indexes", [
+        # Vector index for chunks
+        """
+        CREATE VECTOR INDEX chunk_embedding_index IF NOT EXISTS
+        FOR (c:Chunk) ON (c.embedding)
+        OPTIONS {indexConfig: {
+            `vector.dimensions`: 384,
+            `vector.similarity_function`: 'cosine'
+        }}
+        """,
+        # Indexes for space filtering
+        "CREATE INDEX space_index IF NOT EXISTS FOR (c:Chunk) ON (c.space)",
+        "CREATE INDEX concept_space_index IF NOT EXISTS FOR (c:Concept) ON (c.space)",
+        # Fulltext index matching query terms to concept names
+        "CREATE FULLTEXT INDEX concept_name_index IF NOT EXISTS FOR (c:Concept) ON EACH [c.name]",
+    ]),
+    # Chunk writes MERGE on chunk_id and concept links MATCH on it; the
+    # constraint's backing index serves both
+    Migration(2, "chunk_id_unique", [
+        "CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE c.chunk_id IS UNIQUE",
+    ], prepare=lambda store: store.dedupe_chunks()),
+    # Concept MERGE/MATCH on (name, space). A composite uniqueness constraint
+    # rather than a NODE KEY, which needs Enterprise Edition
+    Migration(3, "concept_space_name_unique", [
+        "CREATE CONSTRAINT concept_space_name_unique IF NOT EXISTS FOR (c:Concept) REQUIRE (c.space, c.name) IS UNIQUE",
+    ], prepare=lambda store: store.dedupe_concepts()),
+]
+
+# Created before anything else so concurrent runs record each version once
+BOOTSTRAP = "CREATE CONSTRAINT schema_migration_version_unique IF NOT EXISTS FOR (m:SchemaMigration) REQUIRE m.version IS UNIQUE"
+
+############################################
+# RUNNER
+############################################
+
+
+SCHEMA_NAME = re.compile(r"CREATE\s+(?:\w+\s+)?(?:INDEX|CONSTRAINT)\s+(\w+)", re.IGNORECASE)
+
+
+def schema_objects(migration: Migration) -> List[str]:
+    """Names of the indexes and constraints a migration creates."""
+    return [match.group(1) for statement in migration.statements for match in SCHEMA_NAME.finditer(statement)]
+
+
+def describe(migration: Migration, existing: Set[str], applied: bool) -> str:
+    """Status line for --status; flags migrations whose schema objects are only partly there."""
+    objects = schema_objects(migration)
+    missing = [name for name in objects if name not in existing]
+    if applied:
+        return f"applied, missing {', '.join(missing)}" if missing else "applied"
+    if not missing and objects:
+        return "half-applied, everything created but not recorded"
+    if len(missing) < len(objects):
+        return f"half-applied, missing {', '.join(missing)}"
+    return "pending"
+
+
+def pending_migrations(store: GraphStore) -> List[Migration]:
+    current = store.schema_version()
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m.version) if m.version > current]
+
+
+def migrate(store: GraphStore) -> int:
+    """Apply pending migrations in version order; returns the resulting schema version."""
+    store.apply_schema(BOOTSTRAP)
+    version = store.schema_version()
+
+    for migration in pending_migrations(store):
+        logger.info(f"Applying Neo4j migration {migration.version}: {migration.name}")
+        if migration.prepare:
+            fixed = migration.prepare(store)
+            if fixed:
+                logger.info(f"Migration {migration.name} removed {fixed} duplicates")
+        for statement in migration.statements:
+            store.apply_schema(statement)
+        store.record_migration(migration.version, migration.name)
+        version = migration.version
+
+    logger.info(f"✅ Neo4j schema at version {version}")
+    return version
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply or list Neo4j schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only list applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = GraphStore(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        os.getenv("NEO4J_USER", "neo4j"),
+        os.getenv("NEO4J_PASS", "password"),
+    )
+    try:
+        if args.status:
+            existing = store.schema_names()
+            applied = {m["version"]: m for m in store.applied_migrations()}
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                status = describe(migration, existing, migration.version in applied)
+                if migration.version in applied:
+                    status += f" {applied[migration.version]['applied_at']}"
+                print(f"{migration.version:>4}  {migration.name:<32} {status}")
+        else:
+            migrate(store)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
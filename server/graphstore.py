@@ -0,0 +1,507 @@
+import os, time, asyncio, logging
+from typing import Any, Callable, Dict, List, Optional, Set
+from neo4j import GraphDatabase, AsyncGraphDatabase
+from metrics import (
+    count_db_call, DB_ERRORS, NEO4J_TRANSACTION_SECONDS, NEO4J_ACQUIRE_SECONDS,
+    NEO4J_RETRIES, NEO4J_SESSIONS_IN_USE, NEO4J_POOL_MAX_SIZE,
+)
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None  # None uses the server default
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "100"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))  # Records per pull from the server
+NEO4J_MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "30"))
+
+# Variable-length bounds cannot be parameters, so graph_search accepts 1..3 hops
+MAX_GRAPH_HOPS = 3
+
+# Duplicate groups merged per transaction by the dedupe migrations
+DEDUPE_BATCH = int(os.getenv("NEO4J_DEDUPE_BATCH", "500"))
+
+
+def _driver_options() -> Dict[str, Any]:
+    return {
+        "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+        "max_transaction_retry_time": NEO4J_MAX_RETRY_TIME,
+    }
+
+############################################
+# QUERIES
+############################################
+
+VECTOR_SEARCH_QUERY = """
+    CALL db.index.vector.queryNodes('chunk_embedding_index', $top_k, $query_vector)
+    YIELD node, score
+    WHERE node.space = $space
+    RETURN node.text AS text, node.chunk_id AS chunk_id, score
+    ORDER BY score DESC
+    LIMIT $top_k
+"""
+
+
+def graph_search_query(hops: int) -> str:
+    """Seed concepts from the fulltext index plus RELATED_TO neighbours up to `hops` away."""
+    hops = max(1, min(int(hops), MAX_GRAPH_HOPS))
+    return f"""
+        CALL db.index.fulltext.queryNodes('concept_name_index', $terms) YIELD node, score
+        WHERE node.space = $space
+        WITH node, score ORDER BY score DESC LIMIT $seeds
+        CALL {{
+            WITH node, score
+            RETURN node AS concept, score AS weight
+            UNION
+            WITH node, score
+            MATCH path = (node)-[:RELATED_TO*1..{hops}]-(neighbor:Concept)
+            WHERE neighbor.space = $space
+            RETURN neighbor AS concept,
+                   score * reduce(w = 1.0, r IN relationships(path) |
+                       w * $decay * r.strength / (r.strength + 1.0)) AS weight
+        }}
+        WITH concept, max(weight) AS weight
+        MATCH (concept)-[:EXPLAINED_BY]->(chunk:Chunk)
+        RETURN chunk.text AS text, chunk.chunk_id AS chunk_id, sum(weight) AS score
+        ORDER BY score DESC
+        LIMIT $top_k
+    """
+
+############################################
+# GRAPH STORE
+############################################
+
+
+class GraphStore:
+    """Every Cypher statement RAGEngine issues, behind managed transactions.
+
+    Reads go through execute_read and writes through execute_write, so the
+    driver retries transient failures (leader changes, deadlocks, dropped
+    connections) with backoff. A unit of work may therefore run more than
+    once and must consume its results inside the transaction.
+
+    Retrieval reads also have `a`-prefixed coroutine versions on the async
+    driver for the chat path. When only a sync driver is injected (the
+    benchmark fakes), they run the sync version in a worker thread instead.
+    """
+
+    def __init__(self, uri: Optional[str] = None, user: Optional[str] = None,
+                 password: Optional[str] = None, driver=None, async_driver=None):
+        self._uri = uri
+        self._auth = (user, password)
+        self.driver = driver or GraphDatabase.driver(uri, auth=self._auth, **_driver_options())
+        NEO4J_POOL_MAX_SIZE.labels("sync").set(NEO4J_MAX_POOL_SIZE)
+
+        self._async_driver = async_driver
+        self._async_fallback = driver is not None and async_driver is None
+
+    @property
+    def async_driver(self):
+        """Async driver, created on first use so it binds to the serving event loop."""
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(self._uri, auth=self._auth, **_driver_options())
+            NEO4J_POOL_MAX_SIZE.labels("async").set(NEO4J_MAX_POOL_SIZE)
+        return self._async_driver
+
+    def _execute(self, access: str, operation: str, work: Callable, *args) -> Any:
+        """Run `work(tx, *args)` in a managed transaction, timing it for metrics."""
+        start = time.perf_counter()
+        attempts = 0
+
+        def timed(tx):
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                # Time to the first attempt is dominated by pool acquisition
+                NEO4J_ACQUIRE_SECONDS.observe(time.perf_counter() - start)
+            else:
+                NEO4J_RETRIES.labels(operation).inc()
+            return work(tx, *args)
+
+        NEO4J_SESSIONS_IN_USE.labels("sync").inc()
+        try:
+            with self.driver.session(database=NEO4J_DATABASE, fetch_size=NEO4J_FETCH_SIZE) as session:
+                if access == "read":
+                    return session.execute_read(timed)
+                return session.execute_write(timed)
+        except Exception:
+            DB_ERRORS.labels("neo4j", operation).inc()
+            raise
+        finally:
+            NEO4J_SESSIONS_IN_USE.labels("sync").dec()
+            NEO4J_TRANSACTION_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+    async def _aexecute(self, operation: str, work: Callable, *args) -> Any:
+        """Run coroutine `work(tx, *args)` in a managed read transaction on the async driver."""
+        start = time.perf_counter()
+        attempts = 0
+
+        async def timed(tx):
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                NEO4J_ACQUIRE_SECONDS.observe(time.perf_counter() - start)
+            else:
+                NEO4J_RETRIES.labels(operation).inc()
+            return await work(tx, *args)
+
+        NEO4J_SESSIONS_IN_USE.labels("async").inc()
+        try:
+            async with self.async_driver.session(database=NEO4J_DATABASE, fetch_size=NEO4J_FETCH_SIZE) as session:
+                return await session.execute_read(timed)
+        except Exception:
+            DB_ERRORS.labels("neo4j", operation).inc()
+            raise
+        finally:
+            NEO4J_SESSIONS_IN_USE.labels("async").dec()
+            NEO4J_TRANSACTION_SECONDS.labels(operation).observe(time.perf_counter() - start)
+
+    def read(self, operation: str, work: Callable, *args) -> Any:
+        return self._execute("read", operation, work, *args)
+
+    def write(self, operation: str, work: Callable, *args) -> Any:
+        return self._execute("write", operation, work, *args)
+
+    @staticmethod
+    def _run(tx, operation: str, query: str, **params):
+        """Run one statement inside a transaction, counting it for metrics."""
+        count_db_call("neo4j", operation)
+        return tx.run(query, **params)
+
+    @staticmethod
+    async def _arows(tx, operation: str, query: str, **params) -> List[Dict[str, Any]]:
+        """Run one statement on an async transaction and collect its non-empty chunk rows."""
+        count_db_call("neo4j", operation)
+        result = await tx.run(query, **params)
+        return [
+            {"text": record["text"], "chunk_id": record["chunk_id"], "score": record["score"]}
+            async for record in result if record["text"]
+        ]
+
+    ############################################
+    # SCHEMA
+    ############################################
+
+    def apply_schema(self, statement: str):
+        """Run one schema statement in its own transaction; schema and data writes cannot mix."""
+        self.write("apply_schema", lambda tx: self._run(tx, "apply_schema", statement).consume())
+
+    def schema_version(self) -> int:
+        """Highest schema migration version recorded in the graph, 0 if none."""
+        def work(tx):
+            return self._run(
+                tx, "schema_version",
+                "MATCH (m:SchemaMigration) RETURN coalesce(max(m.version), 0) AS version",
+            ).single()["version"]
+
+        return self.read("schema_version", work)
+
+    def applied_migrations(self) -> List[Dict[str, Any]]:
+        def work(tx):
+            result = self._run(
+                tx, "schema_version",
+                """
+                MATCH (m:SchemaMigration)
+                RETURN m.version AS version, m.name AS name, toString(m.applied_at) AS applied_at
+                ORDER BY m.version
+            """,
+            )
+            return [dict(record) for record in result]
+
+        return self.read("schema_version", work)
+
+    def schema_names(self) -> Set[str]:
+        """Names of every index and constraint in the database."""
+        def work(tx):
+            names = set()
+            for statement in ("SHOW INDEXES YIELD name", "SHOW CONSTRAINTS YIELD name"):
+                names.update(record["name"] for record in self._run(tx, "schema_names", statement))
+            return names
+
+        return self.read("schema_names", work)
+
+    def record_migration(self, version: int, name: str):
+        def work(tx):
+            self._run(
+                tx, "record_migration",
+                """
+                MERGE (m:SchemaMigration {version: $version})
+                ON CREATE SET m.name = $name, m.applied_at = datetime()
+            """,
+                version=version,
+                name=name,
+            ).consume()
+
+        self.write("record_migration", work)
+
+    def _dedupe(self, operation: str, query: str, batch_size: int) -> int:
+        """Re-run a batched dedupe statement until it removes nothing; returns the total removed."""
+        def work(tx):
+            return self._run(tx, operation, query, batch_size=batch_size).single()["removed"]
+
+        total = 0
+        while True:
+            removed = self.write(operation, work)
+            total += removed
+            if not removed:
+                return total
+            logger.info(f"{operation}: removed {total} duplicates so far")
+
+    def dedupe_chunks(self, batch_size: int = DEDUPE_BATCH) -> int:
+        """Collapse Chunk nodes sharing a chunk_id into one, keeping every concept link.
+
+        For graphs written before chunk writes were idempotent; returns the
+        number of nodes removed.
+        """
+        return self._dedupe("dedupe_chunks", """
+            MATCH (c:Chunk) WHERE c.chunk_id IS NOT NULL
+            WITH c.chunk_id AS chunk_id, collect(c) AS nodes
+            WHERE size(nodes) > 1
+            WITH nodes LIMIT $batch_size
+            WITH head(nodes) AS keep, tail(nodes) AS duplicates
+            UNWIND duplicates AS duplicate
+            OPTIONAL MATCH (concept:Concept)-[:EXPLAINED_BY]->(duplicate)
+            FOREACH (_ IN CASE WHEN concept IS NULL THEN [] ELSE [1] END |
+                MERGE (concept)-[:EXPLAINED_BY]->(keep))
+            WITH DISTINCT duplicate
+            DETACH DELETE duplicate
+            RETURN count(*) AS removed
+        """, batch_size)
+
+    def dedupe_concepts(self, batch_size: int = DEDUPE_BATCH) -> int:
+        """Collapse Concept nodes sharing (space, name), merging their links and edge strengths.
+
+        Concurrent MERGEs without a constraint could create such pairs;
+        returns the number of nodes removed. Edges written before relationship
+        types were recorded have no type and are merged under type "".
+        """
+        return self._dedupe("dedupe_concepts", """
+            MATCH (c:Concept) WHERE c.space IS NOT NULL AND c.name IS NOT NULL
+            WITH c.space AS space, c.name AS name, collect(c) AS nodes
+            WHERE size(nodes) > 1
+            WITH nodes LIMIT $batch_size
+            WITH head(nodes) AS keep, tail(nodes) AS duplicates
+            UNWIND duplicates AS duplicate
+            CALL {
+                WITH keep, duplicate
+                MATCH (duplicate)-[:EXPLAINED_BY]->(chunk:Chunk)
+                MERGE (keep)-[:EXPLAINED_BY]->(chunk)
+                RETURN count(*) AS links
+            }
+            CALL {
+                WITH keep, duplicate, duplicates
+                MATCH (duplicate)-[r:RELATED_TO]->(target:Concept)
+                WHERE target <> keep AND NOT target IN duplicates
+                MERGE (keep)-[k:RELATED_TO {type: coalesce(r.type, '')}]->(target)
+                SET k.strength = coalesce(k.strength, 0) + coalesce(r.strength, 1)
+                RETURN count(*) AS outgoing
+            }
+            CALL {
+                WITH keep, duplicate, duplicates
+                MATCH (source:Concept)-[r:RELATED_TO]->(duplicate)
+                WHERE source <> keep AND NOT source IN duplicates
+                MERGE (source)-[k:RELATED_TO {type: coalesce(r.type, '')}]->(keep)
+                SET k.strength = coalesce(k.strength, 0) + coalesce(r.strength, 1)
+                RETURN count(*) AS incoming
+            }
+            DETACH DELETE duplicate
+            RETURN count(*) AS removed
+        """, batch_size)
+
+    ############################################
+    # WRITES
+    ############################################
+
+    def insert_chunk(self, chunk_id: str, text: str, embedding: List[float], space: str,
+                     concepts: List[str], edges: List[List[str]]) -> Dict[str, int]:
+        """Write a chunk, its concepts and their relationships in one transaction.
+
+        Returns how many chunk, concept and RELATED_TO entities were created.
+        """
+        def work(tx):
+            created = {"chunks": 0, "concepts": 0, "relationships": 0}
+
+            # Create chunk node; an existing one already has its concepts
+            summary = self._run(
+                tx, "insert_chunk",
+                """
+                MERGE (c:Chunk {chunk_id: $chunk_id})
+                ON CREATE SET c.text = $text, c.embedding = $embedding, c.space = $space
+            """,
+                text=text,
+                embedding=embedding,
+                space=space,
+                chunk_id=chunk_id,
+            ).consume()
+            if not summary.counters.nodes_created:
+                return created
+            created["chunks"] += summary.counters.nodes_created
+
+            # Create concept nodes and relationships
+            for concept_name in concepts:
+                if concept_name:
+                    summary = self._run(
+                        tx, "merge_concept",
+                        """
+                        MERGE (concept:Concept {name: $name, space: $space})
+                        ON CREATE SET concept.created_at = timestamp()
+                    """,
+                        name=concept_name,
+                        space=space,
+                    ).consume()
+                    created["concepts"] += summary.counters.nodes_created
+
+                    # Link concept to chunk
+                    self._run(
+                        tx, "link_concept",
+                        """
+                        MATCH (concept:Concept {name: $concept_name, space: $space})
+                        MATCH (chunk:Chunk {chunk_id: $chunk_id})
+                        MERGE (concept)-[:EXPLAINED_BY]->(chunk)
+                    """,
+                        concept_name=concept_name,
+                        space=space,
+                        chunk_id=chunk_id,
+                    ).consume()
+
+            # Create prerequisite relationships
+            for edge in edges:
+                if len(edge) >= 3:
+                    source, rel, target = edge[0], edge[1], edge[2]
+
+                    summary = self._run(
+                        tx, "merge_relationship",
+                        """
+                        MATCH (a:Concept {name: $source, space: $space})
+                        MATCH (b:Concept {name: $target, space: $space})
+                        MERGE (a)-[r:RELATED_TO {type: $rel}]->(b)
+                        SET r.strength = coalesce(r.strength, 0) + 1
+                    """,
+                        source=source,
+                        target=target,
+                        rel=rel,
+                        space=space,
+                    ).consume()
+                    created["relationships"] += summary.counters.relationships_created
+
+            return created
+
+        return self.write("insert_chunk", work)
+
+    def clear_space(self, space: str):
+        """Delete every chunk and concept of a space."""
+        def work(tx):
+            self._run(tx, "clear_space", "MATCH (c:Chunk {space: $space}) DETACH DELETE c", space=space).consume()
+            self._run(tx, "clear_space", "MATCH (c:Concept {space: $space}) DETACH DELETE c", space=space).consume()
+
+        self.write("clear_space", work)
+
+    ############################################
+    # READS
+    ############################################
+
+    def has_chunk(self, chunk_id: str) -> bool:
+        """Whether a chunk with this id is already stored."""
+        def work(tx):
+            return self._run(
+                tx, "has_chunk",
+                "MATCH (c:Chunk {chunk_id: $chunk_id}) RETURN count(c) > 0 AS found",
+                chunk_id=chunk_id,
+            ).single()["found"]
+
+        return self.read("has_chunk", work)
+
+    def chunk_texts(self, space: str) -> List[str]:
+        """Texts of every chunk in a space."""
+        def work(tx):
+            result = self._run(
+                tx, "load_chunks",
+                "MATCH (c:Chunk {space: $space}) RETURN c.text AS text ORDER BY c.chunk_id",
+                space=space,
+            )
+            return [record["text"] for record in result if record["text"]]
+
+        return self.read("load_chunks", work)
+
+    def vector_search(self, query_vector: List[float], space: str, top_k: int) -> List[Dict[str, Any]]:
+        """Nearest chunks of a space as {text, chunk_id, score}."""
+        def work(tx):
+            result = self._run(
+                tx, "vector_search", VECTOR_SEARCH_QUERY,
+                top_k=top_k, query_vector=query_vector, space=space,
+            )
+            return [
+                {"text": record["text"], "chunk_id": record["chunk_id"], "score": record["score"]}
+                for record in result if record["text"]
+            ]
+
+        return self.read("vector_search", work)
+
+    def graph_search(self, terms: str, space: str, top_k: int, seeds: int,
+                     hops: int, decay: float) -> List[Dict[str, Any]]:
+        """Chunks explaining fulltext-matched concepts and their neighbours, as {text, chunk_id, score}."""
+        def work(tx):
+            result = self._run(
+                tx, "graph_search", graph_search_query(hops),
+                terms=terms, space=space, seeds=seeds, decay=decay, top_k=top_k,
+            )
+            return [
+                {"text": record["text"], "chunk_id": record["chunk_id"], "score": record["score"]}
+                for record in result if record["text"]
+            ]
+
+        return self.read("graph_search", work)
+
+    async def avector_search(self, query_vector: List[float], space: str, top_k: int) -> List[Dict[str, Any]]:
+        if self._async_fallback:
+            return await asyncio.to_thread(self.vector_search, query_vector, space, top_k)
+
+        async def work(tx):
+            return await self._arows(
+                tx, "vector_search", VECTOR_SEARCH_QUERY,
+                top_k=top_k, query_vector=query_vector, space=space,
+            )
+
+        return await self._aexecute("vector_search", work)
+
+    async def agraph_search(self, terms: str, space: str, top_k: int, seeds: int,
+                            hops: int, decay: float) -> List[Dict[str, Any]]:
+        if self._async_fallback:
+            return await asyncio.to_thread(self.graph_search, terms, space, top_k, seeds, hops, decay)
+
+        async def work(tx):
+            return await self._arows(
+                tx, "graph_search", graph_search_query(hops),
+                terms=terms, space=space, seeds=seeds, decay=decay, top_k=top_k,
+            )
+
+        return await self._aexecute("graph_search", work)
+
+    def space_stats(self, space: str) -> Dict[str, int]:
+        """Chunk, concept and relationship counts of a space."""
+        def work(tx):
+            def count(query):
+                return self._run(tx, "space_stats", query, space=space).single()["count"]
+
+            return {
+                "chunks": count("MATCH (c:Chunk {space: $space}) RETURN count(c) as count"),
+                "concepts": count("MATCH (c:Concept {space: $space}) RETURN count(c) as count"),
+                "relationships": count(
+                    "MATCH (a:Concept {space: $space})-[r]->(b:Concept {space: $space}) RETURN count(r) as count"
+                ),
+            }
+
+        return self.read("space_stats", work)
+
+    def close(self):
+        self.driver.close()
+
+    async def aclose(self):
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
@@ -0,0 +1,245 @@
+import os, json, logging
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# "torch" (eager fp32), "onnx" (fp32 ONNX Runtime) or "onnx-int8" (dynamic int8)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Exported ONNX models are written here once and reused on later starts
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "storage/models")
+
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 lets ONNX Runtime decide
+ONNX_OPSET = 17
+
+############################################
+# EXPORT
+############################################
+
+
+def _export_dir(name: str) -> str:
+    return os.path.join(MODEL_CACHE_DIR, name.replace("/", "__"))
+
+
+def _onnx_file(backend: str) -> str:
+    return "model_int8.onnx" if backend == "onnx-int8" else "model.onnx"
+
+
+def _export(wrapper, tokenizer, out_dir: str, output_name: str, meta: dict):
+    """Export a (input_ids, attention_mask[, token_type_ids]) module and its int8 variant."""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(out_dir, exist_ok=True)
+    sample = tokenizer(["export sample", "a slightly longer export sample"], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes[output_name] = {0: "batch"}
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, tuple(sample[n] for n in input_names), fp32_path,
+            input_names=input_names, output_names=[output_name],
+            dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, dynamo=False,
+        )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, "onnx_meta.json"), "w") as f:
+        json.dump({**meta, "inputs": input_names}, f)
+
+
+def export_embedder(name: str = EMBEDDING_MODEL) -> str:
+    """Export a SentenceTransformer, pooling and normalization included, to ONNX."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(name, device="cpu").eval()
+
+    class Wrapper(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            features = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if token_type_ids is not None:
+                features["token_type_ids"] = token_type_ids
+            return self.model(features)["sentence_embedding"]
+
+    out_dir = _export_dir(name)
+    _export(Wrapper(), model.tokenizer, out_dir, "sentence_embedding", {"max_length": model.max_seq_length})
+    logger.info(f"✅ Exported embedder {name} to {out_dir}")
+    return out_dir
+
+
+def export_reranker(name: str = RERANK_MODEL) -> str:
+    """Export a CrossEncoder to ONNX, recording its score activation."""
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    model = CrossEncoder(name, device="cpu")
+    model.model.eval()
+
+    class Wrapper(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model.model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+    activation = type(getattr(model, "activation_fn", None)).__name__.lower()
+    out_dir = _export_dir(name)
+    _export(Wrapper(), model.tokenizer, out_dir, "logits", {
+        "max_length": model.max_length or 512,
+        "activation": "sigmoid" if activation == "sigmoid" else "identity",
+    })
+    logger.info(f"✅ Exported reranker {name} to {out_dir}")
+    return out_dir
+
+############################################
+# ONNX RUNTIME MODELS
+############################################
+
+
+class _OnnxModel:
+    """ONNX Runtime session plus the tokenizer saved next to it."""
+
+    def __init__(self, model_dir: str, file_name: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "onnx_meta.json")) as f:
+            self.meta = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, file_name), options, providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.inputs = self.meta["inputs"]
+        self.max_length = self.meta["max_length"]
+
+    def _run(self, *texts) -> np.ndarray:
+        encoded = self.tokenizer(
+            *texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feed = {name: encoded[name].astype(np.int64) for name in self.inputs}
+        return self.session.run(None, feed)[0]
+
+
+class OnnxEmbedder(_OnnxModel):
+    """SentenceTransformer.encode-compatible embedder on ONNX Runtime."""
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_tensor: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Batch similar lengths together to minimise padding
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        out: List[Optional[np.ndarray]] = [None] * len(sentences)
+        for start in range(0, len(sentences), batch_size):
+            idx = order[start:start + batch_size]
+            vectors = self._run([sentences[i] for i in idx])
+            for i, vector in zip(idx, vectors):
+                out[i] = vector
+
+        embeddings = np.stack(out)
+        return embeddings[0] if single else embeddings
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    """CrossEncoder.predict-compatible scorer on ONNX Runtime."""
+
+    def predict(self, pairs: Sequence[Sequence[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        pairs = list(pairs)
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            logits = self._run([p[0] for p in batch], [p[1] for p in batch])
+            scores.append(logits[:, 0] if logits.ndim == 2 else logits)
+
+        scores = np.concatenate(scores)
+        if self.meta.get("activation") == "sigmoid":
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores
+
+############################################
+# LOADERS
+############################################
+
+
+def _load_onnx(cls, name: str, backend: str, exporter):
+    model_dir = _export_dir(name)
+    if not os.path.exists(os.path.join(model_dir, _onnx_file(backend))):
+        exporter(name)
+    return cls(model_dir, _onnx_file(backend))
+
+
+def _check_backend(backend: str, strict: bool):
+    if backend in INFERENCE_BACKENDS:
+        return
+    if strict:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+    logger.warning(f"Unknown INFERENCE_BACKEND {backend!r}, using torch")
+
+
+def load_embedder(name: str = EMBEDDING_MODEL, backend: str = INFERENCE_BACKEND, strict: bool = False):
+    """Embedding model for the configured backend, falling back to PyTorch.
+
+    With `strict`, an unknown backend or a failed ONNX load raises instead.
+    """
+    _check_backend(backend, strict)
+    if backend in ("onnx", "onnx-int8"):
+        try:
+            model = _load_onnx(OnnxEmbedder, name, backend, export_embedder)
+            logger.info(f"✅ Embedder {name} running on ONNX Runtime ({backend})")
+            return model
+        except Exception as e:
+            if strict:
+                raise
+            logger.error(f"❌ ONNX embedder unavailable, falling back to PyTorch: {e}")
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def load_reranker(name: str = RERANK_MODEL, backend: str = INFERENCE_BACKEND, strict: bool = False):
+    """Cross-encoder for the configured backend, falling back to PyTorch.
+
+    With `strict`, an unknown backend or a failed ONNX load raises instead.
+    """
+    _check_backend(backend, strict)
+    if backend in ("onnx", "onnx-int8"):
+        try:
+            model = _load_onnx(OnnxCrossEncoder, name, backend, export_reranker)
+            logger.info(f"✅ Reranker {name} running on ONNX Runtime ({backend})")
+            return model
+        except Exception as e:
+            if strict:
+                raise
+            logger.error(f"❌ ONNX reranker unavailable, falling back to PyTorch: {e}")
+
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(name)
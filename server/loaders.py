@@ -0,0 +1,61 @@
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+
+############################################
+# BATCHED LOOKUPS
+############################################
+
+
+class UserLoader:
+    """Request-scoped batched user resolver.
+
+    Ids are collected with prime(), fetched with one $in query on the first
+    load, and memoized for the rest of the request.
+    """
+
+    def __init__(self, db, fields: Sequence[str] = ("username",)):
+        self.db = db
+        self.projection = {field: 1 for field in fields}
+        self._cache: Dict[str, Optional[dict]] = {}
+        self._pending: set = set()
+        self.queries = 0  # Number of Mongo round-trips issued
+
+    def prime(self, user_ids: Iterable[Any]):
+        """Queue ids to be fetched in the next batch."""
+        for user_id in user_ids:
+            if user_id is not None and user_id not in self._cache:
+                self._pending.add(user_id)
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        ids = list(self._pending)
+        self._pending.clear()
+        self.queries += 1
+        for user in self.db.users.find({"_id": {"$in": ids}}, self.projection):
+            self._cache[user["_id"]] = user
+        for user_id in ids:
+            self._cache.setdefault(user_id, None)
+
+    def load_many(self, user_ids: Iterable[Any]) -> Dict[Any, dict]:
+        """Return a map of id -> user for the ids that exist."""
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        self.prime(user_ids)
+        self._flush()
+        return {
+            user_id: self._cache[user_id]
+            for user_id in user_ids
+            if self._cache.get(user_id) is not None
+        }
+
+    def load(self, user_id: Any) -> Optional[dict]:
+        """Return a single user, or None if it does not exist."""
+        return self.load_many([user_id]).get(user_id)
+
+    def summary(self, user_id: Any) -> Optional[dict]:
+        """Return the public {id, username} block used in API responses."""
+        user = self.load(user_id)
+        if not user:
+            return None
+        return {"id": user["_id"], "username": user.get("username")}
@@ -1,17 +1,29 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form, Body, Query
+from fastapi import FastAPI, Depends, UploadFile, File, HTTPException, Form, Body, Query, Request, Header
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from pymongo import MongoClient
 from dotenv import load_dotenv
-import os, uuid, requests, logging, bcrypt
+import os, hmac, uuid, requests, logging, bcrypt, asyncio, time, random
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict, Any
 from bson import ObjectId 
 from ragengine import RAGEngine
 from models import User, StudySpace, File as FileModel, Chat
+from cache import make_cache, cache_stats
+from loaders import UserLoader
+from pagination import paginate, paginate_snapshot, InvalidCursor
+from votes import VoteStore, VoteConflict, COUNTER_PROJECTION, FLUSH_LOG_FIELD
+from ranking import refresh_hot_scores, run_hot_score_refresher
+from spacestats import SpaceStatsStore
+from rollups import global_counts, daily_breakdown, run_rollup_refresher
+from metrics import (
+    stage_timer, render_metrics, run_loop_lag_monitor,
+    MongoCommandCounter, HTTP_REQUEST_SECONDS, LLM_CALLS
+)
+from profiler import ProcessSamplingProfiler, PROFILE_TOKEN, PROFILE_SAMPLE_RATE
 
 from rank_bm25 import BM25Okapi
 
@@ -38,11 +50,38 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 # LLM Configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3.1-8b-instruct:free")
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 # Storage Configuration
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "storage/files")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Cache Configuration
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "30"))
+ADMIN_STATS_TTL = float(os.getenv("ADMIN_STATS_TTL", "60"))
+
+# Pagination Configuration
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "50"))
+# hot/popular listings page through a snapshot of this many ranked post ids
+POST_SNAPSHOT_SIZE = int(os.getenv("POST_SNAPSHOT_SIZE", "1000"))
+POST_SNAPSHOT_TTL = float(os.getenv("POST_SNAPSHOT_TTL", "900"))
+
+# Votes Configuration
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", "2"))
+
+# Profiling Configuration
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "100"))
+PROFILE_TTL = float(os.getenv("PROFILE_TTL", "3600"))
+
+# Metrics Configuration: /metrics is served to these client hosts, or to
+# scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_HOSTS = {
+    host.strip() for host in os.getenv("METRICS_ALLOWED_HOSTS", "127.0.0.1,::1").split(",") if host.strip()
+}
+
 # CORS Configuration
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
 
@@ -65,6 +104,13 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Metrics Configuration: /metrics is served to these client hosts, or to
+# scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_HOSTS = {
+    host.strip() for host in os.getenv("METRICS_ALLOWED_HOSTS", "127.0.0.1,::1").split(",") if host.strip()
+}
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -76,13 +122,77 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Record per-route latency for /metrics."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Use the route template so ids don't explode label cardinality
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method,
+            route.path if route else "unmatched",
+            str(status)
+        ).observe(time.perf_counter() - start)
+
+
+# Folded-stack profiles keyed by request id
+profile_store = make_cache("profiles", maxsize=PROFILE_STORE_SIZE, ttl=PROFILE_TTL)
+profile_sample_rate = PROFILE_SAMPLE_RATE  # Changed at runtime via PUT /admin/profiling
+
+
+def profile_token_matches(token: Optional[str]) -> bool:
+    """Constant-time check of a client-supplied token against PROFILE_TOKEN."""
+    return bool(PROFILE_TOKEN and token and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()))
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Profile the process while requests that carry the profiling token or fall in the sample run."""
+    token = request.headers.get("x-profile-token")
+    wanted = profile_token_matches(token) or (
+        profile_sample_rate > 0 and random.random() < profile_sample_rate
+    )
+    if not wanted:
+        return await call_next(request)
+
+    # Samples every thread while the request runs, so its to_thread work is
+    # included along with whatever else the process did in that window
+    request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
+    with ProcessSamplingProfiler() as profiler:
+        response = await call_next(request)
+
+    route = request.scope.get("route")
+    profile_store.set(request_id, {
+        "request_id": request_id,
+        "method": request.method,
+        "path": request.url.path,
+        "route": route.path if route else None,
+        "status": response.status_code,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **profiler.summary(),
+        "folded": profiler.folded(),
+    })
+    response.headers["X-Profile-ID"] = request_id
+    return response
+
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 # MongoDB Connection
 try:
-    mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    mongo_client = MongoClient(
+        MONGO_URI,
+        serverSelectionTimeoutMS=5000,
+        event_listeners=[MongoCommandCounter()]
+    )
     mongo_client.server_info()  # Test connection
     db = mongo_client.app
     logging.info("✅ MongoDB connected successfully")
@@ -100,6 +210,31 @@ except Exception as e:
     logger.error(f"❌ RAG Engine initialization failed: {e}")
     rag_engine = None
 
+# Authenticated user documents keyed by user id (password hash excluded).
+# No endpoint modifies a user document after signup (space membership lives
+# on studyspaces, see membership_cache), so USER_CACHE_TTL alone bounds
+# staleness for edits made directly in Mongo
+user_cache = make_cache("users", maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Positive space-membership checks keyed by "<space_id>:<user_id>"
+membership_cache = make_cache("space_membership", maxsize=USER_CACHE_SIZE, ttl=MEMBERSHIP_CACHE_TTL)
+
+# Global counts for /admin/stats
+admin_stats_cache = make_cache("admin_stats", maxsize=1, ttl=ADMIN_STATS_TTL)
+
+# Per-user votes with write-behind post counters
+vote_store = VoteStore(
+    db,
+    flush_interval=VOTE_FLUSH_INTERVAL,
+    on_flush=lambda post_ids: refresh_hot_scores(db, post_ids)
+)
+
+# Incrementally maintained per-space counters
+space_stats = SpaceStatsStore(db, lambda: rag_engine)
+
+# Background tasks started at startup and cancelled at shutdown
+background_tasks: List[asyncio.Task] = []
+
 ############################################
 # LLM Wrapper
 ############################################
@@ -111,7 +246,7 @@ def llm(prompt: str) -> str:
 
     try:
         response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+            OPENROUTER_URL,
             headers={
                 "Authorization": f"Bearer {OPENROUTER_API_KEY}",
                 "Content-Type": "application/json",
@@ -134,11 +269,14 @@ def llm(prompt: str) -> str:
         data = response.json()
 
         if "choices" in data and len(data["choices"]) > 0:
+            LLM_CALLS.labels("success").inc()
             return data["choices"][0]["message"]["content"]
         else:
+            LLM_CALLS.labels("invalid_response").inc()
             raise HTTPException(status_code=500, detail="Invalid response from LLM")
 
     except requests.exceptions.RequestException as e:
+        LLM_CALLS.labels("error").inc()
         logger.error(f"LLM API error: {e}")
         raise HTTPException(status_code=500, detail=f"LLM service error: {str(e)}")
 
@@ -207,11 +345,57 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     except JWTError:
         raise credentials_exception
     
-    user = db.users.find_one({"_id": user_id})
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = db.users.find_one({"_id": user_id}, {"password_hash": 0})
+        if user is None:
+            raise credentials_exception
+        user_cache.set(user_id, user)
     
-    return user
+    # Copy so handlers can't mutate the cached document
+    return dict(user)
+
+
+async def require_space_member(
+    space_id: str,
+    current_user: dict = Depends(get_current_user)
+) -> dict:
+    """Dependency that ensures the current user belongs to the study space."""
+    cache_key = f"{space_id}:{current_user['_id']}"
+    if membership_cache.get(cache_key):
+        return current_user
+
+    # Membership is checked in the query so the members array never leaves Mongo
+    if db.studyspaces.find_one({"_id": space_id, "users": current_user["_id"]}, {"_id": 1}):
+        membership_cache.set(cache_key, True)
+        return current_user
+
+    if not db.studyspaces.find_one({"_id": space_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Study space not found")
+
+    raise HTTPException(status_code=403, detail="Not authorized to access this space")
+
+
+def get_user_loader() -> UserLoader:
+    """Request-scoped batched user resolver (id and username only)."""
+    return UserLoader(db)
+
+
+def page_or_400(collection, query: dict, sort, limit: int, cursor: Optional[str] = None,
+                projection: Optional[dict] = None, skip: int = 0):
+    """Run a keyset-paginated query, turning bad cursors into a 400."""
+    try:
+        return paginate(collection, query, sort, limit, cursor=cursor, projection=projection, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def invalidate_membership(space_id: str, user_id: Optional[str] = None):
+    """Drop cached membership for one user, or every user when user_id is None."""
+    if user_id is None:
+        membership_cache.delete_prefix(f"{space_id}:")
+    else:
+        membership_cache.delete(f"{space_id}:{user_id}")
 
 ############################################
 # HEALTH & INFO
@@ -228,7 +412,8 @@ async def root():
             "spaces": ["/spaces", "/spaces/{id}"],
             "files": ["/spaces/{id}/files", "/spaces/{id}/upload"],
             "chat": ["/spaces/{id}/chat", "/spaces/{id}/chats"],
-            "stats": ["/spaces/{id}/stats"]
+            "stats": ["/spaces/{id}/stats"],
+            "aggregated": ["/dashboard", "/spaces/{id}/overview"]
         }
     }
 
@@ -369,23 +554,34 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 # StudySpace Endpoints
 ############################################
 
-@app.get("/spaces", tags=["StudySpaces"])
-async def list_spaces(
-    current_user: dict = Depends(get_current_user),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100)
-):
-    """List user's study spaces."""
+# Keyset sort orders (see pagination.py); each is backed by an index created at startup
+SPACE_SORT = [("createdAt", -1), ("_id", -1)]
+CHAT_SORT = [("createdAt", -1), ("_id", -1)]
+
 
-    spaces = list(db.studyspaces.find(
-        {"users": current_user["_id"]}
-    ).skip(skip).limit(limit))
+def load_spaces(user_id: str, limit: int, skip: int = 0, cursor: Optional[str] = None) -> dict:
+    """A page of the user's study spaces, newest first."""
+
+    spaces, cursor_next = page_or_400(
+        db.studyspaces, {"users": user_id}, SPACE_SORT, limit,
+        cursor=cursor, skip=skip
+    )
 
     for space in spaces:
         space["_id"] = str(space["_id"])
         space["createdAt"] = space["createdAt"].isoformat() if space.get("createdAt") else None
 
-    return {"spaces": spaces, "count": len(spaces)}
+    return {"spaces": spaces, "count": len(spaces), "next_cursor": cursor_next}
+
+@app.get("/spaces", tags=["StudySpaces"])
+async def list_spaces(
+    current_user: dict = Depends(get_current_user),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """List user's study spaces, newest first."""
+    return load_spaces(current_user["_id"], limit, skip=skip, cursor=cursor)
 
 @app.post("/spaces", tags=["StudySpaces"])
 async def create_space(
@@ -474,51 +670,45 @@ async def create_space(
             detail=f"Failed to create study space: {str(e)}"
         )
 
-@app.get("/spaces/{space_id}", tags=["StudySpaces"])
-async def get_space(
-    space_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """Get study space details."""
+def load_space(space_id: str) -> dict:
+    """Study space document formatted for the API."""
 
     space = db.studyspaces.find_one({"_id": space_id})
-
     if not space:
         raise HTTPException(status_code=404, detail="Study space not found")
 
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized to access this space")
-
     space["_id"] = str(space["_id"])
     space["createdAt"] = space["createdAt"].isoformat() if space.get("createdAt") else None
 
     return space
 
+@app.get("/spaces/{space_id}", tags=["StudySpaces"])
+async def get_space(
+    space_id: str,
+    current_user: dict = Depends(require_space_member)
+):
+    """Get study space details."""
+    return load_space(space_id)
+
 
 
 @app.delete("/spaces/{space_id}", tags=["StudySpaces"])
 async def delete_space(
     space_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_space_member)
 ):
     """Delete study space and associated data."""
 
-    space = db.studyspaces.find_one({"_id": space_id})
-
-    if not space:
-        raise HTTPException(status_code=404, detail="Study space not found")
-
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized to delete this space")
-
     # Delete space from database
     db.studyspaces.delete_one({"_id": space_id})
+    invalidate_membership(space_id)
 
     # Delete associated files
     db.files.delete_many({"spaceId": space_id})
 
     # Delete associated chats
     db.chats.delete_many({"spaceId": space_id})
+    space_stats.delete(space_id)
 
     # Clear graph data for this space
     if rag_engine:
@@ -533,19 +723,8 @@ async def delete_space(
 # File Endpoints
 ############################################
 
-@app.get("/spaces/{space_id}/files", tags=["Files"])
-async def list_files(
-    space_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """List files in a study space."""
-
-    space = db.studyspaces.find_one({"_id": space_id})
-    if not space:
-        raise HTTPException(status_code=404, detail="Study space not found")
-
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized")
+def load_space_files(space_id: str) -> dict:
+    """Files in a study space, newest first."""
 
     files = list(db.files.find({"spaceId": space_id}).sort("uploadedAt", -1))
 
@@ -561,11 +740,19 @@ async def list_files(
 
     return {"files": files, "count": len(files)}
 
+@app.get("/spaces/{space_id}/files", tags=["Files"])
+async def list_files(
+    space_id: str,
+    current_user: dict = Depends(require_space_member)
+):
+    """List files in a study space."""
+    return load_space_files(space_id)
+
 @app.post("/spaces/{space_id}/upload", tags=["Files"])
 async def upload_file(
     space_id: str,
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_space_member)
 ):
     """Upload file to study space with incremental ingestion and progress tracking."""
     
@@ -574,17 +761,6 @@ async def upload_file(
     logger.info(f"Filename: {file.filename}")
     logger.info(f"Content type: {file.content_type}")
 
-    # Check space exists and user has access
-    space = db.studyspaces.find_one({"_id": space_id})
-    if not space:
-        logger.warning(f"Space not found for upload: {space_id}")
-        raise HTTPException(status_code=404, detail="Study space not found")
-
-    if current_user["_id"] not in space.get("users", []):
-        logger.warning(f"Unauthorized upload attempt: User {current_user['_id']} to space {space_id}")
-        logger.warning(f"Space users: {space.get('users', [])}")
-        raise HTTPException(status_code=403, detail="Not authorized to upload to this space")
-
     # Validate file
     if not file.filename:
         logger.warning(f"Invalid file uploaded - no filename provided")
@@ -680,6 +856,7 @@ async def upload_file(
         
         logger.info(f"Saving file metadata: {file_id}")
         result = db.files.insert_one(file_doc)
+        space_stats.incr(space_id, files=1)
         logger.info(f"File metadata saved: {file_id}, MongoDB ID: {result.inserted_id}")
 
         # INCREMENTAL ingestion - only process the new file
@@ -688,6 +865,8 @@ async def upload_file(
         chunks_extracted = 0
         processing_details = {}
         bm25_status = "not_attempted"
+        processing_started = None
+        stage_timings = {}  # Seconds spent per ingestion stage
         
         if rag_engine:
             try:
@@ -695,24 +874,26 @@ async def upload_file(
                 logger.info(f"Processing only new file: {file.filename}")
                 
                 # Update status to processing started
+                processing_started = datetime.now(timezone.utc)
                 db.files.update_one(
                     {"_id": file_id},
                     {"$set": {
                         "status": "processing",
                         "processing_stage": "text_extraction",
-                        "processing_started": datetime.now(timezone.utc)
+                        "processing_started": processing_started
                     }}
                 )
                 
                 # Step 1: Extract text from the new file
                 logger.info(f"Extracting text from: {file.filename}")
                 text = ""
-                if filepath.lower().endswith(".pdf"):
-                    text = rag_engine.read_pdf(filepath)
-                elif filepath.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                    text = rag_engine.read_image(filepath)
-                elif filepath.lower().endswith(".txt"):
-                    text = rag_engine.read_txt(filepath)
+                with stage_timer("read_file", stage_timings):
+                    if filepath.lower().endswith(".pdf"):
+                        text = rag_engine.read_pdf(filepath)
+                    elif filepath.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
+                        text = rag_engine.read_image(filepath)
+                    elif filepath.lower().endswith(".txt"):
+                        text = rag_engine.read_txt(filepath)
                 
                 if not text.strip():
                     raise HTTPException(status_code=400, detail="No text extracted from file")
@@ -725,7 +906,8 @@ async def upload_file(
                 
                 # Step 2: Chunk the text
                 logger.info(f"Chunking text from: {file.filename}")
-                chunks = rag_engine.chunk_text(text)
+                with stage_timer("chunk", stage_timings):
+                    chunks = rag_engine.chunk_text(text)
                 chunks_extracted = len(chunks)
                 
                 db.files.update_one(
@@ -743,17 +925,7 @@ async def upload_file(
                 else:
                     # Step 3: Generate embeddings (incremental - only for new chunks)
                     logger.info(f"Generating embeddings for {chunks_extracted} new chunks")
-                    embeddings = rag_engine.embedder.encode(chunks, convert_to_tensor=False)
-                    
-                    # Convert to lists for Neo4j
-                    embeddings_list = []
-                    for emb in embeddings:
-                        if hasattr(emb, "tolist"):
-                            embeddings_list.append(emb.tolist())
-                        elif hasattr(emb, "numpy"):
-                            embeddings_list.append(emb.numpy().tolist())
-                        else:
-                            embeddings_list.append(list(emb))
+                    embeddings_list = rag_engine.embed_chunks(chunks, stage_timings)
                     
                     db.files.update_one(
                         {"_id": file_id},
@@ -765,8 +937,11 @@ async def upload_file(
                     
                     # Step 4: Insert into Neo4j (incremental - no clearing of existing data)
                     logger.info("Inserting new chunks into Neo4j graph (incremental)...")
+                    graph_created = {"chunks": 0, "concepts": 0, "relationships": 0}
                     for chunk, embedding in zip(chunks, embeddings_list):
-                        rag_engine.insert_graph(chunk, embedding, space_id, llm)
+                        for key, count in rag_engine.insert_graph(chunk, embedding, space_id, llm, timings=stage_timings).items():
+                            graph_created[key] += count
+                    space_stats.incr(space_id, **graph_created)
                     
                     db.files.update_one(
                         {"_id": file_id},
@@ -780,14 +955,10 @@ async def upload_file(
                     # Step 5: Update BM25 index (append new chunks to existing) - WITH ERROR HANDLING
                     logger.info("Updating BM25 index with new chunks...")
                     try:
-                        if space_id in rag_engine.space_documents:
-                            # Append new chunks to existing documents
-                            rag_engine.space_documents[space_id].extend(chunks)
-                            logger.info(f"Appended {len(chunks)} chunks to existing BM25 index for space {space_id}")
-                        else:
-                            # Create new if first time
-                            rag_engine.space_documents[space_id] = chunks
-                            logger.info(f"Created new BM25 index for space {space_id} with {len(chunks)} chunks")
+                        # Loads the space's existing chunks from the graph first
+                        # if this process has not indexed it yet
+                        appended = rag_engine.append_documents(space_id, chunks)
+                        logger.info(f"Appended {appended} chunks to BM25 index for space {space_id}")
                         
                         # Try to create BM25 index with error handling
                         try:
@@ -799,7 +970,8 @@ async def upload_file(
                                 tokenized_docs = [doc.split() for doc in rag_engine.space_documents[space_id]]
                                 
                                 # Create BM25 index
-                                rag_engine.space_bm25[space_id] = BM25Okapi(tokenized_docs)
+                                with stage_timer("bm25_index", stage_timings):
+                                    rag_engine.space_bm25[space_id] = BM25Okapi(tokenized_docs)
                                 bm25_status = "success"
                                 logger.info(f"✅ BM25 index created/updated for space {space_id} with {len(tokenized_docs)} documents")
                                 
@@ -854,10 +1026,12 @@ async def upload_file(
 
         # Update final status with processing time
         processing_completed = datetime.now(timezone.utc)
-        if file_doc.get("processing_started"):
-            processing_time = (processing_completed - file_doc["processing_started"]).total_seconds()
+        if processing_started:
+            processing_time = (processing_completed - processing_started).total_seconds()
         else:
             processing_time = 0
+        if processing_details:
+            processing_details["processing_time"] = processing_time
         
         # Determine if file was actually processed (even if BM25 failed)
         was_processed = ingestion_status in ["success", "partial_success"] and chunks_extracted > 0
@@ -874,6 +1048,7 @@ async def upload_file(
                     "processing_completed": processing_completed,
                     "processing_time_seconds": processing_time,
                     "processing_details": processing_details,
+                    "processing_stages": stage_timings,
                     "bm25_status": bm25_status
                 }
             }
@@ -907,6 +1082,7 @@ async def upload_file(
                 "message": f"Incremental ingestion {ingestion_status}",
                 "chunks_extracted": chunks_extracted,
                 "processing_time_seconds": processing_time,
+                "stage_seconds": stage_timings,
                 "bm25_status": bm25_status
             },
             "processing_details": processing_details
@@ -934,22 +1110,13 @@ async def upload_file(
 async def delete_file(
     space_id: str,
     file_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_space_member)
 ):
     """Delete file from study space with complete re-ingestion."""
     
     logger.info(f"File deletion requested: space={space_id}, file={file_id}")
     logger.info(f"Requested by user: {current_user['_id']} ({current_user['username']})")
 
-    space = db.studyspaces.find_one({"_id": space_id})
-    if not space:
-        logger.warning(f"Space not found for deletion: {space_id}")
-        raise HTTPException(status_code=404, detail="Study space not found")
-
-    if current_user["_id"] not in space.get("users", []):
-        logger.warning(f"Unauthorized deletion attempt: User {current_user['_id']} in space {space_id}")
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     file = db.files.find_one({"_id": file_id, "spaceId": space_id})
     if not file:
         logger.warning(f"File not found: {file_id} in space {space_id}")
@@ -980,6 +1147,7 @@ async def delete_file(
         
         # Delete from database
         db.files.delete_one({"_id": file_id})
+        space_stats.incr(space_id, files=-1)
         logger.info(f"File metadata deleted from MongoDB: {file_id}")
         
         # Update deletion status
@@ -1004,13 +1172,15 @@ async def delete_file(
                     logger.info(f"Cleared Neo4j data for space {space_id}")
                     
                     # Re-ingest ALL remaining files
-                    rag_engine.ingest(space_files, space_id, llm, clear_existing=False)
+                    created = rag_engine.ingest(space_files, space_id, llm, clear_existing=False)
+                    space_stats.set_graph(space_id, created)
                     
                     reingestion_status = "success"
                     logger.info(f"✅ Re-ingestion successful for space {space_id}")
                 else:
                     # No files left, just clear the space
                     rag_engine.clear_space(space_id)
+                    space_stats.set_graph(space_id)
                     reingestion_status = "cleared"
                     logger.info(f"Space {space_id} cleared (no files remaining)")
                     
@@ -1063,20 +1233,13 @@ async def delete_file(
 async def chat(
     space_id: str,
     message: str = Body(..., embed=True),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_space_member)
 ):
     """Chat with AI about study materials."""
 
     if not message or not message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    space = db.studyspaces.find_one({"_id": space_id})
-    if not space:
-        raise HTTPException(status_code=404, detail="Study space not found")
-
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     # Save user message
     user_chat_id = str(uuid.uuid4())
     db.chats.insert_one({
@@ -1093,7 +1256,7 @@ async def chat(
 
     if rag_engine:
         try:
-            answer = rag_engine.ask(message, space_id, llm)
+            answer = await rag_engine.aask(message, space_id, llm)
         except Exception as e:
             logger.error(f"Chat error: {e}")
 
@@ -1107,6 +1270,7 @@ async def chat(
         "text": answer,
         "createdAt": datetime.now(timezone.utc)
     })
+    space_stats.incr(space_id, chats=2)
 
     return {
         "question": message,
@@ -1114,26 +1278,13 @@ async def chat(
         "space_id": space_id
     }
 
-@app.get("/spaces/{space_id}/chats", tags=["Chat"])
-async def get_chats(
-    space_id: str,
-    current_user: dict = Depends(get_current_user),
-    limit: int = Query(50, ge=1, le=200),
-    skip: int = Query(0, ge=0)
-):
-    """Get chat history for a study space."""
-
-    space = db.studyspaces.find_one({"_id": space_id})
-    if not space:
-        raise HTTPException(status_code=404, detail="Study space not found")
+def load_space_chats(space_id: str, limit: int = 50, skip: int = 0, cursor: Optional[str] = None) -> dict:
+    """A page of chat history in chronological order."""
 
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    chats = list(db.chats.find({"spaceId": space_id})
-                 .sort("createdAt", -1)
-                 .skip(skip)
-                 .limit(limit))
+    chats, cursor_next = page_or_400(
+        db.chats, {"spaceId": space_id}, CHAT_SORT, limit,
+        cursor=cursor, skip=skip
+    )
 
     # Reverse to chronological order
     chats.reverse()
@@ -1142,45 +1293,45 @@ async def get_chats(
         chat["_id"] = str(chat["_id"])
         chat["createdAt"] = chat["createdAt"].isoformat() if chat.get("createdAt") else None
 
-    return {"chats": chats, "count": len(chats)}
+    return {"chats": chats, "count": len(chats), "next_cursor": cursor_next}
 
-############################################
-# Stats & Admin
-############################################
-
-@app.get("/spaces/{space_id}/stats", tags=["Stats"])
-async def get_space_stats(
+@app.get("/spaces/{space_id}/chats", tags=["Chat"])
+async def get_chats(
     space_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(require_space_member),
+    limit: int = Query(50, ge=1, le=200),
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (older messages)")
 ):
-    """Get statistics for a study space."""
-
-    space = db.studyspaces.find_one({"_id": space_id})
-    if not space:
-        raise HTTPException(status_code=404, detail="Study space not found")
+    """Get chat history for a study space."""
+    return load_space_chats(space_id, limit, skip=skip, cursor=cursor)
 
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized")
+############################################
+# Stats & Admin
+############################################
 
-    # Get file count
-    file_count = db.files.count_documents({"spaceId": space_id})
+def load_space_stats(space_id: str) -> dict:
+    """Statistics for a study space."""
 
-    # Get chat count
-    chat_count = db.chats.count_documents({"spaceId": space_id})
+    space = db.studyspaces.find_one(
+        {"_id": space_id},
+        {"subject": 1, "topic": 1, "createdAt": 1}
+    ) or {}
 
-    # Get graph stats
-    graph_stats = {}
-    if rag_engine:
-        try:
-            graph_stats = rag_engine.get_space_stats(space_id)
-        except Exception as e:
-            graph_stats = {"error": str(e)}
+    # Counters are maintained on write; this is a single keyed lookup
+    stats = space_stats.get(space_id)
 
     return {
         "space_id": space_id,
-        "files": file_count,
-        "chats": chat_count,
-        "graph": graph_stats,
+        "files": stats.get("files", 0),
+        "chats": stats.get("chats", 0),
+        "graph": {
+            "chunks": stats.get("chunks", 0),
+            "concepts": stats.get("concepts", 0),
+            "relationships": stats.get("relationships", 0),
+            "space": space_id
+        },
+        "as_of": stats["updatedAt"].isoformat() if stats.get("updatedAt") else None,
         "space_info": {
             "subject": space.get("subject"),
             "topic": space.get("topic"),
@@ -1188,20 +1339,185 @@ async def get_space_stats(
         }
     }
 
+@app.get("/spaces/{space_id}/stats", tags=["Stats"])
+async def get_space_stats(
+    space_id: str,
+    current_user: dict = Depends(require_space_member)
+):
+    """Get statistics for a study space."""
+    return load_space_stats(space_id)
+
+def load_admin_stats() -> dict:
+    """Global counts from collection metadata, cached for ADMIN_STATS_TTL seconds."""
+    stats = admin_stats_cache.get("global")
+    if stats is None:
+        stats = global_counts(db)
+        admin_stats_cache.set("global", stats)
+    return dict(stats)
+
 @app.get("/admin/stats", tags=["Admin"])
-async def admin_stats():
+async def admin_stats(
+    current_user: dict = Depends(get_current_user),
+    breakdown: bool = Query(False, description="Include per-day uploads and chats"),
+    days: int = Query(30, ge=1, le=365)
+):
     """Admin statistics."""
-    user_count = db.users.count_documents({})
-    space_count = db.studyspaces.count_documents({})
-    file_count = db.files.count_documents({})
-    chat_count = db.chats.count_documents({})
+    stats = load_admin_stats()
+    if breakdown:
+        # Served from the stats_daily rollup, refreshed in the background
+        stats["daily"] = daily_breakdown(db, days)
+    return stats
+
+def require_metrics_access(request: Request, authorization: Optional[str] = Header(None)):
+    """Metrics are only available to allowlisted hosts or with the METRICS_TOKEN secret."""
+    if METRICS_TOKEN and authorization and hmac.compare_digest(
+        authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        return
+    if request.client and request.client.host in METRICS_ALLOWED_HOSTS:
+        return
+    raise HTTPException(status_code=403, detail="Metrics access denied")
+
+@app.get("/metrics", tags=["Admin"], include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+async def prometheus_metrics():
+    """Prometheus metrics in text exposition format."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/admin/cache", tags=["Admin"], dependencies=[Depends(get_current_user)])
+async def admin_cache_stats():
+    """Cache hit-rate statistics."""
+    return {"caches": cache_stats()}
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    """Profiling endpoints are only available with the PROFILE_TOKEN secret."""
+    if not profile_token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling access denied")
+
+@app.get("/admin/profiling", tags=["Admin"], dependencies=[Depends(require_profile_token)])
+async def get_profiling():
+    """Current profiling sample rate."""
+    return {"sample_rate": profile_sample_rate}
+
+@app.put("/admin/profiling", tags=["Admin"], dependencies=[Depends(require_profile_token)])
+async def set_profiling(sample_rate: float = Body(..., embed=True, ge=0, le=1)):
+    """Profile a random fraction of requests; 0 turns sampling off."""
+    global profile_sample_rate
+    profile_sample_rate = sample_rate
+    logger.info(f"Profiling sample rate set to {sample_rate}")
+    return {"sample_rate": profile_sample_rate}
+
+@app.get("/admin/profiles/{request_id}", tags=["Admin"], dependencies=[Depends(require_profile_token)])
+async def get_profile(
+    request_id: str,
+    format: str = Query("json", pattern="^(json|folded)$")
+):
+    """Stored profile of one request; format=folded returns flame-graph input."""
+    profile = profile_store.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(profile["folded"])
+    return profile
 
-    return {
-        "users": user_count,
-        "spaces": space_count,
-        "files": file_count,
-        "chats": chat_count
+############################################
+# Aggregated Views
+############################################
+
+DASHBOARD_SECTIONS = ("spaces", "stats", "admin")
+OVERVIEW_SECTIONS = ("space", "files", "chats", "stats", "users")
+
+
+def parse_fields(fields: Optional[str], allowed: tuple) -> List[str]:
+    """Parse a comma-separated field selection, defaulting to every section."""
+    if not fields:
+        return list(allowed)
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return selected
+
+
+async def gather_sections(loaders: Dict[str, Any]) -> dict:
+    """Run blocking loaders concurrently in the threadpool and collect their results.
+
+    A failing loader yields {"error": ...} for its section instead of failing
+    the whole response.
+    """
+    names = list(loaders)
+    results = await asyncio.gather(
+        *(asyncio.to_thread(loaders[name]) for name in names), return_exceptions=True
+    )
+
+    sections = {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Failed to load section {name}: {result}")
+            result = {"error": result.detail if isinstance(result, HTTPException) else str(result)}
+        sections[name] = result
+    return sections
+
+
+@app.get("/dashboard", tags=["Aggregated"])
+async def dashboard(
+    current_user: dict = Depends(get_current_user),
+    limit: int = Query(5, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of: spaces, stats, admin")
+):
+    """Everything the dashboard page needs in one round-trip."""
+    
+    selected = parse_fields(fields, DASHBOARD_SECTIONS)
+    
+    # Spaces are needed to know which stats to load
+    spaces = await asyncio.to_thread(load_spaces, current_user["_id"], limit)
+    
+    loaders = {}
+    if "stats" in selected:
+        loaders.update({
+            f"stats:{space['_id']}": (lambda sid=space["_id"]: load_space_stats(sid))
+            for space in spaces["spaces"]
+        })
+    if "admin" in selected:
+        loaders["admin"] = load_admin_stats
+    
+    results = await gather_sections(loaders)
+    
+    response = {}
+    if "spaces" in selected:
+        response.update(spaces)
+    if "stats" in selected:
+        response["stats"] = [results[f"stats:{space['_id']}"] for space in spaces["spaces"]]
+    if "admin" in selected:
+        response["admin"] = results["admin"]
+    
+    return response
+
+
+@app.get("/spaces/{space_id}/overview", tags=["Aggregated"])
+async def space_overview(
+    space_id: str,
+    current_user: dict = Depends(require_space_member),
+    chat_limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of: space, files, chats, stats, users")
+):
+    """Everything the study space page needs, behind a single membership check."""
+    
+    selected = parse_fields(fields, OVERVIEW_SECTIONS)
+    
+    loaders = {
+        "space": lambda: load_space(space_id),
+        "files": lambda: load_space_files(space_id),
+        "chats": lambda: load_space_chats(space_id, chat_limit),
+        "stats": lambda: load_space_stats(space_id),
+        "users": lambda: load_space_users(space_id),
     }
+    
+    return await gather_sections({name: loaders[name] for name in selected})
 
 ############################################
 # ERROR HANDLERS
@@ -1233,6 +1549,29 @@ async def general_exception_handler(request, exc):
 # STARTUP & SHUTDOWN
 ############################################
 
+def migrate_embedded_comments():
+    """One-off migration from posts.comments arrays to the comments collection."""
+    migrated = 0
+    for post in db.posts.find({"comments.0": {"$exists": True}}, {"comments": 1}):
+        for comment in post["comments"]:
+            comment.setdefault("_id", str(uuid.uuid4()))
+            comment["postId"] = post["_id"]
+            db.comments.replace_one({"_id": comment["_id"]}, comment, upsert=True)
+            migrated += 1
+        
+        # Recount from the collection so a re-run never double counts
+        db.posts.update_one(
+            {"_id": post["_id"]},
+            {
+                "$unset": {"comments": ""},
+                "$set": {"comment_count": db.comments.count_documents({"postId": post["_id"]})}
+            }
+        )
+    
+    if migrated:
+        logger.info(f"✅ Migrated {migrated} embedded comments")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Startup event handler."""
@@ -1246,22 +1585,57 @@ async def startup_event():
         db.users.create_index("email", unique=True)
         db.users.create_index("username", unique=True)
         db.studyspaces.create_index("users")
+        db.studyspaces.create_index([("users", 1), ("createdAt", -1), ("_id", -1)])
         db.files.create_index("spaceId")
+        db.files.create_index("uploadedAt")
         db.chats.create_index("spaceId")
+        db.chats.create_index([("spaceId", 1), ("createdAt", -1), ("_id", -1)])
+        db.chats.create_index("createdAt")
         
         # New indexes for posts feature
         db.postgroups.create_index("name", unique=True)
         db.postgroups.create_index("members")
         db.postgroups.create_index("is_public")
+        db.postgroups.create_index([("createdAt", -1), ("_id", -1)])
         db.posts.create_index("groupId")
         db.posts.create_index("userId")
-        db.posts.create_index([("groupId", 1), ("createdAt", -1)])
-        db.posts.create_index([("groupId", 1), ("upvotes", -1)])
+        db.posts.create_index([("groupId", 1), ("createdAt", -1), ("_id", -1)])
+        db.posts.create_index([("groupId", 1), ("upvotes", -1), ("_id", -1)])
+        db.posts.create_index([("groupId", 1), ("hot_score", -1), ("_id", -1)])
+        db.posts.create_index("createdAt")
+        db.comments.create_index([("postId", 1), ("createdAt", 1), ("_id", 1)])
+        db.comments.create_index([("postId", 1), ("parentCommentId", 1), ("createdAt", 1), ("_id", 1)])
+        vote_store.create_indexes()
+        space_stats.create_indexes()
         
         logger.info("✅ Database indexes created")
     except Exception as e:
         logger.warning(f"Error creating indexes: {e}")
 
+    # Move comments still embedded in post documents into their own collection
+    try:
+        migrate_embedded_comments()
+    except Exception as e:
+        logger.warning(f"Error migrating embedded comments: {e}")
+
+    # Periodically apply aggregated vote counters
+    background_tasks.append(asyncio.create_task(vote_store.run_flusher()))
+
+    # Periodically apply time decay to hot scores
+    background_tasks.append(asyncio.create_task(run_hot_score_refresher(db)))
+
+    # Periodically correct drift in space counters
+    background_tasks.append(asyncio.create_task(space_stats.run_reconciler()))
+
+    # Reload BM25 of spaces rebuilt by reindex.py
+    background_tasks.append(asyncio.create_task(space_stats.run_bm25_invalidator()))
+
+    # Keep per-day upload/chat rollups current
+    background_tasks.append(asyncio.create_task(run_rollup_refresher(db)))
+
+    # Record event-loop lag so blocking handlers show up in /metrics
+    background_tasks.append(asyncio.create_task(run_loop_lag_monitor()))
+
     logger.info("✅ Startup complete")
     
 
@@ -1270,9 +1644,14 @@ async def shutdown_event():
     """Shutdown event handler."""
     logger.info("Shutting down GraphRAG backend...")
 
+    for task in background_tasks:
+        task.cancel()
+
     try:
+        vote_store.flush()
         mongo_client.close()
         if rag_engine:
+            await rag_engine.aclose()
             rag_engine.close()
         logger.info("✅ Shutdown complete")
     except Exception as e:
@@ -1298,24 +1677,19 @@ async def shutdown_event():
 # StudySpace User Management Endpoints
 ############################################
 
-@app.get("/spaces/{space_id}/users", tags=["StudySpaces"])
-async def get_space_users(
-    space_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """Get all users in a study space."""
+def load_space_users(space_id: str) -> dict:
+    """Members of a study space."""
     
-    space = db.studyspaces.find_one({"_id": space_id})
+    space = db.studyspaces.find_one(
+        {"_id": space_id},
+        {"users": 1, "created_by": 1, "createdAt": 1}
+    )
     if not space:
         raise HTTPException(status_code=404, detail="Study space not found")
     
-    # Check if current user is in space
-    if current_user["_id"] not in space.get("users", []):
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
     # Get user details for all users in space
     user_ids = space.get("users", [])
-    users = list(db.users.find({"_id": {"$in": user_ids}}))
+    users = UserLoader(db, fields=("username", "email")).load_many(user_ids).values()
     
     # Format response
     formatted_users = []
@@ -1335,6 +1709,15 @@ async def get_space_users(
     }
 
 
+@app.get("/spaces/{space_id}/users", tags=["StudySpaces"])
+async def get_space_users(
+    space_id: str,
+    current_user: dict = Depends(require_space_member)
+):
+    """Get all users in a study space."""
+    return load_space_users(space_id)
+
+
 @app.post("/spaces/{space_id}/users", tags=["StudySpaces"])
 async def add_user_to_space(
     space_id: str,
@@ -1343,7 +1726,7 @@ async def add_user_to_space(
 ):
     """Add a user to study space by username or email."""
     
-    space = db.studyspaces.find_one({"_id": space_id})
+    space = db.studyspaces.find_one({"_id": space_id}, {"users": 1, "created_by": 1})
     if not space:
         raise HTTPException(status_code=404, detail="Study space not found")
     
@@ -1381,6 +1764,8 @@ async def add_user_to_space(
     if result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Failed to add user to space")
     
+    invalidate_membership(space_id, user_id)
+    
     logger.info(f"User {user_id} added to space {space_id} by {current_user['_id']}")
     
     return {
@@ -1402,7 +1787,7 @@ async def remove_user_from_space(
 ):
     """Remove a user from study space."""
     
-    space = db.studyspaces.find_one({"_id": space_id})
+    space = db.studyspaces.find_one({"_id": space_id}, {"users": 1, "created_by": 1})
     if not space:
         raise HTTPException(status_code=404, detail="Study space not found")
     
@@ -1427,6 +1812,8 @@ async def remove_user_from_space(
     if result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Failed to remove user from space")
     
+    invalidate_membership(space_id, user_id)
+    
     logger.info(f"User {user_id} removed from space {space_id} by {current_user['_id']}")
     
     return {
@@ -1443,7 +1830,7 @@ async def leave_space(
 ):
     """Leave a study space (remove yourself)."""
     
-    space = db.studyspaces.find_one({"_id": space_id})
+    space = db.studyspaces.find_one({"_id": space_id}, {"users": 1, "created_by": 1})
     if not space:
         raise HTTPException(status_code=404, detail="Study space not found")
     
@@ -1464,6 +1851,8 @@ async def leave_space(
     if result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Failed to leave space")
     
+    invalidate_membership(space_id, current_user["_id"])
+    
     logger.info(f"User {current_user['_id']} left space {space_id}")
     
     return {
@@ -1480,12 +1869,16 @@ async def leave_space(
 # Post Groups Endpoints
 ############################################
 
+GROUP_SORT = [("createdAt", -1), ("_id", -1)]
+
 @app.get("/groups", tags=["Posts"])
 async def list_groups(
     current_user: dict = Depends(get_current_user),
+    users: UserLoader = Depends(get_user_loader),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    public_only: bool = Query(False)
+    public_only: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """List post groups (discussion rooms)."""
     
@@ -1502,30 +1895,29 @@ async def list_groups(
             {"created_by": current_user["_id"]}
         ]
     
-    groups = list(db.postgroups.find(query)
-                  .sort("createdAt", -1)
-                  .skip(skip)
-                  .limit(limit))
+    groups, cursor_next = page_or_400(
+        db.postgroups, query, GROUP_SORT, limit,
+        cursor=cursor, skip=skip
+    )
+    
+    # Get user info for creators in one batch
+    users.prime(group.get("created_by") for group in groups)
     
-    # Get user info for creators
     for group in groups:
         group["_id"] = str(group["_id"])
         group["createdAt"] = group["createdAt"].isoformat() if group.get("createdAt") else None
         
         # Get creator info
-        creator = db.users.find_one({"_id": group.get("created_by")})
+        creator = users.summary(group.get("created_by"))
         if creator:
-            group["created_by_user"] = {
-                "id": creator["_id"],
-                "username": creator["username"]
-            }
+            group["created_by_user"] = creator
         
         # Check if current user is member
         group["is_member"] = current_user["_id"] in group.get("members", [])
         group["is_moderator"] = current_user["_id"] in group.get("moderators", [])
         group["is_creator"] = current_user["_id"] == group.get("created_by")
     
-    return {"groups": groups, "count": len(groups)}
+    return {"groups": groups, "count": len(groups), "next_cursor": cursor_next}
 
 
 @app.post("/groups", tags=["Posts"])
@@ -1598,22 +1990,17 @@ async def get_group(
     group["_id"] = str(group["_id"])
     group["createdAt"] = group["createdAt"].isoformat() if group.get("createdAt") else None
     
-    # Get creator info
-    creator = db.users.find_one({"_id": group.get("created_by")})
-    if creator:
-        group["created_by_user"] = {
-            "id": creator["_id"],
-            "username": creator["username"]
-        }
-    
-    # Get member info
+    # Creator, members and moderators are resolved in one batch
     member_ids = group.get("members", [])
     moderator_ids = group.get("moderators", [])
     
-    all_user_ids = list(set(member_ids + moderator_ids + [group.get("created_by")]))
-    users = list(db.users.find({"_id": {"$in": all_user_ids}}))
+    users = UserLoader(db, fields=("username", "email"))
+    user_map = users.load_many(set(member_ids + moderator_ids + [group.get("created_by")]))
     
-    user_map = {user["_id"]: user for user in users}
+    # Get creator info
+    creator = users.summary(group.get("created_by"))
+    if creator:
+        group["created_by_user"] = creator
     
     # Format members
     formatted_members = []
@@ -1720,13 +2107,30 @@ async def leave_group(
 # Posts Endpoints
 ############################################
 
+# Keyset sort orders for posts and comments (see pagination.py)
+POST_SORTS = {
+    "newest": [("createdAt", -1), ("_id", -1)],
+    "oldest": [("createdAt", 1), ("_id", 1)],
+    "popular": [("upvotes", -1), ("_id", -1)],
+    "hot": [("hot_score", -1), ("_id", -1)],
+}
+# hot_score and upvotes are rewritten by background refreshers and vote
+# flushes, so these orders page through a snapshot instead of keyset cursors
+SNAPSHOT_SORTS = {"hot", "popular"}
+post_snapshots = make_cache("post_snapshots", maxsize=1000, ttl=POST_SNAPSHOT_TTL)
+COMMENT_SORT = [("createdAt", 1), ("_id", 1)]
+COMMENT_THREAD_SORT = [("parentCommentId", 1), ("createdAt", 1), ("_id", 1)]
+
+
 @app.get("/groups/{group_id}/posts", tags=["Posts"])
 async def list_posts(
     group_id: str,
     current_user: dict = Depends(get_current_user),
+    users: UserLoader = Depends(get_user_loader),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    sort_by: str = Query("newest", enum=["newest", "oldest", "popular"])
+    sort_by: str = Query("newest", enum=["newest", "oldest", "popular", "hot"]),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """List posts in a group."""
     
@@ -1741,26 +2145,24 @@ async def list_posts(
             current_user["_id"] != group.get("created_by")):
             raise HTTPException(status_code=403, detail="Not authorized to access this group")
     
-    # Build sort order
-    sort_field = "createdAt"
-    sort_direction = -1  # Descending
-    
-    if sort_by == "oldest":
-        sort_direction = 1  # Ascending
-    elif sort_by == "popular":
-        sort_field = "upvotes"
-        sort_direction = -1
-    
-    # Query posts
-    posts = list(db.posts.find({"groupId": group_id})
-                 .sort(sort_field, sort_direction)
-                 .skip(skip)
-                 .limit(limit))
+    # Query posts (comment bodies never leave Mongo on list pages)
+    if sort_by in SNAPSHOT_SORTS:
+        try:
+            posts, cursor_next = paginate_snapshot(
+                db.posts, {"groupId": group_id}, POST_SORTS[sort_by], limit, post_snapshots,
+                cursor=cursor, projection={"comments": 0}, skip=skip, max_size=POST_SNAPSHOT_SIZE
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        posts, cursor_next = page_or_400(
+            db.posts, {"groupId": group_id}, POST_SORTS[sort_by], limit,
+            cursor=cursor, projection={"comments": 0}, skip=skip
+        )
     
-    # Get user info for posts
-    user_ids = set([post.get("userId") for post in posts])
-    users = list(db.users.find({"_id": {"$in": list(user_ids)}}))
-    user_map = {user["_id"]: user for user in users}
+    # Get user info and the current user's votes in one batch each
+    users.prime(post.get("userId") for post in posts)
+    my_votes = vote_store.user_votes(current_user["_id"], [post["_id"] for post in posts])
     
     # Format posts
     formatted_posts = []
@@ -1769,26 +2171,26 @@ async def list_posts(
         post["createdAt"] = post["createdAt"].isoformat() if post.get("createdAt") else None
         
         # Add user info
-        user = user_map.get(post.get("userId"))
-        if user:
-            post["author"] = {
-                "id": user["_id"],
-                "username": user["username"]
-            }
+        author = users.summary(post.get("userId"))
+        if author:
+            post["author"] = author
         
-        # Count comments
-        post["comment_count"] = len(post.get("comments", []))
+        # Comment count is denormalized on the post
+        post["comment_count"] = post.get("comment_count", 0)
         
-        # Check if current user has upvoted/downvoted
-        post["user_upvoted"] = False
-        post["user_downvoted"] = False
+        # Live counters and the current user's vote
+        post["upvotes"], post["downvotes"] = vote_store.live_counts(post)
+        post.pop(FLUSH_LOG_FIELD, None)
+        post["user_upvoted"] = my_votes.get(post["_id"]) == 1
+        post["user_downvoted"] = my_votes.get(post["_id"]) == -1
         
         formatted_posts.append(post)
     
     return {
         "group_id": group_id,
         "posts": formatted_posts,
-        "count": len(formatted_posts)
+        "count": len(formatted_posts),
+        "next_cursor": cursor_next
     }
 
 
@@ -1831,7 +2233,8 @@ async def create_post(
         "files": files,
         "upvotes": 0,
         "downvotes": 0,
-        "comments": [],
+        "comment_count": 0,
+        "hot_score": 0.0,
         "is_pinned": False,
         "createdAt": datetime.now(timezone.utc)
     }
@@ -1861,9 +2264,9 @@ async def get_post(
     post_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get a single post with details."""
+    """Get a single post with details and the first page of comments."""
     
-    post = db.posts.find_one({"_id": post_id})
+    post = db.posts.find_one({"_id": post_id}, {"comments": 0})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -1882,8 +2285,17 @@ async def get_post(
     post["_id"] = str(post["_id"])
     post["createdAt"] = post["createdAt"].isoformat() if post.get("createdAt") else None
     
+    # First page of comments, oldest first
+    comments, comments_cursor = page_or_400(
+        db.comments, {"postId": post_id}, COMMENT_SORT, COMMENT_PAGE_SIZE
+    )
+    
+    # Author and comment authors are resolved in one batch
+    users = UserLoader(db, fields=("username", "email"))
+    users.prime([post.get("userId")] + [comment.get("userId") for comment in comments])
+    
     # Get author info
-    author = db.users.find_one({"_id": post.get("userId")})
+    author = users.load(post.get("userId"))
     if author:
         post["author"] = {
             "id": author["_id"],
@@ -1899,78 +2311,124 @@ async def get_post(
     }
     
     # Format comments with user info
-    comments = post.get("comments", [])
-    if comments:
-        comment_user_ids = [comment.get("userId") for comment in comments if comment.get("userId")]
-        comment_users = list(db.users.find({"_id": {"$in": comment_user_ids}}))
-        comment_user_map = {user["_id"]: user for user in comment_users}
-        
-        for comment in comments:
-            user = comment_user_map.get(comment.get("userId"))
-            if user:
-                comment["author"] = {
-                    "id": user["_id"],
-                    "username": user["username"]
-                }
-            comment["createdAt"] = comment.get("createdAt", datetime.now(timezone.utc)).isoformat()
+    for comment in comments:
+        comment_author = users.summary(comment.get("userId"))
+        if comment_author:
+            comment["author"] = comment_author
+        comment["createdAt"] = comment.get("createdAt", datetime.now(timezone.utc)).isoformat()
+    
+    post["comments"] = comments
+    post["comment_count"] = post.get("comment_count", 0)
+    
+    my_vote = vote_store.user_votes(current_user["_id"], [post_id]).get(post_id)
+    post["upvotes"], post["downvotes"] = vote_store.live_counts(post)
+    post.pop(FLUSH_LOG_FIELD, None)
+    post["user_upvoted"] = my_vote == 1
+    post["user_downvoted"] = my_vote == -1
+    post["comments_next_cursor"] = comments_cursor
     
     return post
 
 
-@app.post("/posts/{post_id}/upvote", tags=["Posts"])
-async def upvote_post(
+@app.get("/posts/{post_id}/comments", tags=["Posts"])
+async def list_comments(
     post_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    users: UserLoader = Depends(get_user_loader),
+    parent_id: Optional[str] = Query(None, description="Only replies to this comment"),
+    top_level: bool = Query(False, description="Only comments without a parent"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(COMMENT_PAGE_SIZE, ge=1, le=200)
 ):
-    """Upvote a post."""
+    """List comments on a post with cursor pagination."""
     
-    post = db.posts.find_one({"_id": post_id})
+    post = db.posts.find_one({"_id": post_id}, {"groupId": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Check if already upvoted (simplified - in real app, track per user)
-    # For now, just increment
-    result = db.posts.update_one(
-        {"_id": post_id},
-        {"$inc": {"upvotes": 1}}
+    group = db.postgroups.find_one(
+        {"_id": post.get("groupId")},
+        {"is_public": 1, "members": 1, "moderators": 1, "created_by": 1}
     )
+    if not group:
+        raise HTTPException(status_code=404, detail="Associated group not found")
     
-    if result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to upvote post")
+    # Check access for private groups
+    if not group.get("is_public", True):
+        if (current_user["_id"] not in group.get("members", []) and
+            current_user["_id"] not in group.get("moderators", []) and
+            current_user["_id"] != group.get("created_by")):
+            raise HTTPException(status_code=403, detail="Not authorized to access this post")
+    
+    query = {"postId": post_id}
+    sort = COMMENT_SORT
+    if parent_id or top_level:
+        query["parentCommentId"] = parent_id
+        sort = COMMENT_THREAD_SORT
+    
+    comments, cursor_next = page_or_400(db.comments, query, sort, limit, cursor=cursor)
+    
+    users.prime(comment.get("userId") for comment in comments)
+    for comment in comments:
+        author = users.summary(comment.get("userId"))
+        if author:
+            comment["author"] = author
+        comment["createdAt"] = comment["createdAt"].isoformat() if comment.get("createdAt") else None
     
     return {
-        "message": "Post upvoted",
         "post_id": post_id,
-        "upvotes": post.get("upvotes", 0) + 1
+        "comments": comments,
+        "count": len(comments),
+        "next_cursor": cursor_next
     }
 
 
-@app.post("/posts/{post_id}/downvote", tags=["Posts"])
-async def downvote_post(
-    post_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """Downvote a post."""
-    
-    post = db.posts.find_one({"_id": post_id})
+def apply_vote(post_id: str, user_id: str, value: int) -> dict:
+    """Toggle a user's vote on a post and return the live counters."""
+    post = db.posts.find_one({"_id": post_id}, COUNTER_PROJECTION)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    result = db.posts.update_one(
-        {"_id": post_id},
-        {"$inc": {"downvotes": 1}}
-    )
-    
-    if result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to downvote post")
+    try:
+        user_vote = vote_store.cast(post_id, user_id, value)
+    except VoteConflict:
+        raise HTTPException(status_code=409, detail="Vote changed concurrently, please retry")
     
+    upvotes, downvotes = vote_store.live_counts(post)
     return {
-        "message": "Post downvoted",
         "post_id": post_id,
-        "downvotes": post.get("downvotes", 0) + 1
+        "upvotes": upvotes,
+        "downvotes": downvotes,
+        "user_vote": user_vote,
+        "user_upvoted": user_vote == 1,
+        "user_downvoted": user_vote == -1
     }
 
 
+@app.post("/posts/{post_id}/upvote", tags=["Posts"])
+async def upvote_post(
+    post_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Upvote a post; upvoting again removes the vote."""
+    
+    result = apply_vote(post_id, current_user["_id"], 1)
+    result["message"] = "Post upvoted" if result["user_upvoted"] else "Upvote removed"
+    return result
+
+
+@app.post("/posts/{post_id}/downvote", tags=["Posts"])
+async def downvote_post(
+    post_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Downvote a post; downvoting again removes the vote."""
+    
+    result = apply_vote(post_id, current_user["_id"], -1)
+    result["message"] = "Post downvoted" if result["user_downvoted"] else "Downvote removed"
+    return result
+
+
 @app.post("/posts/{post_id}/comments", tags=["Posts"])
 async def add_comment(
     post_id: str,
@@ -1979,7 +2437,7 @@ async def add_comment(
 ):
     """Add a comment to a post."""
     
-    post = db.posts.find_one({"_id": post_id})
+    post = db.posts.find_one({"_id": post_id}, {"_id": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -2002,14 +2460,13 @@ async def add_comment(
         "createdAt": datetime.now(timezone.utc)
     }
     
-    # Add comment to post
-    result = db.posts.update_one(
+    # Comments live in their own collection; the post only keeps a count
+    db.comments.insert_one(comment)
+    db.posts.update_one(
         {"_id": post_id},
-        {"$push": {"comments": comment}}
+        {"$inc": {"comment_count": 1}}
     )
-    
-    if result.modified_count == 0:
-        raise HTTPException(status_code=500, detail="Failed to add comment")
+    refresh_hot_scores(db, [post_id])
     
     logger.info(f"Comment added to post {post_id} by {current_user['_id']}")
     
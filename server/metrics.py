@@ -0,0 +1,150 @@
+import time, asyncio
+from contextlib import contextmanager
+from typing import Dict, Optional
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from cache import cache_stats
+
+
+############################################
+# REGISTRY
+############################################
+
+REGISTRY = CollectorRegistry()
+
+# Buckets from 5ms to 2min cover both in-memory stages and LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+RAG_STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each RAGEngine stage",
+    ["stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+DB_CALLS = Counter(
+    "db_calls_total", "Database calls by backend and operation",
+    ["backend", "operation"], registry=REGISTRY,
+)
+DB_ERRORS = Counter(
+    "db_errors_total", "Failed database calls by backend and operation",
+    ["backend", "operation"], registry=REGISTRY,
+)
+LLM_CALLS = Counter(
+    "llm_calls_total", "LLM API calls by outcome",
+    ["outcome"], registry=REGISTRY,
+)
+RERANK_DECISIONS = Counter(
+    "rerank_decisions_total", "Cross-encoder runs vs skips on a decisive fused ranking",
+    ["decision"], registry=REGISTRY,
+)
+EMBEDDED_CHUNKS = Counter(
+    "embedded_chunks_total", "Chunks embedded, by single-process or bulk pool mode",
+    ["mode"], registry=REGISTRY,
+)
+NEO4J_TRANSACTION_SECONDS = Histogram(
+    "neo4j_transaction_seconds", "Neo4j managed transaction latency, retries included",
+    ["operation"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+NEO4J_ACQUIRE_SECONDS = Histogram(
+    "neo4j_acquire_seconds", "Wait for a pooled Neo4j connection before the first attempt",
+    buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+NEO4J_RETRIES = Counter(
+    "neo4j_transaction_retries_total", "Neo4j transactions re-run after a transient error",
+    ["operation"], registry=REGISTRY,
+)
+NEO4J_SESSIONS_IN_USE = Gauge(
+    "neo4j_sessions_in_use", "Neo4j sessions currently holding a pooled connection",
+    ["driver"], registry=REGISTRY,
+)
+NEO4J_POOL_MAX_SIZE = Gauge(
+    "neo4j_pool_max_size", "Configured Neo4j connection pool size",
+    ["driver"], registry=REGISTRY,
+)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping probe",
+    buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+
+############################################
+# TIMERS
+############################################
+
+
+@contextmanager
+def stage_timer(stage: str, record: Optional[Dict[str, float]] = None):
+    """Time a block into rag_stage_seconds; optionally accumulate seconds into record[stage]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        RAG_STAGE_SECONDS.labels(stage).observe(elapsed)
+        if record is not None:
+            record[stage] = record.get(stage, 0.0) + elapsed
+
+
+def count_db_call(backend: str, operation: str):
+    """Count one database round-trip."""
+    DB_CALLS.labels(backend, operation).inc()
+
+
+async def run_loop_lag_monitor(interval: float = 0.1):
+    """Background task measuring event-loop stalls caused by blocking handlers."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+############################################
+# MONGO COMMAND LISTENER
+############################################
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """Counts every command the driver sends; pass to MongoClient(event_listeners=...)."""
+
+    def started(self, event):
+        DB_CALLS.labels("mongo", event.command_name).inc()
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        DB_ERRORS.labels("mongo", event.command_name).inc()
+
+############################################
+# CACHE COLLECTOR
+############################################
+
+
+class CacheCollector:
+    """Exports cache hit/miss counters from cache.cache_stats() at scrape time."""
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries held in process", labels=["cache"])
+
+        for name, stats in cache_stats().items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            if "size" in stats:
+                size.add_metric([name], stats["size"])
+
+        yield hits
+        yield misses
+        yield size
+
+
+REGISTRY.register(CacheCollector())
+
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric; returns (body, content_type)."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -119,7 +119,8 @@ class Post(BaseModel):
     files: List[str] = []
     upvotes: int = Field(default=0, ge=0)
     downvotes: int = Field(default=0, ge=0)
-    comments: List[Dict[str, Any]] = []
+    comment_count: int = Field(default=0, ge=0)  # Comments live in the comments collection
+    hot_score: float = Field(default=0.0)  # Maintained by ranking.py
     tags: List[str] = Field(default_factory=list)
     is_pinned: bool = Field(default=False)
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
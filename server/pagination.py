@@ -0,0 +1,125 @@
+import uuid, base64
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from bson import json_util
+
+
+############################################
+# CURSOR ENCODING
+############################################
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode sort-key values into an opaque, URL-safe cursor."""
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+    if not isinstance(values, dict):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+############################################
+# KEYSET QUERIES
+############################################
+
+# Sort specification: [(field, direction), ...] with direction 1 or -1,
+# ending in a unique tiebreaker such as _id.
+SortSpec = Sequence[Tuple[str, int]]
+
+
+def keyset_filter(sort: SortSpec, cursor: Optional[str]) -> Dict[str, Any]:
+    """Build the filter selecting documents strictly after the cursor position.
+
+    For sort [(a, -1), (_id, -1)] this yields
+    {"$or": [{a: {"$lt": va}}, {a: va, _id: {"$lt": vid}}]}.
+    """
+    if not cursor:
+        return {}
+
+    values = decode_cursor(cursor)
+    if any(field not in values for field, _ in sort):
+        raise InvalidCursor("Cursor does not match this listing")
+
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {prev: values[prev] for prev, _ in sort[:i]}
+        branch[field] = {"$lt" if direction < 0 else "$gt": values[field]}
+        branches.append(branch)
+
+    return {"$or": branches}
+
+
+def next_cursor(docs: List[dict], sort: SortSpec, limit: int) -> Optional[str]:
+    """Cursor for the page after docs, or None when docs was the last page."""
+    if len(docs) < limit or not docs:
+        return None
+
+    last = docs[-1]
+    return encode_cursor({field: last.get(field) for field, _ in sort})
+
+
+def paginate(collection, query: Dict[str, Any], sort: SortSpec, limit: int,
+             cursor: Optional[str] = None, projection: Optional[Dict[str, Any]] = None,
+             skip: int = 0):
+    """Fetch one page; returns (docs, next_cursor).
+
+    A cursor takes precedence over skip, which is kept for older clients.
+    """
+    after = keyset_filter(sort, cursor)
+    if after:
+        query = {"$and": [query, after]} if query else after
+        skip = 0
+
+    docs = list(collection.find(query, projection).sort(list(sort)).skip(skip).limit(limit))
+    return docs, next_cursor(docs, sort, limit)
+
+############################################
+# SNAPSHOT QUERIES
+############################################
+#
+# Keyset cursors assume sort keys do not change between pages. For orders
+# over fields rewritten in the background (hot_score, vote counters) the
+# first page instead stores the ranked ids, and later pages slice that list.
+
+
+def paginate_snapshot(collection, query: Dict[str, Any], sort: SortSpec, limit: int, snapshots,
+                      cursor: Optional[str] = None, projection: Optional[Dict[str, Any]] = None,
+                      skip: int = 0, max_size: int = 1000):
+    """Fetch one page of a frozen ordering; returns (docs, next_cursor).
+
+    `snapshots` is a cache (see cache.py) holding the ranked ids of the first
+    `max_size` matches under a snapshot id. Posts deleted since the snapshot
+    are dropped from their page; new ones appear only in a fresh listing.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if set(values) != {"snapshot", "offset"}:
+            raise InvalidCursor("Cursor does not match this listing")
+        snapshot_id, offset = values["snapshot"], values["offset"]
+        ids = snapshots.get(snapshot_id)
+        if ids is None:
+            raise InvalidCursor("Cursor expired, reload the first page")
+    else:
+        ids = [doc["_id"] for doc in collection.find(query, {"_id": 1}).sort(list(sort)).limit(max_size)]
+        snapshot_id, offset = uuid.uuid4().hex, skip
+        snapshots.set(snapshot_id, ids)
+
+    page_ids = ids[offset:offset + limit]
+    found = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": page_ids}}, projection)}
+    docs = [found[_id] for _id in page_ids if _id in found]
+
+    end = offset + limit
+    cursor_next = encode_cursor({"snapshot": snapshot_id, "offset": end}) if end < len(ids) else None
+    return docs, cursor_next
@@ -0,0 +1,99 @@
+import os, sys, time, threading, logging
+from collections import Counter
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+# Requests carrying X-Profile-Token: <PROFILE_TOKEN> are always profiled
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+
+# Fraction of all requests profiled at random; adjustable at runtime
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_MAX_DEPTH = 128
+
+############################################
+# SAMPLING PROFILER
+############################################
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProcessSamplingProfiler:
+    """Wall-clock sampling profiler for every thread in the process.
+
+    A daemon thread snapshots all other threads' stacks every `interval`
+    seconds and counts identical stacks, each rooted at its thread's name.
+    Nothing is hooked into the interpreter, so the profiled code runs at full
+    speed between samples. The result is in folded-stack format ("outer;inner;
+    leaf count"), which flamegraph.pl, speedscope and inferno read directly.
+
+    Samples cover the whole process, not one request: work a request hands to
+    worker threads (asyncio.to_thread) is included, but so is anything other
+    requests and background tasks run in the same window.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def folded(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame count" line per distinct stack."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "scope": "process",
+            "samples": sum(self.samples.values()),
+            "interval": self.interval,
+            "duration_seconds": self.duration,
+        }
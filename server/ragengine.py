@@ -1,14 +1,15 @@
-import os, json, requests, logging, hashlib
+import os, re, json, time, asyncio, requests, logging, hashlib, threading
 import numpy as np
 from pypdf import PdfReader
 import easyocr
-from sentence_transformers import SentenceTransformer, CrossEncoder
 from rank_bm25 import BM25Okapi
-from neo4j import GraphDatabase
-from neo4j_graphrag.retrievers import VectorRetriever
-from neo4j_graphrag.embeddings import SentenceTransformerEmbeddings
 from typing import List, Dict, Any, Optional
 from rank_bm25 import BM25Okapi
+from metrics import stage_timer, RERANK_DECISIONS, EMBEDDED_CHUNKS
+from cache import make_cache
+from inference import load_embedder, load_reranker
+from graphstore import GraphStore
+from graphschema import migrate
 
 
 # Set up logging
@@ -19,8 +20,110 @@ logger = logging.getLogger(__name__)
 # CONFIG
 ############################################
 
-TOP_K = 5
-CHUNK_SIZE = 400
+# Defaults for production; benchmarks/retrieval_eval.py sweeps alternatives
+TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "400"))
+
+# Candidate sources used by each retrieval mode
+RETRIEVAL_SOURCES = {
+    "hybrid": ("bm25", "vector", "graph"),
+    "bm25": ("bm25",),
+    "vector": ("vector",),
+    "graph": ("graph",),
+}
+RETRIEVAL_MODES = tuple(RETRIEVAL_SOURCES)
+
+# Concept-graph retrieval: seed concepts matched in the fulltext index are
+# expanded along RELATED_TO edges, each hop scaled by decay * s / (s + 1)
+# where s is the edge strength
+GRAPH_SEED_CONCEPTS = int(os.getenv("RAG_GRAPH_SEED_CONCEPTS", "5"))
+GRAPH_HOPS = int(os.getenv("RAG_GRAPH_HOPS", "2"))
+GRAPH_HOP_DECAY = float(os.getenv("RAG_GRAPH_HOP_DECAY", "0.5"))
+
+# Rank fusion: "rrf" (reciprocal rank) or "weighted" (min-max normalised scores)
+FUSION_METHOD = os.getenv("RAG_FUSION", "rrf")
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+FUSION_WEIGHTS = {"bm25": 1.0, "vector": 1.0, "graph": 1.0}
+
+# Chunks passed to the LLM as context
+ANSWER_CONTEXT = 3
+
+# Skip the cross-encoder when the fused top ANSWER_CONTEXT chunks lead the
+# next candidate by at least this fraction of the top score (<= 0 disables)
+RERANK_SKIP_MARGIN = float(os.getenv("RAG_RERANK_SKIP_MARGIN", "0.25"))
+
+# Chunk embedding: sorted-by-length batches; at or above BULK_EMBED_THRESHOLD
+# chunks a pool of BULK_EMBED_PROCESSES worker processes is used
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+BULK_EMBED_THRESHOLD = int(os.getenv("BULK_EMBED_THRESHOLD", "512"))
+BULK_EMBED_PROCESSES = int(os.getenv("BULK_EMBED_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+# Cross-encoder scores keyed by "<space>:<normalized query hash>:<chunk_id>"
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", "86400"))
+
+# Replies when retrieval or the LLM call comes up empty
+NO_DOCUMENTS_ANSWER = (
+    "I couldn't find relevant information in the uploaded documents. "
+    "Please try asking about something else or upload more documents."
+)
+NO_CONTEXT_ANSWER = "I couldn't find relevant information to answer your question."
+ANSWER_ERROR = "I encountered an error while processing your question. Please try again."
+
+QUERY_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "explain",
+    "for", "from", "how", "i", "in", "is", "it", "me", "of", "on", "or", "the",
+    "to", "what", "when", "where", "which", "who", "why", "with",
+}
+
+############################################
+# RANK FUSION
+############################################
+
+
+def fuse(ranked: Dict[str, List[Dict[str, Any]]], method: str = FUSION_METHOD) -> List[Dict[str, Any]]:
+    """Merge per-source ranked candidates into one list keyed by chunk_id.
+
+    Each candidate keeps the fused "score" plus the rank and raw score it
+    had in every source that returned it. Weighted fusion min-max normalizes
+    each source, so a source whose hits all score the same (including a
+    single hit) contributes 0 to them.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for source, hits in ranked.items():
+        weight = FUSION_WEIGHTS.get(source, 1.0)
+        if method == "weighted" and hits:
+            raw = [hit["score"] for hit in hits]
+            low, span = min(raw), (max(raw) - min(raw)) or 1.0
+
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["chunk_id"], {
+                "chunk_id": hit["chunk_id"], "text": hit["text"], "score": 0.0, "sources": {}
+            })
+            entry["sources"][source] = {"rank": rank, "score": hit["score"]}
+            if method == "weighted":
+                entry["score"] += weight * (hit["score"] - low) / span
+            else:
+                entry["score"] += weight / (RRF_K + rank)
+
+    return sorted(fused.values(), key=lambda c: c["score"], reverse=True)
+
+
+def is_decisive(candidates: List[Dict[str, Any]], margin: float = RERANK_SKIP_MARGIN) -> bool:
+    """Heuristic: whether the fused ranking is confident enough to skip reranking.
+
+    True when the score gap at the context cutoff is at least `margin` of the
+    top score. This is not a guarantee: the cross-encoder can still reorder
+    chunks across the cutoff. Fused scores also understate agreement under
+    weighted fusion, where a source with a single hit contributes 0.
+    """
+    if margin <= 0:
+        return False
+    if len(candidates) <= ANSWER_CONTEXT:
+        return True
+    top = candidates[0]["score"]
+    gap = candidates[ANSWER_CONTEXT - 1]["score"] - candidates[ANSWER_CONTEXT]["score"]
+    return top > 0 and gap / top >= margin
 
 ############################################
 # RAG ENGINE CLASS
@@ -30,27 +133,38 @@ CHUNK_SIZE = 400
 class RAGEngine:
     """Class-based RAG engine to avoid global state management issues."""
 
-    def __init__(self, uri: str, user: str, password: str):
-        """Initialize RAG Engine with Neo4j connection."""
-        logger.info(f"Initializing RAG Engine with Neo4j at {uri}")
+    def __init__(self, uri: Optional[str] = None, user: Optional[str] = None,
+                 password: Optional[str] = None, driver=None, embedder=None,
+                 reranker=None, ocr_reader=None, chunk_size: int = CHUNK_SIZE):
+        """Initialize RAG Engine with Neo4j connection.
+
+        A ready driver or models can be passed in instead (benchmarks use
+        in-memory stand-ins); anything not given is built as usual.
+        """
+        logger.info(f"Initializing RAG Engine with Neo4j at {uri or 'injected driver'}")
 
         # Initialize models
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
-        self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-        self.ocr_reader = easyocr.Reader(["en"], gpu=False)
-
-        # Initialize Neo4j driver
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-
-        # Initialize retriever
-        graph_embedder = SentenceTransformerEmbeddings("all-MiniLM-L6-v2")
-        self.retriever = VectorRetriever(
-            self.driver,
-            index_name="chunk_embedding_index",
-            embedder=graph_embedder,
-            return_properties=["text", "space"],
+        self.embedder = embedder or load_embedder()
+        self.reranker = reranker or load_reranker()
+        self._ocr_reader = ocr_reader  # Loaded on first image upload
+        self.chunk_size = chunk_size
+
+        # Neo4j access goes through managed transactions in GraphStore
+        self.graph = GraphStore(uri, user, password, driver=driver)
+
+        # Chunk ids hash their content, so cached scores never go stale; a
+        # per-process cache avoids a network round-trip per pair
+        self.score_cache = make_cache(
+            "rerank_scores", maxsize=RERANK_CACHE_SIZE, ttl=RERANK_CACHE_TTL, shared=False
         )
 
+        # Multi-process embedding pool, started on the first bulk ingestion
+        self._embed_pool = None
+        self._embed_pool_lock = threading.Lock()
+        # The pool's input/output queues are shared and every encode() numbers
+        # its chunks from 0, so concurrent calls could read each other's results
+        self._embed_pool_busy = threading.Lock()
+
         # Space-aware BM25 storage (maps space_id -> BM25 instance)
         self.space_bm25: Dict[str, BM25Okapi] = {}
         self.space_documents: Dict[str, List[str]] = {}
@@ -60,30 +174,18 @@ class RAGEngine:
 
         logger.info("✅ RAG Engine initialized successfully")
 
+    @property
+    def ocr_reader(self):
+        """EasyOCR reader, created lazily since most uploads are not images."""
+        if self._ocr_reader is None:
+            self._ocr_reader = easyocr.Reader(["en"], gpu=False)
+        return self._ocr_reader
+
     def _create_indexes(self):
-        """Create necessary Neo4j indexes."""
+        """Apply pending Neo4j schema migrations (indexes and constraints)."""
         try:
-            with self.driver.session() as session:
-                # Create vector index for chunks
-                session.run(
-                    """
-                CREATE VECTOR INDEX chunk_embedding_index IF NOT EXISTS
-                FOR (c:Chunk) ON (c.embedding)
-                OPTIONS {indexConfig: {
-                    `vector.dimensions`: 384,
-                    `vector.similarity_function`: 'cosine'
-                }}
-                """
-                )
-
-                # Create indexes for space filtering
-                session.run(
-                    "CREATE INDEX space_index IF NOT EXISTS FOR (c:Chunk) ON (c.space)"
-                )
-                session.run(
-                    "CREATE INDEX concept_space_index IF NOT EXISTS FOR (c:Concept) ON (c.space)"
-                )
-                logger.info("✅ Indexes created/verified")
+            migrate(self.graph)
+            logger.info("✅ Indexes created/verified")
         except Exception as e:
             logger.warning(f"Index creation warning: {e}")
 
@@ -97,8 +199,8 @@ class RAGEngine:
             return []
         words = text.split()
         return [
-            " ".join(words[i : i + CHUNK_SIZE])
-            for i in range(0, len(words), CHUNK_SIZE)
+            " ".join(words[i : i + self.chunk_size])
+            for i in range(0, len(words), self.chunk_size)
         ]
 
     def read_pdf(self, path: str) -> str:
@@ -130,6 +232,18 @@ class RAGEngine:
             logger.error(f"Error reading text file {path}: {e}")
             return ""
 
+    def read_file(self, path: str) -> Optional[str]:
+        """Extract text based on file type, or None if the type is unsupported."""
+        lowered = path.lower()
+        with stage_timer("read_file"):
+            if lowered.endswith(".pdf"):
+                return self.read_pdf(path)
+            if lowered.endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp")):
+                return self.read_image(path)
+            if lowered.endswith(".txt"):
+                return self.read_txt(path)
+        return None
+
     ############################################
     # LLM INTERFACE
     ############################################
@@ -246,82 +360,101 @@ class RAGEngine:
         content = f"{space}_{chunk}"
         return hashlib.sha256(content.encode()).hexdigest()[:16]
 
-    def insert_graph(self, chunk: str, embedding: List[float], space: str, llm_func):
-        """Insert chunk and extracted concepts into Neo4j graph."""
-        if not chunk or not chunk.strip():
-            return
+    def insert_graph(self, chunk: str, embedding: List[float], space: str, llm_func,
+                     timings: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+        """Insert chunk and extracted concepts into Neo4j graph.
 
+        Returns how many chunk, concept and RELATED_TO entities were created,
+        so callers can maintain space statistics without recounting. Stage
+        durations are added to `timings` when given. Errors are logged and
+        count as nothing created; use write_chunk to have them raised.
+        """
         try:
-            # Extract concepts
-            concepts_data = self.extract_concepts(chunk, llm_func)
-
-            chunk_id = self._generate_chunk_id(chunk, space)
-
-            with self.driver.session() as session:
-                # Create chunk node
-                session.run(
-                    """
-                    CREATE (c:Chunk {
-                        text: $text,
-                        embedding: $embedding,
-                        space: $space,
-                        chunk_id: $chunk_id
-                    })
-                """,
-                    text=chunk,
-                    embedding=embedding,  # Now this is a Python list, not tensor
-                    space=space,
-                    chunk_id=chunk_id,
-                )
-
-                # Create concept nodes and relationships
-                for concept_name in concepts_data["concepts"]:
-                    if concept_name:
-                        session.run(
-                            """
-                            MERGE (concept:Concept {name: $name, space: $space})
-                            ON CREATE SET concept.created_at = timestamp()
-                        """,
-                            name=concept_name,
-                            space=space,
-                        )
-
-                        # Link concept to chunk
-                        session.run(
-                            """
-                            MATCH (concept:Concept {name: $concept_name, space: $space})
-                            MATCH (chunk:Chunk {chunk_id: $chunk_id})
-                            MERGE (concept)-[:EXPLAINED_BY]->(chunk)
-                        """,
-                            concept_name=concept_name,
-                            space=space,
-                            chunk_id=chunk_id,
-                        )
-
-                # Create prerequisite relationships
-                for edge in concepts_data["edges"]:
-                    if len(edge) >= 3:
-                        source, rel, target = edge[0], edge[1], edge[2]
-
-                        session.run(
-                            """
-                            MATCH (a:Concept {name: $source, space: $space})
-                            MATCH (b:Concept {name: $target, space: $space})
-                            MERGE (a)-[r:RELATED_TO {type: $rel}]->(b)
-                            SET r.strength = coalesce(r.strength, 0) + 1
-                        """,
-                            source=source,
-                            target=target,
-                            rel=rel,
-                            space=space,
-                        )
-
+            return self.write_chunk(chunk, embedding, space, llm_func, timings)
         except Exception as e:
             logger.error(f"Error inserting graph data: {e}")
             # Log the embedding type for debugging
             logger.debug(
                 f"Embedding type: {type(embedding)}, first few values: {embedding[:3] if embedding else 'None'}"
             )
+            return {"chunks": 0, "concepts": 0, "relationships": 0}
+
+    def write_chunk(self, chunk: str, embedding: List[float], space: str, llm_func,
+                    timings: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+        """insert_graph that raises when the graph write fails."""
+        created = {"chunks": 0, "concepts": 0, "relationships": 0}
+        if not chunk or not chunk.strip():
+            return created
+
+        # Chunk ids hash space and text, so a stored id means this exact
+        # chunk was already written along with its concepts
+        chunk_id = self._generate_chunk_id(chunk, space)
+        if self.graph.has_chunk(chunk_id):
+            return created
+
+        # Extract concepts
+        with stage_timer("extract_concepts", timings):
+            concepts_data = self.extract_concepts(chunk, llm_func)
+
+        with stage_timer("graph_write", timings):
+            return self.graph.insert_chunk(
+                chunk_id, chunk, embedding, space,
+                concepts_data["concepts"], concepts_data["edges"],
+            )
+
+    ############################################
+    # EMBEDDING
+    ############################################
+
+    def _get_embed_pool(self):
+        """Multi-process pool of the embedder, or None if it cannot run one."""
+        if BULK_EMBED_PROCESSES < 2 or not hasattr(self.embedder, "start_multi_process_pool"):
+            return None
+        with self._embed_pool_lock:
+            if self._embed_pool is None:
+                logger.info(f"Starting embedding pool with {BULK_EMBED_PROCESSES} processes")
+                self._embed_pool = self.embedder.start_multi_process_pool(["cpu"] * BULK_EMBED_PROCESSES)
+            return self._embed_pool
+
+    def embed_chunks(self, chunks: List[str], timings: Optional[Dict[str, float]] = None) -> List[List[float]]:
+        """Embed chunks as Python lists for Neo4j.
+
+        Chunks are sorted by length so each batch pads to similar sizes, and
+        large ingestions are spread over a process pool, one call at a time.
+        """
+        if not chunks:
+            return []
+
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+        ordered = [chunks[i] for i in order]
+
+        pool = self._get_embed_pool() if len(chunks) >= BULK_EMBED_THRESHOLD else None
+        mode = "bulk" if pool else "single"
+        start = time.perf_counter()
+        with stage_timer("embed", timings):
+            if pool:
+                with self._embed_pool_busy:
+                    embeddings = self.embedder.encode(
+                        ordered, pool=pool, batch_size=EMBED_BATCH_SIZE,
+                        chunk_size=max(EMBED_BATCH_SIZE, len(ordered) // (BULK_EMBED_PROCESSES * 4)),
+                        convert_to_tensor=False,
+                    )
+            else:
+                embeddings = self.embedder.encode(ordered, batch_size=EMBED_BATCH_SIZE, convert_to_tensor=False)
+        elapsed = time.perf_counter() - start
+        EMBEDDED_CHUNKS.labels(mode).inc(len(chunks))
+        logger.info(f"Embedded {len(chunks)} chunks in {elapsed:.2f}s ({len(chunks) / max(elapsed, 1e-9):.1f} chunks/s, {mode})")
+
+        # Restore input order and convert to lists
+        result: List[Optional[List[float]]] = [None] * len(chunks)
+        for i, emb in zip(order, embeddings):
+            if hasattr(emb, "tolist"):
+                result[i] = emb.tolist()
+            elif hasattr(emb, "numpy"):
+                result[i] = emb.numpy().tolist()
+            else:
+                result[i] = list(emb)
+        return result
 
     ############################################
     # INGESTION
@@ -347,15 +480,8 @@ class RAGEngine:
 
             try:
                 # Extract text based on file type
-                if file_path.lower().endswith(".pdf"):
-                    text = self.read_pdf(file_path)
-                elif file_path.lower().endswith(
-                    (".png", ".jpg", ".jpeg", ".gif", ".bmp")
-                ):
-                    text = self.read_image(file_path)
-                elif file_path.lower().endswith(".txt"):
-                    text = self.read_txt(file_path)
-                else:
+                text = self.read_file(file_path)
+                if text is None:
                     logger.warning(f"Unsupported file type: {file_path}")
                     continue
 
@@ -364,7 +490,8 @@ class RAGEngine:
                     continue
 
                 # Chunk the text
-                chunks = self.chunk_text(text)
+                with stage_timer("chunk"):
+                    chunks = self.chunk_text(text)
                 if chunks:
                     all_chunks.extend(chunks)
                     logger.info(
@@ -383,20 +510,7 @@ class RAGEngine:
             # Generate embeddings for new chunks only
             logger.info(f"Generating embeddings for {len(all_chunks)} new chunks")
 
-            # Generate embeddings with numpy arrays
-            embeddings = self.embedder.encode(
-                all_chunks, convert_to_tensor=False
-            )
-
-            # Convert embeddings to Python lists for Neo4j
-            embeddings_list = []
-            for emb in embeddings:
-                if hasattr(emb, "tolist"):
-                    embeddings_list.append(emb.tolist())
-                elif hasattr(emb, "numpy"):
-                    embeddings_list.append(emb.numpy().tolist())
-                else:
-                    embeddings_list.append(list(emb))
+            embeddings_list = self.embed_chunks(all_chunks)
 
             # Insert into graph (NO deletion of existing data)
             logger.info("Inserting new chunks into graph...")
@@ -404,16 +518,11 @@ class RAGEngine:
                 self.insert_graph(chunk, embedding, space, llm_func)
 
             # Update space-specific BM25 with NEW chunks
-            if space in self.space_documents:
-                # Append new chunks to existing documents
-                self.space_documents[space].extend(all_chunks)
-            else:
-                # Create new BM25 index if this is the first ingestion
-                self.space_documents[space] = all_chunks
+            self.append_documents(space, all_chunks)
             
             # Recreate BM25 with ALL documents (existing + new)
-            # Make sure BM25Okapi is imported!
-            self.space_bm25[space] = BM25Okapi([doc.split() for doc in self.space_documents[space]])
+            with stage_timer("bm25_index"):
+                self.space_bm25[space] = BM25Okapi([doc.split() for doc in self.space_documents[space]])
 
             logger.info(
                 f"✅ Successfully ingested {len(all_chunks)} new chunks into space {space}"
@@ -432,24 +541,23 @@ class RAGEngine:
 
 
     # Also update the existing ingest method to optionally not clear data:
-    def ingest(self, files: List[str], space: str, llm_func, clear_existing: bool = True):
-        """Ingest files into the knowledge graph for a specific space."""
+    def ingest(self, files: List[str], space: str, llm_func, clear_existing: bool = True) -> Dict[str, int]:
+        """Ingest files into the knowledge graph for a specific space.
+
+        Returns the number of chunks, concepts and relationships created.
+        """
+        created = {"chunks": 0, "concepts": 0, "relationships": 0}
         if not files:
             logger.warning("No files provided for ingestion")
-            return
+            return created
 
         logger.info(f"Ingesting {len(files)} files into space: {space}")
 
         # Clear existing data for this space ONLY if requested
         if clear_existing:
             try:
-                with self.driver.session() as session:
-                    session.run(
-                        "MATCH (c:Chunk {space: $space}) DETACH DELETE c", space=space
-                    )
-                    session.run(
-                        "MATCH (c:Concept {space: $space}) DETACH DELETE c", space=space
-                    )
+                self.graph.clear_space(space)
+                self.score_cache.delete_prefix(f"{space}:")
                 logger.info(f"Cleared existing data for space: {space}")
             except Exception as e:
                 logger.warning(f"Error clearing old chunks: {e}")
@@ -465,13 +573,8 @@ class RAGEngine:
 
             try:
                 # Extract text based on file type
-                if file_path.lower().endswith(".pdf"):
-                    text = self.read_pdf(file_path)
-                elif file_path.lower().endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp")):
-                    text = self.read_image(file_path)
-                elif file_path.lower().endswith(".txt"):
-                    text = self.read_txt(file_path)
-                else:
+                text = self.read_file(file_path)
+                if text is None:
                     logger.warning(f"Unsupported file type: {file_path}")
                     continue
 
@@ -480,7 +583,8 @@ class RAGEngine:
                     continue
 
                 # Chunk the text
-                chunks = self.chunk_text(text)
+                with stage_timer("chunk"):
+                    chunks = self.chunk_text(text)
                 if chunks:
                     all_chunks.extend(chunks)
                     logger.info(
@@ -499,133 +603,308 @@ class RAGEngine:
                     del self.space_bm25[space]
                 if space in self.space_documents:
                     del self.space_documents[space]
-            return
+            return created
 
         try:
             # Generate embeddings
             logger.info(f"Generating embeddings for {len(all_chunks)} chunks")
 
-            # Generate embeddings with numpy arrays
-            embeddings = self.embedder.encode(all_chunks, convert_to_tensor=False)
-
-            # Convert embeddings to Python lists for Neo4j
-            embeddings_list = []
-            for emb in embeddings:
-                if hasattr(emb, "tolist"):
-                    embeddings_list.append(emb.tolist())
-                elif hasattr(emb, "numpy"):
-                    embeddings_list.append(emb.numpy().tolist())
-                else:
-                    embeddings_list.append(list(emb))
+            embeddings_list = self.embed_chunks(all_chunks)
 
             # Insert into graph
             logger.info("Inserting chunks into graph...")
             for chunk, embedding in zip(all_chunks, embeddings_list):
-                self.insert_graph(chunk, embedding, space, llm_func)
+                for key, count in self.insert_graph(chunk, embedding, space, llm_func).items():
+                    created[key] += count
 
             # Update space-specific BM25
-            if clear_existing:
-                # Replace with new documents
-                self.space_documents[space] = all_chunks
-                self.space_bm25[space] = BM25Okapi([doc.split() for doc in all_chunks])
-            else:
-                # Append to existing documents
-                if space in self.space_documents:
-                    self.space_documents[space].extend(all_chunks)
+            with stage_timer("bm25_index"):
+                if clear_existing:
+                    # Replace with new documents (the graph keeps one node per chunk id)
+                    self.space_documents[space] = list(dict.fromkeys(all_chunks))
+                    self.space_bm25[space] = BM25Okapi([doc.split() for doc in self.space_documents[space]])
                 else:
-                    self.space_documents[space] = all_chunks
-                # Recreate BM25 with ALL documents
-                self.space_bm25[space] = BM25Okapi(
-                    [doc.split() for doc in self.space_documents[space]]
-                )
+                    # Append to existing documents
+                    self.append_documents(space, all_chunks)
+                    # Recreate BM25 with ALL documents
+                    self.space_bm25[space] = BM25Okapi(
+                        [doc.split() for doc in self.space_documents[space]]
+                    )
 
             logger.info(
                 f"✅ Successfully ingested {len(all_chunks)} chunks into space {space}"
             )
+            return created
         except Exception as e:
             logger.error(f"Error during ingestion: {e}")
             raise
 
+    def append_documents(self, space: str, chunks: List[str]) -> int:
+        """Add chunks not yet in a space's BM25 documents; returns how many were new.
+
+        Re-uploaded text merges into existing Chunk nodes, so BM25 keeps a
+        single copy of it as well. A space not loaded yet (e.g. after a
+        restart) is loaded from the graph first, so its older chunks are kept.
+        """
+        if space not in self.space_documents:
+            self.load_bm25(space)
+        documents = self.space_documents[space]
+        known = set(documents)
+        new = [chunk for chunk in dict.fromkeys(chunks) if chunk not in known]
+        documents.extend(new)
+        return len(new)
+
+    def load_bm25(self, space: str) -> int:
+        """Rebuild a space's BM25 index from the Chunk nodes stored in the graph.
+
+        BM25 lives in process memory, so this is how a restarted server, or
+        one whose space was re-indexed by another process, gets it back.
+        """
+        documents = self.graph.chunk_texts(space)
+
+        with stage_timer("bm25_index"):
+            self.space_documents[space] = documents
+            if documents:
+                self.space_bm25[space] = BM25Okapi([doc.split() for doc in documents])
+            else:
+                self.space_bm25.pop(space, None)
+        return len(documents)
+
+    def drop_bm25(self, space: str):
+        """Forget a space's BM25 index so the next query reloads it from the graph."""
+        self.space_documents.pop(space, None)
+        self.space_bm25.pop(space, None)
+
     ############################################
     # RETRIEVAL
     ############################################
 
-    def retrieve(self, query: str, space: str) -> List[str]:
-        """Retrieve relevant chunks using hybrid search with space filtering."""
+    def retrieve_candidates(self, query: str, space: str, top_k: int = TOP_K, mode: str = "hybrid",
+                            timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Retrieve and fuse candidate chunks with space filtering.
+
+        Each source enabled by the mode (see RETRIEVAL_SOURCES) contributes
+        up to top_k ranked candidates, which are fused by chunk id. Stage
+        durations are added to `timings` when given.
+        """
         if not query or not space:
             return []
 
-        hits = []
+        sources = RETRIEVAL_SOURCES[mode]
+        ranked: Dict[str, List[Dict[str, Any]]] = {}
 
         # BM25 retrieval (space-aware)
-        if space in self.space_bm25 and self.space_documents.get(space):
+        if "bm25" in sources:
             try:
-                bm25 = self.space_bm25[space]
-                docs = self.space_documents[space]
-                scores = np.array(bm25.get_scores(query.split()))
-                idx = np.argsort(scores)[::-1][:TOP_K]
-                hits.extend([docs[i] for i in idx if i < len(docs)])
+                with stage_timer("bm25", timings):
+                    ranked["bm25"] = self.bm25_candidates(query, space, top_k)
             except Exception as e:
                 logger.warning(f"BM25 retrieval error: {e}")
 
         # Vector retrieval with space filtering
-        try:
-            query_vector = self.embedder.encode(query, convert_to_tensor=False)
-            if hasattr(query_vector, "tolist"):
-                query_vector = query_vector.tolist()
-            elif hasattr(query_vector, "numpy"):
-                query_vector = query_vector.numpy().tolist()
-
-            with self.driver.session() as session:
-                result = session.run(
-                    """
-                    CALL db.index.vector.queryNodes('chunk_embedding_index', $top_k, $query_vector)
-                    YIELD node, score
-                    WHERE node.space = $space
-                    RETURN node.text AS text, score
-                    ORDER BY score DESC
-                    LIMIT $top_k
-                """,
-                    top_k=TOP_K,
-                    query_vector=query_vector,
-                    space=space,
-                )
-
-                for record in result:
-                    text = record["text"]
-                    if text:
-                        hits.append(text)
-        except Exception as e:
-            logger.warning(f"Vector retrieval error: {e}")
+        if "vector" in sources:
+            try:
+                with stage_timer("embed_query", timings):
+                    query_vector = self.embed_query(query)
+                with stage_timer("vector_search", timings):
+                    ranked["vector"] = self._vector_candidates(
+                        self.graph.vector_search(query_vector, space, top_k), space
+                    )
+            except Exception as e:
+                logger.warning(f"Vector retrieval error: {e}")
+
+        # Chunks explaining concepts named in the query
+        if "graph" in sources:
+            try:
+                with stage_timer("graph_search", timings):
+                    ranked["graph"] = self.graph_candidates(query, space, top_k)
+            except Exception as e:
+                logger.warning(f"Graph retrieval error: {e}")
+
+        return fuse(ranked)[: top_k * len(sources)]
+
+    async def aretrieve_candidates(self, query: str, space: str, top_k: int = TOP_K, mode: str = "hybrid",
+                                   timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """retrieve_candidates without blocking the event loop.
+
+        BM25 scoring and query embedding run in worker threads and the Neo4j
+        queries on the async driver, with all sources in flight at once.
+        """
+        if not query or not space:
+            return []
+
+        sources = RETRIEVAL_SOURCES[mode]
 
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_hits = []
-        for hit in hits:
-            if hit and hit not in seen:
-                seen.add(hit)
-                unique_hits.append(hit)
+        async def bm25():
+            with stage_timer("bm25", timings):
+                return await asyncio.to_thread(self.bm25_candidates, query, space, top_k)
 
-        return unique_hits[: TOP_K * 2]
+        async def vector():
+            with stage_timer("embed_query", timings):
+                query_vector = await asyncio.to_thread(self.embed_query, query)
+            with stage_timer("vector_search", timings):
+                return self._vector_candidates(await self.graph.avector_search(query_vector, space, top_k), space)
+
+        async def graph():
+            with stage_timer("graph_search", timings):
+                return await self.agraph_candidates(query, space, top_k)
+
+        runners = {"bm25": bm25, "vector": vector, "graph": graph}
+        results = await asyncio.gather(*(runners[source]() for source in sources), return_exceptions=True)
+
+        ranked: Dict[str, List[Dict[str, Any]]] = {}
+        for source, result in zip(sources, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{source} retrieval error: {result}")
+            else:
+                ranked[source] = result
+        return fuse(ranked)[: top_k * len(sources)]
+
+    def bm25_candidates(self, query: str, space: str, top_k: int = TOP_K) -> List[Dict[str, Any]]:
+        """Top BM25 chunks of a space, loading its index from the graph on first use."""
+        if space not in self.space_documents:
+            try:
+                self.load_bm25(space)
+            except Exception as e:
+                logger.warning(f"BM25 load error: {e}")
+                return []
+
+        bm25 = self.space_bm25.get(space)
+        docs = self.space_documents.get(space)
+        if bm25 is None or not docs:
+            return []
+
+        scores = np.array(bm25.get_scores(query.split()))
+        idx = np.argsort(scores)[::-1][:top_k]
+        return [
+            {"chunk_id": self._generate_chunk_id(docs[i], space), "text": docs[i], "score": float(scores[i])}
+            for i in idx if i < len(docs) and scores[i] > 0
+        ]
+
+    def embed_query(self, query: str) -> List[float]:
+        """Query embedding as a Python list for Neo4j."""
+        query_vector = self.embedder.encode(query, convert_to_tensor=False)
+        if hasattr(query_vector, "tolist"):
+            return query_vector.tolist()
+        if hasattr(query_vector, "numpy"):
+            return query_vector.numpy().tolist()
+        return list(query_vector)
+
+    def _vector_candidates(self, records: List[Dict[str, Any]], space: str) -> List[Dict[str, Any]]:
+        # Chunks written before chunk_id was stored get it recomputed from their text
+        return [
+            {**record, "chunk_id": record["chunk_id"] or self._generate_chunk_id(record["text"], space)}
+            for record in records
+        ]
+
+    def retrieve(self, query: str, space: str, top_k: int = TOP_K, mode: str = "hybrid",
+                 timings: Optional[Dict[str, float]] = None) -> List[str]:
+        """Texts of the fused candidates, best first."""
+        return [c["text"] for c in self.retrieve_candidates(query, space, top_k, mode, timings)]
+
+    def _concept_terms(self, query: str) -> str:
+        """Fulltext query OR-ing the content words of a question."""
+        words = [w for w in re.findall(r"[a-z0-9]+", query.lower()) if w not in QUERY_STOPWORDS and len(w) > 1]
+        return " OR ".join(dict.fromkeys(words))
+
+    def graph_candidates(self, query: str, space: str, top_k: int = TOP_K,
+                         hops: int = GRAPH_HOPS) -> List[Dict[str, Any]]:
+        """Chunks linked to concepts matching the query, scored through the concept graph.
+
+        Seed concepts come from the fulltext index; their RELATED_TO
+        neighbours up to `hops` away contribute with decaying weight, and
+        each chunk scores the sum of the weights of the concepts it explains.
+        """
+        terms = self._concept_terms(query)
+        if not terms:
+            return []
+
+        return self.graph.graph_search(
+            terms, space, top_k, seeds=GRAPH_SEED_CONCEPTS, hops=hops, decay=GRAPH_HOP_DECAY
+        )
+
+    async def agraph_candidates(self, query: str, space: str, top_k: int = TOP_K,
+                                hops: int = GRAPH_HOPS) -> List[Dict[str, Any]]:
+        """graph_candidates on the async driver."""
+        terms = self._concept_terms(query)
+        if not terms:
+            return []
+
+        return await self.graph.agraph_search(
+            terms, space, top_k, seeds=GRAPH_SEED_CONCEPTS, hops=hops, decay=GRAPH_HOP_DECAY
+        )
 
     ############################################
     # RERANKING AND ANSWERING
     ############################################
 
-    def rerank_documents(self, query: str, documents: List[str]) -> List[str]:
-        """Rerank documents using cross-encoder."""
-        if not documents:
+    def _score_key_prefix(self, query: str, space: str) -> str:
+        """Cache key prefix for one space and case/punctuation-normalized query."""
+        normalized = " ".join(re.findall(r"\w+", query.lower()))
+        return f"{space}:{hashlib.sha256(normalized.encode()).hexdigest()[:16]}:"
+
+    def rerank_candidates(self, query: str, candidates: List[Dict[str, Any]], top_k: int = TOP_K,
+                          timings: Optional[Dict[str, float]] = None,
+                          space: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Order candidates by cross-encoder score, keeping the top_k.
+
+        With a space, scores are cached per (query, chunk_id) and only
+        cache misses go through the cross-encoder.
+        """
+        if not candidates:
             return []
 
         try:
-            pairs = [[query, doc] for doc in documents]
-            scores = self.reranker.predict(pairs)
-
-            ranked = sorted(zip(documents, scores), key=lambda x: x[1], reverse=True)
-            return [doc for doc, _ in ranked[:TOP_K]]
+            prefix = self._score_key_prefix(query, space) if space else None
+            keys = [prefix + c["chunk_id"] if prefix and c.get("chunk_id") else None for c in candidates]
+            scores = [self.score_cache.get(key) if key else None for key in keys]
+
+            misses = [i for i, score in enumerate(scores) if score is None]
+            if misses:
+                pairs = [[query, candidates[i]["text"]] for i in misses]
+                with stage_timer("rerank", timings):
+                    predicted = self.reranker.predict(pairs)
+                for i, score in zip(misses, predicted):
+                    scores[i] = float(score)
+                    if keys[i]:
+                        self.score_cache.set(keys[i], scores[i])
+
+            ranked = sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)
+            return [{**c, "rerank_score": score} for c, score in ranked[:top_k]]
         except Exception as e:
             logger.error(f"Reranking error: {e}")
-            return documents[:TOP_K]
+            return candidates[:top_k]
+
+    def rerank_documents(self, query: str, documents: List[str], top_k: int = TOP_K,
+                         timings: Optional[Dict[str, float]] = None) -> List[str]:
+        """Rerank documents using cross-encoder."""
+        candidates = [{"text": doc} for doc in documents]
+        return [c["text"] for c in self.rerank_candidates(query, candidates, top_k, timings)]
+
+    def select_context(self, query: str, space: str, candidates: List[Dict[str, Any]], top_k: int = TOP_K,
+                       timings: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Rerank fused candidates unless the fused ranking is already decisive."""
+        if is_decisive(candidates):
+            RERANK_DECISIONS.labels("skipped").inc()
+            return candidates[:top_k]
+        RERANK_DECISIONS.labels("reranked").inc()
+        return self.rerank_candidates(query, candidates, top_k, timings, space=space)
+
+    def _answer_prompt(self, query: str, relevant_docs: List[Dict[str, Any]]) -> str:
+        # Prepare context
+        context = "\n\n".join(
+            [f"Document {i+1}: {doc['text']}" for i, doc in enumerate(relevant_docs[:ANSWER_CONTEXT])]
+        )
+
+        return f"""Based on the following context from study materials, answer the question clearly and concisely.
+If the answer cannot be found in the context, say so honestly.
+
+Context:
+{context}
+
+Question: {query}
+
+Provide a clear, detailed answer based only on the context above:"""
 
     def ask(self, query: str, space: str, llm_func) -> str:
         """Answer question using retrieval from the specified space."""
@@ -638,41 +917,61 @@ class RAGEngine:
         logger.info(f"Processing query: '{query}' for space: {space}")
 
         # Retrieve relevant documents
-        retrieved_docs = self.retrieve(query, space)
+        candidates = self.retrieve_candidates(query, space)
 
-        if not retrieved_docs:
+        if not candidates:
             logger.warning(f"No relevant documents found for space {space}")
-            return "I couldn't find relevant information in the uploaded documents. Please try asking about something else or upload more documents."
+            return NO_DOCUMENTS_ANSWER
 
-        # Rerank documents
-        relevant_docs = self.rerank_documents(query, retrieved_docs)
+        # Rerank documents (skipped when the fused ranking is decisive)
+        relevant_docs = self.select_context(query, space, candidates)
 
         if not relevant_docs:
-            return "I couldn't find relevant information to answer your question."
-
-        # Prepare context
-        context = "\n\n".join(
-            [f"Document {i+1}: {doc}" for i, doc in enumerate(relevant_docs[:3])]
-        )
+            return NO_CONTEXT_ANSWER
 
         # Generate answer using LLM
-        prompt = f"""Based on the following context from study materials, answer the question clearly and concisely.
-If the answer cannot be found in the context, say so honestly.
+        prompt = self._answer_prompt(query, relevant_docs)
 
-Context:
-{context}
+        try:
+            with stage_timer("llm_answer"):
+                answer = llm_func(prompt)
+            logger.info("✅ Successfully generated answer")
+            return answer.strip()
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            return ANSWER_ERROR
 
-Question: {query}
+    async def aask(self, query: str, space: str, llm_func) -> str:
+        """ask for async endpoints: retrieval is awaited, CPU and LLM work run in threads."""
+        if not query or not query.strip():
+            return "Please provide a question."
 
-Provide a clear, detailed answer based only on the context above:"""
+        if not space:
+            return "Invalid space."
+
+        logger.info(f"Processing query: '{query}' for space: {space}")
+
+        candidates = await self.aretrieve_candidates(query, space)
+
+        if not candidates:
+            logger.warning(f"No relevant documents found for space {space}")
+            return NO_DOCUMENTS_ANSWER
+
+        relevant_docs = await asyncio.to_thread(self.select_context, query, space, candidates)
+
+        if not relevant_docs:
+            return NO_CONTEXT_ANSWER
+
+        prompt = self._answer_prompt(query, relevant_docs)
 
         try:
-            answer = llm_func(prompt)
+            with stage_timer("llm_answer"):
+                answer = await asyncio.to_thread(llm_func, prompt)
             logger.info("✅ Successfully generated answer")
             return answer.strip()
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
-            return "I encountered an error while processing your question. Please try again."
+            return ANSWER_ERROR
 
     ############################################
     # UTILITY FUNCTIONS
@@ -681,19 +980,14 @@ Provide a clear, detailed answer based only on the context above:"""
     def clear_space(self, space: str):
         """Clear all data for a specific space."""
         try:
-            with self.driver.session() as session:
-                session.run(
-                    "MATCH (c:Chunk {space: $space}) DETACH DELETE c", space=space
-                )
-                session.run(
-                    "MATCH (c:Concept {space: $space}) DETACH DELETE c", space=space
-                )
+            self.graph.clear_space(space)
 
             # Clear space-specific indexes
             if space in self.space_bm25:
                 del self.space_bm25[space]
             if space in self.space_documents:
                 del self.space_documents[space]
+            self.score_cache.delete_prefix(f"{space}:")
 
             logger.info(f"✅ Cleared all data for space: {space}")
         except Exception as e:
@@ -702,37 +996,26 @@ Provide a clear, detailed answer based only on the context above:"""
     def get_space_stats(self, space: str) -> Dict[str, Any]:
         """Get statistics for a space."""
         try:
-            with self.driver.session() as session:
-                chunk_count = session.run(
-                    "MATCH (c:Chunk {space: $space}) RETURN count(c) as count",
-                    space=space,
-                ).single()["count"]
-
-                concept_count = session.run(
-                    "MATCH (c:Concept {space: $space}) RETURN count(c) as count",
-                    space=space,
-                ).single()["count"]
-
-                rel_count = session.run(
-                    "MATCH (a:Concept {space: $space})-[r]->(b:Concept {space: $space}) RETURN count(r) as count",
-                    space=space,
-                ).single()["count"]
-
-            return {
-                "chunks": chunk_count,
-                "concepts": concept_count,
-                "relationships": rel_count,
-                "space": space,
-            }
+            return {**self.graph.space_stats(space), "space": space}
         except Exception as e:
             logger.error(f"Error getting space stats: {e}")
             return {"error": str(e)}
 
+    async def aclose(self):
+        """Close the async Neo4j driver, if retrieval ever opened it."""
+        try:
+            await self.graph.aclose()
+        except Exception as e:
+            logger.error(f"Error closing async Neo4j driver: {e}")
+
     def close(self):
         """Close Neo4j driver connection."""
         try:
-            if self.driver:
-                self.driver.close()
+            with self._embed_pool_busy:
+                if self._embed_pool is not None:
+                    self.embedder.stop_multi_process_pool(self._embed_pool)
+                    self._embed_pool = None
+            self.graph.close()
             logger.info("✅ RAG Engine closed")
         except Exception as e:
             logger.error(f"Error closing RAG Engine: {e}")
@@ -0,0 +1,65 @@
+import os, asyncio, logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+# Time-decayed score: (up - down + COMMENT_WEIGHT * comments) / (age_hours + 2) ^ GRAVITY
+HOT_GRAVITY = float(os.getenv("HOT_GRAVITY", "1.8"))
+HOT_COMMENT_WEIGHT = float(os.getenv("HOT_COMMENT_WEIGHT", "0.5"))
+
+# Posts older than this have decayed to ~0 and are pinned to 0 by the refresher
+HOT_WINDOW_DAYS = int(os.getenv("HOT_WINDOW_DAYS", "14"))
+HOT_REFRESH_INTERVAL = float(os.getenv("HOT_REFRESH_INTERVAL", "300"))
+
+############################################
+# HOT SCORE
+############################################
+
+
+def _hot_score_expression() -> dict:
+    """Aggregation expression computing hot_score from the post's own fields."""
+    age_hours = {"$divide": [{"$subtract": ["$$NOW", "$createdAt"]}, 3600 * 1000]}
+    points = {"$add": [
+        {"$subtract": [{"$ifNull": ["$upvotes", 0]}, {"$ifNull": ["$downvotes", 0]}]},
+        {"$multiply": [HOT_COMMENT_WEIGHT, {"$ifNull": ["$comment_count", 0]}]},
+    ]}
+    return {"$divide": [points, {"$pow": [{"$add": [{"$max": [age_hours, 0]}, 2]}, HOT_GRAVITY]}]}
+
+
+# Pipeline update so the score is computed inside Mongo from current counters
+HOT_SCORE_UPDATE = [{"$set": {"hot_score": _hot_score_expression(), "hot_updated_at": "$$NOW"}}]
+
+
+def refresh_hot_scores(db, post_ids: Iterable[str]):
+    """Recompute hot_score for the given posts (after votes or comments)."""
+    post_ids = list(post_ids)
+    if post_ids:
+        db.posts.update_many({"_id": {"$in": post_ids}}, HOT_SCORE_UPDATE)
+
+
+def decay_hot_scores(db) -> int:
+    """Recompute every post inside the hot window and zero older ones."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=HOT_WINDOW_DAYS)
+    result = db.posts.update_many({"createdAt": {"$gte": cutoff}}, HOT_SCORE_UPDATE)
+    db.posts.update_many(
+        {"createdAt": {"$lt": cutoff}, "hot_score": {"$ne": 0}},
+        {"$set": {"hot_score": 0}}
+    )
+    return result.modified_count
+
+
+async def run_hot_score_refresher(db):
+    """Background task applying time decay every HOT_REFRESH_INTERVAL seconds."""
+    while True:
+        try:
+            updated = await asyncio.to_thread(decay_hot_scores, db)
+            logger.debug(f"Refreshed hot scores for {updated} posts")
+        except Exception as e:
+            logger.error(f"Hot score refresher error: {e}")
+        await asyncio.sleep(HOT_REFRESH_INTERVAL)
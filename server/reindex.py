@@ -0,0 +1,320 @@
+"""Offline re-index of study spaces, run from server/:
+
+    python reindex.py                       rebuild every space
+    python reindex.py --space ID [ID ...]   rebuild selected spaces
+    python reindex.py --resume              continue the last interrupted run
+
+Each space's graph is cleared and rebuilt from its files in db.files:
+chunks, embeddings, concepts and the BM25 index all go through RAGEngine.
+Progress is checkpointed per file and chunk, so an interrupted run picks up
+at the chunk where it stopped. Running servers drop their in-memory BM25
+index of a rebuilt space within BM25_INVALIDATE_INTERVAL and reload it from
+the graph on the next query.
+"""
+import os, sys, time, uuid, argparse, logging, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+logger = logging.getLogger("reindex")
+
+############################################
+# CONFIG
+############################################
+
+REINDEX_WORKERS = int(os.getenv("REINDEX_WORKERS", "2"))  # Spaces rebuilt in parallel
+REINDEX_RATE = float(os.getenv("REINDEX_RATE", "0"))  # Chunks/s across all workers, 0 = unthrottled
+REINDEX_BATCH = int(os.getenv("REINDEX_BATCH", "0"))  # Chunks embedded per call, 0 = a file's remaining chunks at once
+
+
+class ReindexAborted(Exception):
+    """Raised inside workers once a stop was requested."""
+
+############################################
+# THROTTLING
+############################################
+
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(self._next, now)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+############################################
+# CHECKPOINTS
+############################################
+
+
+class CheckpointStore:
+    """Progress of re-index runs in db.reindex_checkpoints.
+
+    There is one document per run, holding its config and space list, and one
+    per (run, space) recording whether the space was cleared and how many
+    chunks of each file have been written.
+    """
+
+    def __init__(self, db):
+        self.collection = db.reindex_checkpoints
+
+    def create_indexes(self):
+        self.collection.create_index([("type", 1), ("status", 1), ("startedAt", -1)])
+
+    def start_run(self, spaces: List[str], config: Dict[str, Any]) -> str:
+        run_id = str(uuid.uuid4())
+        self.collection.insert_one({
+            "_id": run_id,
+            "type": "run",
+            "status": "running",
+            "spaces": spaces,
+            "config": config,
+            "startedAt": datetime.now(timezone.utc),
+        })
+        return run_id
+
+    def get_run(self, run_id: str) -> Optional[dict]:
+        return self.collection.find_one({"_id": run_id, "type": "run"})
+
+    def latest_unfinished_run(self) -> Optional[dict]:
+        return self.collection.find_one(
+            {"type": "run", "status": {"$ne": "completed"}}, sort=[("startedAt", -1)]
+        )
+
+    def finish_run(self, run_id: str, status: str, failed: List[str]):
+        self.collection.update_one({"_id": run_id}, {"$set": {
+            "status": status,
+            "failed": failed,
+            "finishedAt": datetime.now(timezone.utc),
+        }})
+
+    def space(self, run_id: str, space_id: str) -> dict:
+        """Checkpoint of one space in a run, created on first use."""
+        _id = f"{run_id}:{space_id}"
+        self.collection.update_one(
+            {"_id": _id},
+            {"$setOnInsert": {"type": "space", "run": run_id, "space": space_id,
+                              "status": "pending", "cleared": False, "files": {}}},
+            upsert=True,
+        )
+        return self.collection.find_one({"_id": _id})
+
+    def update_space(self, run_id: str, space_id: str, **fields):
+        fields["updatedAt"] = datetime.now(timezone.utc)
+        self.collection.update_one({"_id": f"{run_id}:{space_id}"}, {"$set": fields})
+
+    def file_progress(self, run_id: str, space_id: str, file_id: str, chunks_done: int,
+                      chunks_total: int, done: bool = False):
+        self.update_space(run_id, space_id, **{
+            f"files.{file_id}": {"chunks_done": chunks_done, "chunks_total": chunks_total, "done": done},
+        })
+
+############################################
+# REINDEX
+############################################
+
+
+class Reindexer:
+    """Rebuilds spaces through a RAGEngine, checkpointing as it goes."""
+
+    def __init__(self, db, engine, llm_func, space_stats, checkpoints: CheckpointStore,
+                 limiter: RateLimiter, batch_size: int = REINDEX_BATCH):
+        self.db = db
+        self.engine = engine
+        self.llm = llm_func
+        self.space_stats = space_stats
+        self.checkpoints = checkpoints
+        self.limiter = limiter
+        self.batch_size = batch_size
+        self.stop = threading.Event()
+
+    def reindex_space(self, run_id: str, space_id: str) -> Dict[str, Any]:
+        state = self.checkpoints.space(run_id, space_id)
+        if state["status"] == "completed":
+            logger.info(f"Space {space_id} already re-indexed in this run, skipping")
+            return state.get("counts", {})
+
+        started = time.perf_counter()
+        self.checkpoints.update_space(run_id, space_id, status="running")
+
+        # Clear once per run; a resumed space keeps the chunks written so far
+        if not state["cleared"]:
+            self.engine.clear_space(space_id)
+            self.checkpoints.update_space(run_id, space_id, cleared=True)
+
+        files = list(self.db.files.find({"spaceId": space_id}, {"path": 1}).sort("_id", 1))
+        chunks_written = 0
+        for file in files:
+            progress = state["files"].get(file["_id"], {})
+            if progress.get("done"):
+                continue
+            chunks_written += self._reindex_file(run_id, space_id, file, progress.get("chunks_done", 0))
+
+        # Rebuild BM25 from the graph and recount, since a resumed run only
+        # saw part of the writes
+        self.engine.load_bm25(space_id)
+        counts = self.engine.get_space_stats(space_id)
+        if "error" in counts:
+            raise RuntimeError(counts["error"])
+        self.space_stats.set_graph(space_id, counts)
+        self.space_stats.mark_reindexed(space_id)
+
+        counts = {key: counts[key] for key in ("chunks", "concepts", "relationships")}
+        self.checkpoints.update_space(run_id, space_id, status="completed", counts=counts)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"✅ Re-indexed space {space_id}: {len(files)} files, {chunks_written} chunks written "
+            f"in {elapsed:.1f}s, graph now {counts}"
+        )
+        return counts
+
+    def _reindex_file(self, run_id: str, space_id: str, file: dict, chunks_done: int) -> int:
+        path = file.get("path")
+        if not path or not os.path.exists(path):
+            logger.warning(f"File not found, skipping: {path} ({file['_id']})")
+            self.checkpoints.file_progress(run_id, space_id, file["_id"], 0, 0, done=True)
+            return 0
+
+        text = self.engine.read_file(path)
+        if text is None:
+            logger.warning(f"Unsupported file type, skipping: {path}")
+        chunks = self.engine.chunk_text(text or "")
+        if chunks_done:
+            logger.info(f"Resuming {os.path.basename(path)} at chunk {chunks_done}/{len(chunks)}")
+
+        # Embedding a whole file per call lets embed_chunks use its process
+        # pool once the file reaches BULK_EMBED_THRESHOLD chunks. Workers
+        # share that pool; embed_chunks runs one pooled encode at a time
+        batch_size = self.batch_size or max(1, len(chunks) - chunks_done)
+        written = 0
+        for start in range(chunks_done, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            embeddings = self.engine.embed_chunks(batch)
+            for chunk, embedding in zip(batch, embeddings):
+                if self.stop.is_set():
+                    raise ReindexAborted(space_id)
+                self.limiter.wait()
+                # Raises on a failed write, so the checkpoint stays on this
+                # chunk and the space is marked failed
+                self.engine.write_chunk(chunk, embedding, space_id, self.llm)
+                chunks_done += 1
+                written += 1
+                self.checkpoints.file_progress(run_id, space_id, file["_id"], chunks_done, len(chunks))
+
+        self.checkpoints.file_progress(run_id, space_id, file["_id"], len(chunks), len(chunks), done=True)
+        return written
+
+    def run(self, run_id: str, spaces: List[str], workers: int) -> List[str]:
+        """Re-index spaces in parallel; returns the ids of spaces that failed."""
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(self.reindex_space, run_id, space_id): space_id for space_id in spaces}
+            try:
+                for future in as_completed(futures):
+                    space_id = futures[future]
+                    try:
+                        future.result()
+                    except ReindexAborted:
+                        failed.append(space_id)
+                    except Exception as e:
+                        failed.append(space_id)
+                        self.checkpoints.update_space(run_id, space_id, status="failed", error=str(e))
+                        logger.error(f"❌ Re-index of space {space_id} failed: {e}", exc_info=True)
+            except KeyboardInterrupt:
+                logger.warning("Interrupted, stopping after the current chunks; resume with --resume")
+                self.stop.set()
+                for future in futures:
+                    future.cancel()
+                raise
+        return failed
+
+############################################
+# CLI
+############################################
+
+
+def engine_config(engine) -> Dict[str, Any]:
+    """Settings a resumed run must share with the run it continues."""
+    from inference import EMBEDDING_MODEL, INFERENCE_BACKEND
+    return {
+        "chunk_size": engine.chunk_size,
+        "embedding_model": EMBEDDING_MODEL,
+        "inference_backend": INFERENCE_BACKEND,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild study space graphs, embeddings and BM25 indexes")
+    parser.add_argument("--space", nargs="+", help="Space ids to rebuild (default: every space)")
+    parser.add_argument("--resume", action="store_true", help="Continue the latest unfinished run")
+    parser.add_argument("--run-id", help="Continue this run instead of the latest one")
+    parser.add_argument("--workers", type=int, default=REINDEX_WORKERS, help="Spaces rebuilt in parallel")
+    parser.add_argument("--rate", type=float, default=REINDEX_RATE,
+                        help="Max chunks written per second across workers (0 = unthrottled)")
+    parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH, help="Chunks embedded per call (0 = a file's remaining chunks at once)")
+    args = parser.parse_args(argv)
+
+    # Reuses the server's Mongo client, RAGEngine and LLM client
+    import main as app
+
+    if app.rag_engine is None:
+        logger.error("❌ RAG Engine unavailable, check the Neo4j settings")
+        return 1
+    if not app.OPENROUTER_API_KEY:
+        logger.error("❌ OPENROUTER_API_KEY is not set; concepts cannot be extracted")
+        return 1
+
+    checkpoints = CheckpointStore(app.db)
+    checkpoints.create_indexes()
+    config = engine_config(app.rag_engine)
+
+    if args.resume or args.run_id:
+        run = checkpoints.get_run(args.run_id) if args.run_id else checkpoints.latest_unfinished_run()
+        if not run:
+            logger.error("❌ No re-index run to resume")
+            return 1
+        if run["config"] != config:
+            logger.error(f"❌ Run {run['_id']} used {run['config']}, current settings are {config}")
+            return 1
+        run_id, spaces = run["_id"], run["spaces"]
+        checkpoints.collection.update_one({"_id": run_id}, {"$set": {"status": "running"}})
+        logger.info(f"Resuming re-index run {run_id} over {len(spaces)} spaces")
+    else:
+        spaces = args.space or [space["_id"] for space in app.db.studyspaces.find({}, {"_id": 1})]
+        run_id = checkpoints.start_run(spaces, config)
+        logger.info(f"Started re-index run {run_id} over {len(spaces)} spaces")
+
+    reindexer = Reindexer(
+        app.db, app.rag_engine, app.llm, app.space_stats, checkpoints,
+        RateLimiter(args.rate), batch_size=args.batch_size,
+    )
+    try:
+        failed = reindexer.run(run_id, spaces, args.workers)
+    except KeyboardInterrupt:
+        checkpoints.finish_run(run_id, "interrupted", [])
+        return 130
+    finally:
+        app.rag_engine.close()
+
+    checkpoints.finish_run(run_id, "failed" if failed else "completed", failed)
+    if failed:
+        logger.error(f"❌ {len(failed)} spaces failed; rerun with --resume --run-id {run_id}")
+        return 1
+    logger.info(f"✅ Re-index run {run_id} completed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
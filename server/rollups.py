@@ -0,0 +1,89 @@
+import os, asyncio, logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+ROLLUP_REFRESH_INTERVAL = float(os.getenv("ROLLUP_REFRESH_INTERVAL", "900"))
+
+# Scheduled refreshes only recompute recent days; older days are final
+ROLLUP_LOOKBACK_DAYS = int(os.getenv("ROLLUP_LOOKBACK_DAYS", "2"))
+
+# Collection -> (timestamp field, counter name in the rollup)
+ROLLUP_SOURCES = {
+    "files": ("uploadedAt", "uploads"),
+    "chats": ("createdAt", "chats"),
+}
+
+############################################
+# GLOBAL COUNTS
+############################################
+
+
+def global_counts(db) -> Dict[str, Any]:
+    """Collection sizes from metadata (no collection scans)."""
+    return {
+        "users": db.users.estimated_document_count(),
+        "spaces": db.studyspaces.estimated_document_count(),
+        "files": db.files.estimated_document_count(),
+        "chats": db.chats.estimated_document_count(),
+        "as_of": datetime.now(timezone.utc).isoformat(),
+    }
+
+############################################
+# DAILY ROLLUPS
+############################################
+
+
+def refresh_daily_rollups(db, days: int = None) -> None:
+    """Aggregate per-day uploads and chats into the stats_daily collection.
+
+    With days=None every document is rolled up (used when the rollup
+    collection is empty); otherwise only the last `days` days are recomputed.
+    """
+    now = datetime.now(timezone.utc)
+
+    for collection, (time_field, counter) in ROLLUP_SOURCES.items():
+        pipeline: List[dict] = []
+        if days is not None:
+            since = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            pipeline.append({"$match": {time_field: {"$gte": since}}})
+
+        pipeline += [
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": f"${time_field}"}},
+                counter: {"$sum": 1},
+            }},
+            {"$set": {"refreshedAt": now}},
+            {"$merge": {"into": "stats_daily", "on": "_id", "whenMatched": "merge", "whenNotMatched": "insert"}},
+        ]
+        db[collection].aggregate(pipeline)
+
+
+def daily_breakdown(db, days: int = 30) -> List[Dict[str, Any]]:
+    """Per-day uploads and chats for the last `days` days, oldest first."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+    rows = db.stats_daily.find({"_id": {"$gte": since}}).sort("_id", 1)
+    return [
+        {"date": row["_id"], "uploads": row.get("uploads", 0), "chats": row.get("chats", 0)}
+        for row in rows
+    ]
+
+
+async def run_rollup_refresher(db):
+    """Background task keeping stats_daily up to date."""
+    full = None  # Decided on the first pass: rebuild everything if stats_daily is empty
+    while True:
+        try:
+            if full is None:
+                full = await asyncio.to_thread(db.stats_daily.estimated_document_count) == 0
+            await asyncio.to_thread(refresh_daily_rollups, db, None if full else ROLLUP_LOOKBACK_DAYS)
+            full = False
+        except Exception as e:
+            logger.error(f"Rollup refresher error: {e}")
+        await asyncio.sleep(ROLLUP_REFRESH_INTERVAL)
@@ -0,0 +1,144 @@
+import os, asyncio, logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+############################################
+# CONFIG
+############################################
+
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "600"))
+STATS_RECONCILE_BATCH = int(os.getenv("STATS_RECONCILE_BATCH", "50"))
+# How often servers check for spaces rebuilt by reindex.py
+BM25_INVALIDATE_INTERVAL = float(os.getenv("BM25_INVALIDATE_INTERVAL", "30"))
+
+GRAPH_COUNTERS = ("chunks", "concepts", "relationships")
+
+############################################
+# SPACE STATS STORE
+############################################
+
+
+class SpaceStatsStore:
+    """Per-space counters kept in the spacestats collection.
+
+    Counters are updated incrementally on every ingest, delete and chat write
+    so reads are a single keyed lookup. A background reconciler periodically
+    recounts from Mongo and Neo4j to correct any drift.
+    """
+
+    def __init__(self, db, rag_engine_getter: Callable[[], Any]):
+        self.db = db
+        self.get_rag_engine = rag_engine_getter
+
+    def create_indexes(self):
+        """Index used to pick the stalest spaces for reconciliation."""
+        self.db.spacestats.create_index("reconciledAt")
+        self.db.spacestats.create_index("reindexedAt")
+
+    def incr(self, space_id: str, **deltas: int):
+        """Atomically add to one or more counters."""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.db.spacestats.update_one(
+            {"_id": space_id},
+            {"$inc": deltas, "$set": {"updatedAt": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    def set_graph(self, space_id: str, counts: Optional[Dict[str, int]] = None):
+        """Overwrite the graph counters, e.g. after a full re-ingestion."""
+        counts = counts or {}
+        values = {field: counts.get(field, 0) for field in GRAPH_COUNTERS}
+        values["updatedAt"] = datetime.now(timezone.utc)
+        self.db.spacestats.update_one({"_id": space_id}, {"$set": values}, upsert=True)
+
+    def mark_reindexed(self, space_id: str):
+        """Record that a space's graph was rebuilt, so servers reload its BM25 index."""
+        self.db.spacestats.update_one(
+            {"_id": space_id}, {"$set": {"reindexedAt": datetime.now(timezone.utc)}}, upsert=True
+        )
+
+    def reindexed_since(self, since: datetime) -> List[str]:
+        """Ids of spaces rebuilt after `since`."""
+        return [doc["_id"] for doc in self.db.spacestats.find({"reindexedAt": {"$gt": since}}, {"_id": 1})]
+
+    def delete(self, space_id: str):
+        """Remove the stats document of a deleted space."""
+        self.db.spacestats.delete_one({"_id": space_id})
+
+    def get(self, space_id: str) -> dict:
+        """Stats document for a space, reconciling it first if it was never counted.
+
+        incr and set_graph upsert, so the first write to a space can create a
+        document holding only some counters; without reconciledAt it has not
+        been recounted yet.
+        """
+        stats = self.db.spacestats.find_one({"_id": space_id})
+        if stats is None or "reconciledAt" not in stats:
+            stats = self.reconcile(space_id)
+        return stats
+
+    def reconcile(self, space_id: str) -> dict:
+        """Recount every counter from the source of truth and store the result."""
+        stats = {
+            "files": self.db.files.count_documents({"spaceId": space_id}),
+            "chats": self.db.chats.count_documents({"spaceId": space_id}),
+        }
+
+        rag_engine = self.get_rag_engine()
+        if rag_engine:
+            graph_stats = rag_engine.get_space_stats(space_id)
+            if "error" not in graph_stats:
+                stats.update({field: graph_stats.get(field, 0) for field in GRAPH_COUNTERS})
+
+        now = datetime.now(timezone.utc)
+        stats.update({"updatedAt": now, "reconciledAt": now})
+        self.db.spacestats.update_one({"_id": space_id}, {"$set": stats}, upsert=True)
+
+        stats["_id"] = space_id
+        return stats
+
+    def reconcile_stalest(self, limit: int = STATS_RECONCILE_BATCH) -> int:
+        """Reconcile the spaces whose counters were checked longest ago."""
+        stale = self.db.spacestats.find({}, {"_id": 1}).sort("reconciledAt", 1).limit(limit)
+        count = 0
+        for doc in stale:
+            try:
+                self.reconcile(doc["_id"])
+                count += 1
+            except Exception as e:
+                logger.warning(f"Stats reconciliation failed for space {doc['_id']}: {e}")
+        return count
+
+    async def run_reconciler(self):
+        """Background task reconciling a batch of spaces every interval."""
+        while True:
+            await asyncio.sleep(STATS_RECONCILE_INTERVAL)
+            try:
+                count = await asyncio.to_thread(self.reconcile_stalest)
+                logger.debug(f"Reconciled stats for {count} spaces")
+            except Exception as e:
+                logger.error(f"Stats reconciler error: {e}")
+
+    async def run_bm25_invalidator(self):
+        """Background task dropping the BM25 index of spaces rebuilt by another process."""
+        since = datetime.now(timezone.utc)
+        while True:
+            await asyncio.sleep(BM25_INVALIDATE_INTERVAL)
+            rag_engine = self.get_rag_engine()
+            if not rag_engine:
+                continue
+            try:
+                checked = datetime.now(timezone.utc)
+                spaces = await asyncio.to_thread(self.reindexed_since, since)
+                for space_id in spaces:
+                    rag_engine.drop_bm25(space_id)
+                if spaces:
+                    logger.info(f"Dropped BM25 indexes of {len(spaces)} re-indexed spaces")
+                since = checked
+            except Exception as e:
+                logger.error(f"BM25 invalidator error: {e}")
@@ -0,0 +1,42 @@
+from loaders import UserLoader
+
+
+class CountingCollection:
+    """users collection stub recording every find() filter."""
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.finds = []
+
+    def find(self, query, projection=None):
+        self.finds.append(query)
+        return [self.docs[user_id] for user_id in query["_id"]["$in"] if user_id in self.docs]
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.users = CountingCollection(users)
+
+
+def test_authors_of_many_posts_are_fetched_with_one_in_query():
+    db = FakeDB([{"_id": f"user-{i}", "username": f"name-{i}"} for i in range(5)])
+    posts = [{"_id": f"post-{i}", "author_id": f"user-{i % 5}"} for i in range(50)]
+    users = UserLoader(db)
+
+    users.prime(post["author_id"] for post in posts)
+    summaries = [users.summary(post["author_id"]) for post in posts]
+
+    assert len(db.users.finds) == 1
+    assert set(db.users.finds[0]["_id"]["$in"]) == {f"user-{i}" for i in range(5)}
+    assert users.queries == 1
+    assert summaries[7] == {"id": "user-2", "username": "name-2"}
+
+
+def test_missing_users_are_memoized():
+    db = FakeDB([{"_id": "user-1", "username": "alice"}])
+    users = UserLoader(db)
+
+    assert users.load("ghost") is None
+    assert users.load("ghost") is None
+    assert users.load_many([None, "user-1"]) == {"user-1": {"_id": "user-1", "username": "alice"}}
+    assert len(db.users.finds) == 2
@@ -0,0 +1,44 @@
+"""Exported ONNX embedders must match the PyTorch model they were exported from.
+
+Skipped unless onnxruntime and sentence-transformers are installed and the
+model has been exported to MODEL_CACHE_DIR (e.g. by a first start with
+INFERENCE_BACKEND=onnx). benchmarks/backends.py reports the same parity
+alongside latency.
+"""
+import os, random
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from inference import EMBEDDING_MODEL, OnnxEmbedder, _export_dir, _onnx_file, load_embedder
+from benchmarks.backends import embedding_parity
+from benchmarks.corpus import make_document, make_queries
+
+MIN_COSINE = 0.98
+
+
+def exported(backend: str):
+    missing = not os.path.exists(os.path.join(_export_dir(EMBEDDING_MODEL), _onnx_file(backend)))
+    return pytest.param(backend, marks=pytest.mark.skipif(missing, reason=f"{EMBEDDING_MODEL} has no {backend} export"))
+
+
+@pytest.fixture(scope="module")
+def torch_embedder():
+    return load_embedder(EMBEDDING_MODEL, backend="torch")
+
+
+@pytest.fixture(scope="module")
+def texts():
+    rng = random.Random(0)
+    return [make_document(rng, 300) for _ in range(16)] + make_queries(16, 0)
+
+
+@pytest.mark.parametrize("backend", [exported("onnx"), exported("onnx-int8")])
+def test_onnx_embeddings_match_torch(backend, torch_embedder, texts):
+    onnx_embedder = load_embedder(EMBEDDING_MODEL, backend=backend, strict=True)
+    assert isinstance(onnx_embedder, OnnxEmbedder)
+
+    parity = embedding_parity(torch_embedder, onnx_embedder, texts)
+    assert parity["min_cosine"] >= MIN_COSINE, parity
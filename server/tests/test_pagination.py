@@ -0,0 +1,43 @@
+import pytest
+
+from cache import TTLCache
+from pagination import InvalidCursor, paginate_snapshot
+
+mongomock = pytest.importorskip("mongomock")
+
+HOT = [("hot_score", -1), ("_id", -1)]
+
+
+@pytest.fixture
+def posts():
+    collection = mongomock.MongoClient().app.posts
+    collection.insert_many([{"_id": f"post-{i:02d}", "groupId": "g", "hot_score": float(i)} for i in range(30)])
+    return collection
+
+
+def test_snapshot_pages_survive_score_rewrites(posts):
+    snapshots = TTLCache("test_snapshots")
+    first, cursor = paginate_snapshot(posts, {"groupId": "g"}, HOT, 10, snapshots)
+
+    # A refresher reverses the ranking between page loads
+    for doc in posts.find():
+        posts.update_one({"_id": doc["_id"]}, {"$set": {"hot_score": -doc["hot_score"]}})
+
+    seen = [doc["_id"] for doc in first]
+    while cursor:
+        page, cursor = paginate_snapshot(posts, {"groupId": "g"}, HOT, 10, snapshots, cursor=cursor)
+        seen.extend(doc["_id"] for doc in page)
+
+    assert seen == [f"post-{i:02d}" for i in reversed(range(30))]
+
+
+def test_snapshot_skips_deleted_posts_and_rejects_foreign_cursors(posts):
+    snapshots = TTLCache("test_snapshots")
+    _, cursor = paginate_snapshot(posts, {"groupId": "g"}, HOT, 10, snapshots)
+    posts.delete_one({"_id": "post-15"})
+
+    page, _ = paginate_snapshot(posts, {"groupId": "g"}, HOT, 10, snapshots, cursor=cursor)
+    assert [doc["_id"] for doc in page] == [f"post-{i:02d}" for i in (19, 18, 17, 16, 14, 13, 12, 11, 10)]
+
+    with pytest.raises(InvalidCursor):
+        paginate_snapshot(posts, {"groupId": "g"}, HOT, 10, TTLCache("other"), cursor=cursor)
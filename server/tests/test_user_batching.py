@@ -0,0 +1,130 @@
+"""Post and comment endpoints resolve a page of authors with one users query.
+
+Runs the endpoint functions against mongomock, with the RAG engine left
+unavailable so importing main loads no models and opens no Neo4j session.
+"""
+import sys, asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("fastapi")
+mongomock = pytest.importorskip("mongomock")
+
+PAGE = 20
+VIEWER = {"_id": "viewer", "username": "viewer"}
+
+
+class CountingUsers:
+    """db.users proxy counting find/find_one round-trips."""
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def find(self, *args, **kwargs):
+        self._counter.user_queries += 1
+        return self._collection.find(*args, **kwargs)
+
+    def find_one(self, *args, **kwargs):
+        self._counter.user_queries += 1
+        return self._collection.find_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class CountingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.user_queries = 0
+
+    def __getattr__(self, name):
+        collection = getattr(self._db, name)
+        return CountingUsers(collection, self) if name == "users" else collection
+
+
+class UnavailableEngine:
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("RAG engine disabled in tests")
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    import pymongo, ragengine
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(pymongo, "MongoClient", mongomock.MongoClient)
+        patch.setattr(ragengine, "RAGEngine", UnavailableEngine)
+        sys.modules.pop("main", None)
+        import main
+    yield main
+    sys.modules.pop("main", None)
+
+
+@pytest.fixture
+def db(app_module, monkeypatch):
+    """Counting view of a fresh database with one group, its posts and comments."""
+    raw = mongomock.MongoClient().app
+    start = datetime.now(timezone.utc)
+    raw.users.insert_many([{"_id": f"user-{i}", "username": f"name-{i}", "email": f"{i}@x.io"}
+                           for i in range(2 * PAGE)])
+    raw.postgroups.insert_many([
+        {"_id": f"group-{i}", "name": f"group {i}", "is_public": True,
+         "created_by": f"user-{i}", "members": [], "moderators": [],
+         "createdAt": start + timedelta(seconds=i)}
+        for i in range(PAGE)
+    ])
+    raw.posts.insert_many([
+        {"_id": f"post-{i}", "groupId": "group-0", "userId": f"user-{i}", "title": "t",
+         "content": "c", "upvotes": 0, "downvotes": 0, "hot_score": 0.0,
+         "createdAt": start + timedelta(seconds=i)}
+        for i in range(PAGE)
+    ])
+    raw.comments.insert_many([
+        {"_id": f"comment-{i}", "postId": "post-0", "userId": f"user-{PAGE + i}",
+         "parentCommentId": None, "content": "c", "createdAt": start + timedelta(seconds=i)}
+        for i in range(PAGE)
+    ])
+
+    counting = CountingDatabase(raw)
+    monkeypatch.setattr(app_module, "db", counting)
+    monkeypatch.setattr(app_module.vote_store, "db", raw)
+    return counting
+
+
+def test_list_groups_resolves_creators_in_one_query(app_module, db):
+    result = asyncio.run(app_module.list_groups(
+        current_user=VIEWER, users=app_module.get_user_loader(),
+        skip=0, limit=PAGE, public_only=False, cursor=None,
+    ))
+    assert len(result["groups"]) == PAGE
+    assert all("created_by_user" in group for group in result["groups"])
+    assert db.user_queries == 1
+
+
+def test_list_posts_resolves_authors_in_one_query(app_module, db):
+    result = asyncio.run(app_module.list_posts(
+        "group-0", current_user=VIEWER, users=app_module.get_user_loader(),
+        skip=0, limit=PAGE, sort_by="newest", cursor=None,
+    ))
+    assert len(result["posts"]) == PAGE
+    assert all("author" in post for post in result["posts"])
+    assert db.user_queries == 1
+
+
+def test_get_post_resolves_author_and_commenters_in_one_query(app_module, db):
+    post = asyncio.run(app_module.get_post("post-0", current_user=VIEWER))
+    assert post["author"]["id"] == "user-0"
+    assert len(post["comments"]) == PAGE
+    assert all("author" in comment for comment in post["comments"])
+    assert db.user_queries == 1
+
+
+def test_list_comments_resolves_authors_in_one_query(app_module, db):
+    result = asyncio.run(app_module.list_comments(
+        "post-0", current_user=VIEWER, users=app_module.get_user_loader(),
+        parent_id=None, top_level=False, cursor=None, limit=PAGE,
+    ))
+    assert len(result["comments"]) == PAGE
+    assert all("author" in comment for comment in result["comments"])
+    assert db.user_queries == 1
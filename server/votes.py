@@ -0,0 +1,183 @@
+import asyncio, uuid, threading, logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+logger = logging.getLogger(__name__)
+
+# Vote value -> counter field on the post document
+VOTE_FIELDS = {1: "upvotes", -1: "downvotes"}
+
+# Ids of the last few flushes applied to a post, so reads can tell whether
+# the deltas being flushed are already in the stored counters
+FLUSH_LOG_FIELD = "voteFlushes"
+FLUSH_LOG_SIZE = 8
+
+# Projection for post reads passed to live_counts
+COUNTER_PROJECTION = {"upvotes": 1, "downvotes": 1, FLUSH_LOG_FIELD: 1}
+
+
+class VoteConflict(Exception):
+    """Raised when a vote could not be applied because of concurrent changes."""
+
+############################################
+# VOTE STORE
+############################################
+
+
+class VoteStore:
+    """Per-user vote records with write-behind aggregation of post counters.
+
+    Each (postId, userId) pair has at most one record in the votes
+    collection. Counter changes are accumulated in memory and applied to the
+    posts collection in one bulk write per flush, so a viral post is written
+    once per interval instead of once per vote. Reads add the pending deltas
+    to the stored counts.
+    """
+
+    def __init__(self, db, flush_interval: float = 2.0,
+                 on_flush: Optional[Callable[[List[str]], None]] = None):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush  # Called with the ids of posts whose counters changed
+        self._pending: Dict[str, Dict[str, int]] = defaultdict(lambda: {"upvotes": 0, "downvotes": 0})
+        self._inflight: Dict[str, Dict[str, int]] = {}  # Deltas being written by flush()
+        self._inflight_id: Optional[str] = None  # Flush id stamped on the posts it writes
+        self._lock = threading.Lock()
+
+    def create_indexes(self):
+        """Create the unique vote-record index."""
+        self.db.votes.create_index([("postId", 1), ("userId", 1)], unique=True)
+        self.db.votes.create_index([("userId", 1), ("postId", 1)])
+
+    def _add(self, post_id: str, value: int, delta: int):
+        with self._lock:
+            self._pending[post_id][VOTE_FIELDS[value]] += delta
+
+    def cast(self, post_id: str, user_id: str, value: int) -> int:
+        """Apply a vote with toggling semantics and return the user's resulting vote.
+
+        Voting the same way twice removes the vote (returns 0); voting the
+        other way switches it.
+        """
+        key = {"postId": post_id, "userId": user_id}
+        now = datetime.now(timezone.utc)
+
+        # Each branch is a conditional write, so a lost race just re-reads
+        for _ in range(3):
+            existing = self.db.votes.find_one(key, {"value": 1})
+
+            if existing is None:
+                try:
+                    self.db.votes.insert_one({"_id": str(uuid.uuid4()), **key, "value": value, "createdAt": now})
+                except DuplicateKeyError:
+                    continue
+                self._add(post_id, value, 1)
+                return value
+
+            if existing["value"] == value:
+                if self.db.votes.delete_one({"_id": existing["_id"], "value": value}).deleted_count:
+                    self._add(post_id, value, -1)
+                    return 0
+                continue
+
+            result = self.db.votes.update_one(
+                {"_id": existing["_id"], "value": existing["value"]},
+                {"$set": {"value": value, "updatedAt": now}}
+            )
+            if result.modified_count:
+                self._add(post_id, existing["value"], -1)
+                self._add(post_id, value, 1)
+                return value
+
+        raise VoteConflict(f"Could not apply vote on post {post_id}")
+
+    def live_counts(self, post: dict) -> Tuple[int, int]:
+        """Stored counters plus deltas not yet flushed.
+
+        In-flight deltas are skipped once the post read carries the flush's
+        id, since the stored counters then already include them.
+        """
+        with self._lock:
+            pending = self._pending.get(post["_id"], {})
+            inflight = self._inflight.get(post["_id"], {})
+            if self._inflight_id in post.get(FLUSH_LOG_FIELD, ()):
+                inflight = {}
+            return (
+                post.get("upvotes", 0) + pending.get("upvotes", 0) + inflight.get("upvotes", 0),
+                post.get("downvotes", 0) + pending.get("downvotes", 0) + inflight.get("downvotes", 0),
+            )
+
+    def user_votes(self, user_id: str, post_ids: Iterable[str]) -> Dict[str, int]:
+        """Map post id -> the user's vote (1 or -1) in one query."""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        cursor = self.db.votes.find(
+            {"userId": user_id, "postId": {"$in": post_ids}},
+            {"postId": 1, "value": 1, "_id": 0}
+        )
+        return {vote["postId"]: vote["value"] for vote in cursor}
+
+    def flush(self) -> List[str]:
+        """Write pending counter deltas in one bulk operation; returns flushed post ids."""
+        with self._lock:
+            pending = {post_id: d for post_id, d in self._pending.items() if d["upvotes"] or d["downvotes"]}
+            self._pending.clear()
+            self._inflight = pending
+            self._inflight_id = flush_id = uuid.uuid4().hex
+
+        if not pending:
+            return []
+
+        post_ids = list(pending)
+        ops = [
+            UpdateOne({"_id": post_id}, {
+                "$inc": pending[post_id],
+                "$push": {FLUSH_LOG_FIELD: {"$each": [flush_id], "$slice": -FLUSH_LOG_SIZE}},
+            })
+            for post_id in post_ids
+        ]
+        failed: List[str] = []
+        try:
+            self.db.posts.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Unordered, so every op not listed in writeErrors was applied
+            failed = [post_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+            logger.error(f"Vote flush failed for {len(failed)} of {len(ops)} posts, will retry: {e}")
+        except Exception as e:
+            failed = post_ids
+            logger.error(f"Vote flush failed, will retry: {e}")
+
+        # Put the failed deltas back so the next flush retries them
+        with self._lock:
+            self._inflight = {}
+            self._inflight_id = None
+            for post_id in failed:
+                for field, delta in pending[post_id].items():
+                    self._pending[post_id][field] += delta
+
+        failed_ids = set(failed)
+        pending = {post_id: deltas for post_id, deltas in pending.items() if post_id not in failed_ids}
+        if not pending:
+            return []
+
+        logger.debug(f"Flushed vote counters for {len(pending)} posts")
+        if self.on_flush:
+            try:
+                self.on_flush(list(pending))
+            except Exception as e:
+                logger.error(f"Vote flush callback failed: {e}")
+        return list(pending)
+
+    async def run_flusher(self):
+        """Background task flushing counters every flush_interval seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Vote flusher error: {e}")